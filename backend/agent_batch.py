@@ -0,0 +1,288 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import UploadFile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from . import schemas
+from .app_usage import record_screenshot
+from .database import Screenshot, TimeEntry, User, UserRole
+from .idempotency import remember_keys, seen_keys, stable_id
+from .interning import applications, normalize, window_titles
+from .membership import membership_cache
+from .presence import presence
+from .rollups import apply_entry_change
+from .routers.screenshots import MAX_FILE_SIZE, allowed_file, remove_screenshot_files, save_screenshot_files
+from .timers import RunningTimer, elapsed_seconds, existence_cache, timer_registry
+
+# Configuration
+MAX_BATCH_EVENTS = int(os.getenv("AGENT_BATCH_MAX_EVENTS", "500"))
+MAX_BATCH_BYTES = int(os.getenv("AGENT_BATCH_MAX_BYTES", str(200 * 1024 * 1024)))
+BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "4"))
+BATCH_QUEUE_SECONDS = float(os.getenv("AGENT_BATCH_QUEUE_SECONDS", "2"))
+BATCH_RETRY_AFTER = int(os.getenv("AGENT_BATCH_RETRY_AFTER", "30"))
+
+
+class BatchError(Exception):
+    """An event of the bundle that cannot be applied; reported, the rest goes ahead."""
+
+
+class BatchGate:
+    """
+    Bounds how many bundles this worker applies at once, one per user. Agents
+    that do not get a slot quickly are told to come back later, so a reconnect
+    storm queues on the agents instead of the database.
+    """
+
+    def __init__(self, slots: int = BATCH_CONCURRENCY, wait: float = BATCH_QUEUE_SECONDS):
+        self._slots = asyncio.Semaphore(slots)
+        self._wait = wait
+        self._users: Set[str] = set()
+
+    async def acquire(self, user_id: str) -> bool:
+        if user_id in self._users:
+            return False
+        self._users.add(user_id)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self._wait)
+        except asyncio.TimeoutError:
+            self._users.discard(user_id)
+            return False
+        return True
+
+    def release(self, user_id: str):
+        self._users.discard(user_id)
+        self._slots.release()
+
+    @staticmethod
+    def retry_after() -> int:
+        # Jittered, so agents turned away together do not all come back together
+        return BATCH_RETRY_AFTER + random.randint(0, BATCH_RETRY_AFTER)
+
+
+batch_gate = BatchGate()
+
+
+def _event_time(at: Optional[datetime], now: datetime) -> datetime:
+    """Agent timestamp as naive UTC, never later than the server clock."""
+    if at is None:
+        return now
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(at, now)
+
+
+class Batch:
+    """One bundle of agent events, applied in order inside a single transaction."""
+
+    def __init__(self, db: AsyncSession, user: User, files: Dict[str, UploadFile]):
+        self.db = db
+        self.user = user
+        self.files = files
+        self.now = datetime.utcnow()
+        self.results: List[Dict[str, Any]] = []
+        self.keys: List[Dict[str, Optional[str]]] = []
+        self.seen: Dict[str, Any] = {}
+        self.entries: Dict[str, TimeEntry] = {}  # by id, for this user
+        self.started: Dict[str, TimeEntry] = {}  # entries started by this bundle, by event key
+        self.stopped: Set[str] = set()
+        self.written_files: List[str] = []
+        self.activity_level: Optional[int] = None
+        self.application_ids: Dict[str, int] = {}
+        self.window_title_ids: Dict[str, int] = {}
+        self.running: Optional[str] = None
+
+    async def load(self, events: List[schemas.AgentEvent]):
+        """Running timer, applied keys and referenced time entries of the bundle, one query each."""
+        # Read from the database: a stale registry would have timer_start trip the unique index
+        timer = await timer_registry.refresh_user(self.db, self.user.id)
+        self.running = timer.id if timer else None
+        self.seen = await seen_keys(
+            self.db, self.user.id,
+            [event.key for event in events] + [event.entry_key for event in events]
+        )
+        entry_ids = {event.time_entry_id for event in events if event.time_entry_id}
+        entry_ids |= {
+            self.seen[event.entry_key].result_id
+            for event in events if event.entry_key in self.seen
+        }
+        if entry_ids:
+            result = await self.db.execute(
+                select(TimeEntry).where(TimeEntry.id.in_(entry_ids), TimeEntry.user_id == self.user.id)
+            )
+            self.entries = {entry.id: entry for entry in result.scalars().all()}
+        # Screenshot names, interned once per bundle
+        shots = [event for event in events if event.type == "screenshot"]
+        if shots:
+            self.application_ids = await applications.ids_for(event.application_name for event in shots)
+            self.window_title_ids = await window_titles.ids_for(event.window_title for event in shots)
+
+    async def apply(self, events: List[schemas.AgentEvent]):
+        handlers = {
+            "timer_start": self._timer_start,
+            "timer_stop": self._timer_stop,
+            "screenshot": self._screenshot,
+        }
+        applied: Dict[str, Optional[str]] = {}
+        for event in events:
+            if event.key in self.seen or event.key in applied:
+                result_id = self.seen[event.key].result_id if event.key in self.seen else applied[event.key]
+                self.results.append({"key": event.key, "status": "duplicate", "id": result_id, "error": None})
+                continue
+            handler = handlers.get(event.type)
+            try:
+                if handler is None:
+                    raise BatchError(f"Unknown event type: {event.type}")
+                result_id = await handler(event)
+            except BatchError as e:
+                self.results.append({"key": event.key, "status": "failed", "id": None, "error": str(e)})
+                continue
+            applied[event.key] = result_id
+            self.keys.append({"key": event.key, "kind": event.type, "result_id": result_id})
+            self.results.append({"key": event.key, "status": "created", "id": result_id, "error": None})
+        await remember_keys(self.db, self.user.id, self.keys)
+
+    def _entry(self, event: schemas.AgentEvent) -> TimeEntry:
+        if event.entry_key:
+            if event.entry_key in self.started:
+                return self.started[event.entry_key]
+            seen = self.seen.get(event.entry_key)
+            entry = self.entries.get(seen.result_id) if seen is not None and seen.kind == "timer_start" else None
+            if entry is None:
+                raise BatchError("Unknown entry_key")
+            return entry
+        if event.time_entry_id:
+            entry = self.entries.get(event.time_entry_id)
+            if entry is None:
+                raise BatchError("Time entry not found or access denied")
+            return entry
+        raise BatchError("time_entry_id or entry_key is required")
+
+    async def _timer_start(self, event: schemas.AgentEvent) -> str:
+        if not event.project_id:
+            raise BatchError("project_id is required")
+        if self.running is not None:
+            raise BatchError("A timer is already running; stop it first")
+        if not await existence_cache.project_exists(self.db, event.project_id):
+            raise BatchError("Project not found")
+        if self.user.role == UserRole.EMPLOYEE and not await membership_cache.can_access(self.db, self.user.id, event.project_id):
+            raise BatchError("Not enough permissions to track time on this project")
+        if event.task_id and await existence_cache.task_project_id(self.db, event.task_id) is None:
+            raise BatchError("Task not found")
+
+        entry = TimeEntry(
+            id=stable_id(self.user.id, event.key),
+            user_id=self.user.id,
+            project_id=event.project_id,
+            task_id=event.task_id,
+            description=event.description,
+            is_billable=event.is_billable,
+            start_time=_event_time(event.at, self.now),
+            created_at=self.now,
+            updated_at=self.now,
+        )
+        self.db.add(entry)
+        self.started[event.key] = entry
+        self.running = entry.id
+        return entry.id
+
+    async def _timer_stop(self, event: schemas.AgentEvent) -> str:
+        entry = self._entry(event)
+        if entry.end_time is not None:
+            raise BatchError("Time entry already stopped")
+        end_time = _event_time(event.at, self.now)
+        entry.end_time = end_time
+        entry.duration_seconds = elapsed_seconds(entry.start_time, end_time)
+        entry.updated_at = self.now
+        await apply_entry_change(self.db, None, entry)
+        self.stopped.add(entry.id)
+        if self.running == entry.id:
+            self.running = None
+        return entry.id
+
+    async def _screenshot(self, event: schemas.AgentEvent) -> str:
+        entry = self._entry(event)
+        upload = self.files.get(event.file or "")
+        if upload is None:
+            raise BatchError("File not found in the bundle")
+        if not allowed_file(upload.filename):
+            raise BatchError("File type not allowed")
+        if event.activity_level is None:
+            raise BatchError("activity_level is required")
+        contents = await upload.read()
+        if len(contents) > MAX_FILE_SIZE:
+            raise BatchError("File too large")
+
+        screenshot_id = stable_id(self.user.id, event.key)
+        filename = f"{screenshot_id}.{upload.filename.rsplit('.', 1)[1].lower()}"
+        image_path, thumbnail_path = await save_screenshot_files(contents, filename)
+        self.written_files += [image_path, thumbnail_path]
+        application_id = self.application_ids.get(normalize(event.application_name))
+        created_at = _event_time(event.at, self.now)
+        await record_screenshot(self.db, self.user.id, entry.id, created_at, application_id)
+        self.db.add(Screenshot(
+            id=screenshot_id,
+            user_id=self.user.id,
+            time_entry_id=entry.id,
+            image_path=image_path,
+            thumbnail_path=thumbnail_path,
+            activity_level=event.activity_level,
+            application_id=application_id,
+            window_title_id=self.window_title_ids.get(normalize(event.window_title)),
+            created_at=created_at,
+        ))
+        self.activity_level = event.activity_level
+        return screenshot_id
+
+    def summary(self) -> Dict[str, Any]:
+        statuses = [result["status"] for result in self.results]
+        return {
+            "created": statuses.count("created"),
+            "duplicates": statuses.count("duplicate"),
+            "failed": statuses.count("failed"),
+            "results": self.results,
+        }
+
+
+async def apply_batch(
+    db: AsyncSession,
+    user: User,
+    events: List[schemas.AgentEvent],
+    files: Dict[str, UploadFile],
+) -> Optional[Dict[str, Any]]:
+    """
+    Apply a bundle and commit it as one transaction. Returns ``None`` when a
+    concurrent upload of the same keys won the race; the caller retries.
+    """
+    batch = Batch(db, user, files)
+    try:
+        await batch.load(events)
+        await batch.apply(events)
+        await db.commit()
+    except IntegrityError:
+        # Keyed files are shared with the winning upload; keep them
+        await db.rollback()
+        return None
+    except Exception:
+        await db.rollback()
+        remove_screenshot_files(*batch.written_files)
+        raise
+
+    # Bring the running timers and the presence board up to date
+    for entry_id in batch.stopped:
+        timer_registry.discard(entry_id)
+        presence.timer_stopped(user.id)
+    if batch.running is not None and batch.running not in batch.stopped:
+        started = next((entry for entry in batch.started.values() if entry.id == batch.running), None)
+        if started is not None:
+            timer = RunningTimer.from_entry(started)
+            timer_registry.add(timer)
+            presence.timer_started(timer)
+    if batch.activity_level is not None:
+        presence.activity(user.id, batch.activity_level)
+    return batch.summary()
@@ -224,40 +224,25 @@ async def mark_notification_as_read(notification_id: str, current_user: User = D
 
 # WebSocket endpoint for real-time updates
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, client_id: str):
-        await websocket.accept()
-        self.active_connections[client_id] = websocket
-
-    def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-
-    async def send_personal_message(self, message: str, client_id: str):
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_text(message)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections.values():
-            await connection.send_text(message)
+try:
+    from .connections import ConnectionManager
+except ImportError:
+    # Running as a top-level module (uvicorn app:app from backend/)
+    from connections import ConnectionManager
 
 manager = ConnectionManager()
 
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    await manager.connect(websocket, client_id)
+    connection = await manager.connect(websocket, client_id)
     try:
         while True:
             data = await websocket.receive_text()
             # Handle incoming WebSocket messages here
             await manager.send_personal_message(f"You wrote: {data}", client_id)
     except WebSocketDisconnect:
-        manager.disconnect(client_id)
+        manager.disconnect(connection)
         await manager.broadcast(f"Client #{client_id} left the chat")
 
 if __name__ == "__main__":
@@ -0,0 +1,246 @@
+"""
+Time per user, day and application, kept in ``app_usage_daily`` as
+screenshots arrive.
+
+Each screenshot stands for the time until the next screenshot of its time
+entry, capped at ``SCREENSHOT_MAX_GAP_SECONDS``, like the screenshot
+activity report. The last screenshot of an entry counts for nothing until
+its successor arrives.
+
+Usage (backfill and verification):
+    python -m backend.app_usage backfill
+    python -m backend.app_usage rebuild
+"""
+import argparse
+import asyncio
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .database import Application, AppUsageDaily, Screenshot, WindowTitle
+from .interning import MAX_INTERNED_LENGTH
+from .rollups import _naive, _upsert_add
+
+# Longest stretch of time one screenshot stands for
+SCREENSHOT_MAX_GAP_SECONDS = int(os.getenv("SCREENSHOT_MAX_GAP_SECONDS", "600"))
+# Counter key of screenshots without an application name
+UNKNOWN_APPLICATION = 0
+
+# (user_id, day, application_id) -> [seconds, screenshots]
+UsageDeltas = Dict[Tuple[str, date, int], List[int]]
+
+
+def _gap(start: datetime, end: datetime) -> int:
+    return min(int((_naive(end) - _naive(start)).total_seconds()), SCREENSHOT_MAX_GAP_SECONDS)
+
+
+async def _write_deltas(db: AsyncSession, deltas: UsageDeltas):
+    await _upsert_add(db, AppUsageDaily, ["user_id", "day", "application_id"], ["seconds", "screenshots"], [
+        {"user_id": user_id, "day": day, "application_id": application_id, "seconds": seconds, "screenshots": count}
+        for (user_id, day, application_id), (seconds, count) in deltas.items()
+        if seconds or count
+    ])
+
+
+async def _neighbours(db: AsyncSession, time_entry_id: str, at: datetime):
+    """The screenshots of the entry just before and just after ``at``."""
+    neighbours = select(Screenshot.created_at, Screenshot.application_id).where(
+        Screenshot.time_entry_id == time_entry_id
+    )
+    result = await db.execute(
+        neighbours.where(Screenshot.created_at < at).order_by(Screenshot.created_at.desc()).limit(1)
+    )
+    previous = result.first()
+    result = await db.execute(
+        neighbours.where(Screenshot.created_at > at).order_by(Screenshot.created_at).limit(1)
+    )
+    following = result.first()
+    return previous, following
+
+
+def _key(user_id: str, created_at: datetime, application_id: Optional[int]) -> Tuple[str, date, int]:
+    return (user_id, _naive(created_at).date(), application_id or UNKNOWN_APPLICATION)
+
+
+def _tally(totals: UsageDeltas, previous, row):
+    """Count ``row`` (screenshots in entry and time order) and credit its predecessor; returns the new predecessor."""
+    key = _key(row.user_id, row.created_at, row.application_id)
+    totals[key][1] += 1
+    if previous is not None and previous[0] == row.time_entry_id:
+        totals[previous[2]][0] += _gap(previous[1], row.created_at)
+    return (row.time_entry_id, row.created_at, key)
+
+
+async def record_screenshot(
+    db: AsyncSession,
+    user_id: str,
+    time_entry_id: str,
+    created_at: datetime,
+    application_id: Optional[int]
+):
+    """
+    Count a new screenshot in the app usage counters, in the caller's
+    transaction.
+
+    The screenshot takes over the tail of its predecessor's span: the
+    predecessor now stands for the time until this one, and this one for
+    the time until the next (when screenshots arrive out of order).
+    """
+    at = _naive(created_at)
+    deltas: UsageDeltas = defaultdict(lambda: [0, 0])
+    key = _key(user_id, at, application_id)
+    deltas[key][1] += 1
+
+    previous, following = await _neighbours(db, time_entry_id, at)
+    if previous is not None:
+        previous_key = _key(user_id, previous.created_at, previous.application_id)
+        deltas[previous_key][0] += _gap(previous.created_at, at)
+        if following is not None:
+            deltas[previous_key][0] -= _gap(previous.created_at, following.created_at)
+    if following is not None:
+        deltas[key][0] += _gap(at, following.created_at)
+    await _write_deltas(db, deltas)
+
+
+async def remove_screenshot(
+    db: AsyncSession,
+    user_id: str,
+    time_entry_id: str,
+    created_at: datetime,
+    application_id: Optional[int]
+):
+    """
+    Take a screenshot about to be deleted out of the app usage counters, in
+    the caller's transaction.
+
+    The reverse of ``record_screenshot``: its predecessor stands for the
+    time until the next screenshot again.
+    """
+    at = _naive(created_at)
+    deltas: UsageDeltas = defaultdict(lambda: [0, 0])
+    key = _key(user_id, at, application_id)
+    deltas[key][1] -= 1
+
+    previous, following = await _neighbours(db, time_entry_id, at)
+    if previous is not None:
+        previous_key = _key(user_id, previous.created_at, previous.application_id)
+        deltas[previous_key][0] -= _gap(previous.created_at, at)
+        if following is not None:
+            deltas[previous_key][0] += _gap(previous.created_at, following.created_at)
+    if following is not None:
+        deltas[key][0] -= _gap(at, following.created_at)
+    await _write_deltas(db, deltas)
+
+
+async def remove_time_entry(db: AsyncSession, time_entry_id: str):
+    """Take all screenshots of a time entry about to be deleted out of the counters, in the caller's transaction."""
+    result = await db.execute(
+        select(Screenshot.user_id, Screenshot.time_entry_id, Screenshot.created_at, Screenshot.application_id)
+        .where(Screenshot.time_entry_id == time_entry_id)
+        .order_by(Screenshot.created_at)
+    )
+    totals: UsageDeltas = defaultdict(lambda: [0, 0])
+    previous = None
+    for row in result.all():
+        previous = _tally(totals, previous, row)
+    await _write_deltas(db, {key: [-seconds, -count] for key, (seconds, count) in totals.items()})
+
+
+async def read_app_usage(db: AsyncSession, start_date: date, end_date: date, user_ids: Optional[List[str]] = None):
+    """Counter rows between two days (inclusive) with application names, optionally for some users."""
+    query = select(
+        AppUsageDaily.user_id,
+        AppUsageDaily.day,
+        Application.name.label("application"),
+        AppUsageDaily.seconds,
+        AppUsageDaily.screenshots
+    ).outerjoin(
+        Application, Application.id == AppUsageDaily.application_id
+    ).where(
+        AppUsageDaily.day >= start_date,
+        AppUsageDaily.day <= end_date
+    )
+    if user_ids is not None:
+        query = query.where(AppUsageDaily.user_id.in_(user_ids))
+    result = await db.execute(
+        query.order_by(AppUsageDaily.day, AppUsageDaily.user_id, AppUsageDaily.seconds.desc())
+    )
+    return result.all()
+
+
+async def backfill_names(db: AsyncSession) -> int:
+    """Intern the free-text names of older screenshots; returns the number of names moved."""
+    updated = 0
+    for model, column, legacy, target in (
+        (Application, Application.name, Screenshot.legacy_application_name, Screenshot.application_id),
+        (WindowTitle, WindowTitle.title, Screenshot.legacy_window_title, Screenshot.window_title_id),
+    ):
+        value = func.substr(func.trim(legacy), 1, MAX_INTERNED_LENGTH)
+        await db.execute(
+            insert(model).from_select(
+                [column.key],
+                select(value).where(
+                    legacy.is_not(None),
+                    func.trim(legacy) != "",
+                    ~select(model.id).where(column == value).exists()
+                ).distinct()
+            )
+        )
+        result = await db.execute(
+            update(Screenshot)
+            .where(legacy.is_not(None))
+            .values({
+                target: select(model.id).where(column == value).scalar_subquery(),
+                legacy: None,
+            })
+            .execution_options(synchronize_session=False)
+        )
+        updated += result.rowcount
+    await db.commit()
+    return updated
+
+
+async def expected_usage(db: AsyncSession) -> UsageDeltas:
+    """App usage counters recomputed from the screenshots table."""
+    totals: UsageDeltas = defaultdict(lambda: [0, 0])
+    result = await db.stream(
+        select(Screenshot.user_id, Screenshot.time_entry_id, Screenshot.created_at, Screenshot.application_id)
+        .order_by(Screenshot.time_entry_id, Screenshot.created_at)
+        .execution_options(yield_per=1000)
+    )
+    previous = None
+    async for row in result:
+        previous = _tally(totals, previous, row)
+    return totals
+
+
+async def rebuild_app_usage(db: AsyncSession) -> int:
+    """Replace the app usage counters with freshly computed ones; returns the number of rows."""
+    totals = await expected_usage(db)
+    await db.execute(delete(AppUsageDaily))
+    await _write_deltas(db, totals)
+    await db.commit()
+    return len(totals)
+
+
+async def _main(command: str):
+    from .database import async_session, create_tables
+
+    await create_tables()
+    async with async_session() as db:
+        if command == "backfill":
+            count = await backfill_names(db)
+            print(f"Interned {count} screenshot names")
+        count = await rebuild_app_usage(db)
+        print(f"Rebuilt app usage: {count} daily rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the app usage counters")
+    parser.add_argument("command", choices=["backfill", "rebuild"])
+    asyncio.run(_main(parser.parse_args().command))
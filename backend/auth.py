@@ -67,6 +67,20 @@ def create_refresh_token(data: Dict[str, Any], expires_delta: Optional[timedelta
     return encoded_jwt
 
 # Token verification
+async def get_user_from_token(db: AsyncSession, token: str) -> Optional[User]:
+    """Resolve an access token to its user, or None if it is invalid."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        email: str = payload.get("sub")
+        if email is None:
+            return None
+    except JWTError:
+        return None
+    
+    # Look up user by email instead of ID
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
@@ -77,17 +91,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    # Look up user by email instead of ID
-    result = await db.execute(select(User).where(User.email == email))
-    user = result.scalars().first()
+    user = await get_user_from_token(db, token)
     if user is None:
         raise credentials_exception
     return user
@@ -0,0 +1,176 @@
+import base64
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .connections import project_topic
+from .database import Task
+from .pubsub import bus
+from .realtime import publish_to_topic
+
+# Configuration
+BOARD_STATUSES = [s for s in os.getenv("BOARD_STATUSES", "todo,in_progress,review,done").split(",") if s]
+BOARD_COLUMN_LIMIT = int(os.getenv("BOARD_COLUMN_LIMIT", "25"))
+BOARD_CACHE_TTL = float(os.getenv("BOARD_CACHE_TTL", "300"))
+
+# Bus channel telling other workers which boards changed
+BOARD_CHANNEL = "tasks.board"
+
+# Column order: due date (undated last), newest first, id as tie breaker
+BOARD_ORDER = (Task.due_date.asc().nullslast(), Task.created_at.desc(), Task.id.asc())
+
+CARD_FIELDS = ("id", "title", "description", "status", "due_date", "project_id", "assignee_id", "created_at", "updated_at")
+
+
+def task_card(task) -> Dict[str, Any]:
+    """Card for a ``Task`` or a row mapping with the task columns."""
+    if isinstance(task, Task):
+        return {field: getattr(task, field) for field in CARD_FIELDS}
+    return {field: task[field] for field in CARD_FIELDS}
+
+
+def encode_cursor(card: Dict[str, Any]) -> str:
+    raw = json.dumps([
+        card["due_date"].isoformat() if card["due_date"] else None,
+        card["created_at"].isoformat(),
+        card["id"],
+    ])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], datetime, str]:
+    due_date, created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return (
+        datetime.fromisoformat(due_date) if due_date else None,
+        datetime.fromisoformat(created_at),
+        task_id,
+    )
+
+
+def after_cursor(cursor: str):
+    """Keyset condition for the rows following ``cursor`` in ``BOARD_ORDER``."""
+    due_date, created_at, task_id = decode_cursor(cursor)
+    same_due_tail = or_(
+        Task.created_at < created_at,
+        and_(Task.created_at == created_at, Task.id > task_id)
+    )
+    if due_date is None:
+        return and_(Task.due_date.is_(None), same_due_tail)
+    return or_(
+        Task.due_date > due_date,
+        Task.due_date.is_(None),
+        and_(Task.due_date == due_date, same_due_tail)
+    )
+
+
+def column_order(statuses: Iterable[str]) -> List[str]:
+    extra = sorted((status for status in statuses if status not in BOARD_STATUSES), key=lambda status: status or "")
+    return BOARD_STATUSES + extra
+
+
+class BoardCache:
+    """
+    Built boards per project (and column limit), dropped when the project's
+    tasks change, on this worker directly and on others over the bus.
+    Every change is also announced on the project's WebSocket topic, so
+    open boards reload.
+    """
+
+    def __init__(self, ttl: float = BOARD_CACHE_TTL):
+        self.ttl = ttl
+        self._boards: Dict[str, Dict[int, Tuple[float, Dict[str, Any]]]] = {}
+
+    def get(self, project_id: str, limit: int) -> Optional[Dict[str, Any]]:
+        entry = self._boards.get(project_id, {}).get(limit)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def put(self, project_id: str, limit: int, board: Dict[str, Any]):
+        self._boards.setdefault(project_id, {})[limit] = (time.monotonic() + self.ttl, board)
+
+    def invalidate(self, project_ids: Iterable[str]):
+        project_ids = [project_id for project_id in set(project_ids) if project_id]
+        if not project_ids:
+            return
+        self._forget(project_ids)
+        bus.publish(BOARD_CHANNEL, {"origin": bus.worker_id, "project_ids": project_ids})
+        for project_id in project_ids:
+            publish_to_topic(project_topic(project_id), {"type": "board.changed", "project_id": project_id})
+
+    async def handle_event(self, event: Dict[str, Any]):
+        if event.get("origin") != bus.worker_id:
+            self._forget(event.get("project_ids", []))
+
+    def _forget(self, project_ids: Iterable[str]):
+        for project_id in project_ids:
+            self._boards.pop(project_id, None)
+
+
+board_cache = BoardCache()
+
+
+async def build_board(db: AsyncSession, project_id: str, limit: int = BOARD_COLUMN_LIMIT) -> Dict[str, Any]:
+    """
+    Per-status counts and the first ``limit`` cards of every column in one
+    statement: both come from window functions partitioned by status.
+    """
+    ranked = select(
+        Task,
+        func.row_number().over(partition_by=Task.status, order_by=BOARD_ORDER).label("position"),
+        func.count().over(partition_by=Task.status).label("column_count"),
+    ).where(Task.project_id == project_id).subquery()
+
+    result = await db.execute(
+        select(ranked).where(ranked.c.position <= limit).order_by(ranked.c.status, ranked.c.position)
+    )
+
+    counts: Dict[str, int] = {}
+    cards: Dict[str, List[Dict[str, Any]]] = {}
+    for row in result.mappings().all():
+        counts[row["status"]] = row["column_count"]
+        cards.setdefault(row["status"], []).append(task_card(row))
+
+    columns = []
+    for status in column_order(counts):
+        column_cards = cards.get(status, [])
+        count = counts.get(status, 0)
+        columns.append({
+            "status": status,
+            "count": count,
+            "tasks": column_cards,
+            "next_cursor": encode_cursor(column_cards[-1]) if count > len(column_cards) else None,
+        })
+    return {
+        "project_id": project_id,
+        "limit": limit,
+        "total": sum(counts.values()),
+        "columns": columns,
+    }
+
+
+async def read_column(
+    db: AsyncSession,
+    project_id: str,
+    status: str,
+    cursor: Optional[str] = None,
+    limit: int = BOARD_COLUMN_LIMIT,
+) -> Dict[str, Any]:
+    """Next page of one board column, keyset paginated from ``cursor``."""
+    query = select(Task).where(Task.project_id == project_id, Task.status == status)
+    if cursor:
+        query = query.where(after_cursor(cursor))
+    result = await db.execute(query.order_by(*BOARD_ORDER).limit(limit + 1))
+    cards = [task_card(task) for task in result.scalars().all()]
+    next_cursor = encode_cursor(cards[limit - 1]) if len(cards) > limit else None
+    return {
+        "status": status,
+        "tasks": cards[:limit],
+        "next_cursor": next_cursor,
+    }
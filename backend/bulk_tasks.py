@@ -0,0 +1,374 @@
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from pydantic import ValidationError
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from . import schemas
+from .board import board_cache
+from .database import Project, Task, User, UserRole
+from .membership import membership_cache
+from .search import remove_documents
+from .sync import record_changes
+from .timers import existence_cache
+
+# Configuration
+MAX_BULK_TASKS = int(os.getenv("MAX_BULK_TASKS", "1000"))
+IMPORT_CHUNK_SIZE = int(os.getenv("TASK_IMPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_ERRORS = 100
+IMPORT_READ_SIZE = 64 * 1024
+
+TASK_FIELDS = ("title", "description", "status", "due_date", "project_id", "assignee_id")
+
+
+class BulkResult:
+    """Per-item outcome of a bulk operation."""
+
+    def __init__(self):
+        self.results: List[Dict[str, Any]] = []
+        self.failed = 0
+        self.projects: Set[str] = set()  # projects whose tasks were written
+
+    def ok(self, index: int, task_id: str):
+        self.results.append({"index": index, "id": task_id, "ok": True, "error": None})
+
+    def fail(self, index: int, error: str, task_id: Optional[str] = None):
+        self.failed += 1
+        self.results.append({"index": index, "id": task_id, "ok": False, "error": error})
+
+    @property
+    def succeeded(self) -> int:
+        return len(self.results) - self.failed
+
+    def summary(self, committed: bool) -> Dict[str, Any]:
+        return {
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "committed": committed,
+            "results": sorted(self.results, key=lambda item: item["index"]),
+        }
+
+
+class BulkContext:
+    """Everything the items of one bulk request reference, loaded with one IN query per kind."""
+
+    def __init__(self, db: AsyncSession, user: User):
+        self.db = db
+        self.user = user
+        self.projects: Set[str] = set()
+        self.users: Set[str] = set()
+        self.tasks: Dict[str, Task] = {}
+        self.member_of: Optional[Set[str]] = None  # None: may touch every project
+
+    async def load(self, project_ids: Iterable[str] = (), user_ids: Iterable[str] = (), task_ids: Iterable[str] = ()):
+        task_ids = {task_id for task_id in task_ids if task_id}
+        if task_ids:
+            result = await self.db.execute(select(Task).where(Task.id.in_(task_ids)))
+            self.tasks = {task.id: task for task in result.scalars().all()}
+        project_ids = {project_id for project_id in project_ids if project_id}
+        project_ids |= {task.project_id for task in self.tasks.values()}
+        if project_ids:
+            result = await self.db.execute(select(Project.id).where(Project.id.in_(project_ids)))
+            self.projects = {row[0] for row in result.all()}
+        user_ids = {user_id for user_id in user_ids if user_id}
+        if user_ids:
+            result = await self.db.execute(select(User.id).where(User.id.in_(user_ids)))
+            self.users = {row[0] for row in result.all()}
+        if self.user.role == UserRole.EMPLOYEE:
+            self.member_of = await membership_cache.project_ids(self.db, self.user.id)
+
+    def can_use_project(self, project_id: str) -> bool:
+        return self.member_of is None or project_id in self.member_of
+
+    def can_change(self, task: Task) -> bool:
+        # Same rule as the single-task endpoints: own tasks or tasks in the user's projects
+        return self.member_of is None or task.assignee_id == self.user.id or task.project_id in self.member_of
+
+
+def _check_refs(context: BulkContext, project_id: Optional[str], assignee_id: Optional[str]) -> Optional[str]:
+    if project_id is not None and project_id not in context.projects:
+        return "Project not found"
+    if project_id is not None and not context.can_use_project(project_id):
+        return "Not enough permissions to use this project"
+    if assignee_id and assignee_id not in context.users:
+        return "Assignee not found"
+    return None
+
+
+async def bulk_create(db: AsyncSession, user: User, items: List[schemas.TaskCreate]) -> BulkResult:
+    result = BulkResult()
+    context = BulkContext(db, user)
+    await context.load(
+        project_ids=[item.project_id for item in items],
+        user_ids=[item.assignee_id for item in items],
+    )
+    now = datetime.utcnow()
+    for index, item in enumerate(items):
+        error = _check_refs(context, item.project_id, item.assignee_id)
+        if error:
+            result.fail(index, error)
+            continue
+        task = Task(id=str(uuid.uuid4()), **item.dict(), created_at=now, updated_at=now)
+        db.add(task)
+        result.projects.add(task.project_id)
+        result.ok(index, task.id)
+    return result
+
+
+async def bulk_update(db: AsyncSession, user: User, items: List[schemas.TaskBulkUpdateItem]) -> BulkResult:
+    result = BulkResult()
+    context = BulkContext(db, user)
+    await context.load(
+        user_ids=[item.assignee_id for item in items],
+        task_ids=[item.id for item in items],
+    )
+    now = datetime.utcnow()
+    for index, item in enumerate(items):
+        task = context.tasks.get(item.id)
+        if task is None:
+            result.fail(index, "Task not found", item.id)
+            continue
+        if not context.can_change(task):
+            result.fail(index, "Not enough permissions to update this task", item.id)
+            continue
+        changes = item.dict(exclude_unset=True, exclude={"id"})
+        error = _check_refs(context, None, changes.get("assignee_id"))
+        if error:
+            result.fail(index, error, item.id)
+            continue
+        for field, value in changes.items():
+            setattr(task, field, value)
+        task.updated_at = now
+        result.projects.add(task.project_id)
+        result.ok(index, task.id)
+    return result
+
+
+async def bulk_move(
+    db: AsyncSession,
+    user: User,
+    task_ids: List[str],
+    project_id: Optional[str] = None,
+    status: Optional[str] = None,
+) -> BulkResult:
+    """Move tasks to another project and/or status column."""
+    result = BulkResult()
+    context = BulkContext(db, user)
+    await context.load(project_ids=[project_id], task_ids=task_ids)
+    target_error = _check_refs(context, project_id, None)
+    now = datetime.utcnow()
+    for index, task_id in enumerate(task_ids):
+        task = context.tasks.get(task_id)
+        if task is None:
+            result.fail(index, "Task not found", task_id)
+            continue
+        if not context.can_change(task):
+            result.fail(index, "Not enough permissions to move this task", task_id)
+            continue
+        if target_error:
+            result.fail(index, target_error, task_id)
+            continue
+        result.projects.add(task.project_id)
+        if project_id is not None and project_id != task.project_id:
+            task.project_id = project_id
+            result.projects.add(project_id)
+            existence_cache.forget_task(task.id)
+        if status is not None:
+            task.status = status
+        task.updated_at = now
+        result.ok(index, task.id)
+    return result
+
+
+async def bulk_delete(db: AsyncSession, user: User, task_ids: List[str]) -> BulkResult:
+    result = BulkResult()
+    context = BulkContext(db, user)
+    await context.load(task_ids=task_ids)
+    deletable = []
+    for index, task_id in enumerate(task_ids):
+        task = context.tasks.get(task_id)
+        if task is None:
+            result.fail(index, "Task not found", task_id)
+        elif not context.can_change(task):
+            result.fail(index, "Not enough permissions to delete this task", task_id)
+        else:
+            deletable.append(task_id)
+            result.projects.add(task.project_id)
+            result.ok(index, task_id)
+    if deletable:
+        await db.execute(
+            delete(Task).where(Task.id.in_(deletable)).execution_options(synchronize_session=False)
+        )
+        await remove_documents(db, "task", deletable)
+        await record_changes(db, "task", [
+            (task_id, context.tasks[task_id].project_id, context.tasks[task_id].assignee_id)
+            for task_id in deletable
+        ], op="delete")
+        for task_id in deletable:
+            existence_cache.forget_task(task_id)
+    return result
+
+
+async def finish(db: AsyncSession, result: BulkResult, atomic: bool) -> bool:
+    """Commit the bulk transaction, or roll it all back if ``atomic`` and anything failed."""
+    if atomic and result.failed:
+        await db.rollback()
+        return False
+    await db.commit()
+    board_cache.invalidate(result.projects)
+    return True
+
+
+# Import
+
+def _clean_row(row: Dict[str, Any], default_project_id: Optional[str]) -> Dict[str, Any]:
+    data = {field: row.get(field) for field in TASK_FIELDS}
+    data = {field: (value.strip() if isinstance(value, str) else value) for field, value in data.items()}
+    data = {field: value for field, value in data.items() if value not in (None, "")}
+    if default_project_id and "project_id" not in data:
+        data["project_id"] = default_project_id
+    return data
+
+
+def read_csv_rows(file) -> Iterator[Dict[str, Any]]:
+    """Rows of a CSV upload with a header line, read incrementally."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()
+
+
+def _read_json_array(file) -> Iterator[Any]:
+    """
+    Items of a JSON array decoded one at a time from buffered reads, so only
+    the item being parsed is held in memory rather than the whole document.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig")
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def more() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = text.read(IMPORT_READ_SIZE)
+        buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+        return bool(chunk)
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or not more():
+                return buffer[pos:pos + 1]
+
+    try:
+        if next_char() != "[":
+            raise ValueError("Expected a JSON array")
+        pos += 1
+        if next_char() == "]":
+            pos += 1
+        else:
+            while True:
+                next_char()
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # The item may be cut off at the end of the buffer
+                    if eof or not more():
+                        raise
+                    continue
+                if end == len(buffer) and not eof and more():
+                    # A number or literal may go on in the next read
+                    continue
+                pos = end
+                yield item
+                separator = next_char()
+                pos += 1
+                if separator == "]":
+                    break
+                if separator != ",":
+                    raise ValueError("Expected ',' or ']' after an array item")
+        if next_char():
+            raise ValueError("Unexpected data after the JSON array")
+    finally:
+        text.detach()
+
+
+def read_json_rows(file) -> Iterator[Dict[str, Any]]:
+    """Objects of a JSON array upload, or of newline-delimited JSON, read incrementally."""
+    first = file.read(1)
+    while first and first.isspace():
+        first = file.read(1)
+    file.seek(0)
+    if first == b"[":
+        yield from _read_json_array(file)
+        return
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+async def import_tasks(
+    db: AsyncSession,
+    user: User,
+    rows: Iterable[Dict[str, Any]],
+    default_project_id: Optional[str] = None,
+    atomic: bool = False,
+) -> Dict[str, Any]:
+    """
+    Create tasks from parsed rows in chunks of ``IMPORT_CHUNK_SIZE``; every
+    chunk costs one IN query per referenced kind and everything is committed
+    in one transaction at the end.
+    """
+    result = BulkResult()
+    chunk: List[schemas.TaskCreate] = []
+    chunk_indexes: List[int] = []
+
+    async def flush():
+        if not chunk:
+            return
+        chunk_result = await bulk_create(db, user, chunk)
+        for item in chunk_result.results:
+            item["index"] = chunk_indexes[item["index"]]
+        result.results.extend(chunk_result.results)
+        result.failed += chunk_result.failed
+        result.projects |= chunk_result.projects
+        chunk.clear()
+        chunk_indexes.clear()
+
+    try:
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                result.fail(index, "Invalid row: expected an object")
+                continue
+            try:
+                chunk.append(schemas.TaskCreate(**_clean_row(row, default_project_id)))
+                chunk_indexes.append(index)
+            except ValidationError as e:
+                result.fail(index, f"Invalid row: {e}")
+                continue
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                await flush()
+        await flush()
+    except (csv.Error, ValueError, UnicodeDecodeError) as e:
+        await db.rollback()
+        return {"created": 0, "failed": result.failed + 1, "committed": False,
+                "errors": [{"index": None, "id": None, "ok": False, "error": f"Unreadable file: {e}"}]}
+
+    committed = await finish(db, result, atomic)
+    errors = sorted((item for item in result.results if not item["ok"]), key=lambda item: item["index"])
+    return {
+        "created": result.succeeded if committed else 0,
+        "failed": result.failed,
+        "committed": committed,
+        "errors": errors[:IMPORT_MAX_ERRORS],
+    }
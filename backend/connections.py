@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, Iterable, Optional, Set
+
+from fastapi import WebSocket
+
+# Configuration
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5.0"))
+# What to do when a client's outbound queue is full: "disconnect" it (the client
+# reconnects and reloads), or "drop" the oldest message. Dropping only suits feeds
+# that resync their sockets, like the presence board; it is chosen per connection.
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "disconnect")
+
+
+def user_topic(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def project_topic(project_id: str) -> str:
+    return f"project:{project_id}"
+
+
+def team_topic(manager_id: str) -> str:
+    return f"team:{manager_id}"
+
+
+def encode_message(message: Any) -> str:
+    return message if isinstance(message, str) else json.dumps(message, default=str)
+
+
+class Connection:
+    """One WebSocket with its own bounded outbound queue and writer task."""
+
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket, user_id: str, queue_size: int, policy: str):
+        self.manager = manager
+        self.websocket = websocket
+        self.user_id = user_id
+        self.policy = policy
+        self.topics: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Messages lost under the "drop" policy since the feed last resynced this socket
+        self.dropped = 0
+        self.closed = False
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def send(self, data: str) -> bool:
+        """Queue an already encoded message; never blocks the caller."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self.policy != "drop":
+            self.manager.disconnect(self)
+            return False
+        # Drop the oldest queued message to make room for the newest one
+        try:
+            self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        self.dropped += 1
+        self.queue.put_nowait(data)
+        return True
+
+    async def _write_loop(self):
+        try:
+            while True:
+                data = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(data), self.manager.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Send failed or timed out; the client is gone or too slow
+            self.manager.disconnect(self)
+
+    async def close(self):
+        self.closed = True
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+
+class ConnectionManager:
+    """
+    WebSocket fan-out engine.
+
+    Each socket gets a bounded queue drained by its own writer task, so a
+    slow client never stalls delivery to others. A user may hold several
+    sockets, and sockets subscribe to topics (per user, project or team).
+    Messages are encoded once and the same string is queued for every
+    recipient.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = WS_QUEUE_SIZE,
+        send_timeout: float = WS_SEND_TIMEOUT,
+        slow_consumer_policy: str = WS_SLOW_CONSUMER_POLICY,
+    ):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
+        self.active_connections: Dict[str, Set[Connection]] = {}
+        self.topics: Dict[str, Set[Connection]] = {}
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        client_id: str,
+        topics: Iterable[str] = (),
+        slow_consumer_policy: Optional[str] = None,
+    ) -> Connection:
+        await websocket.accept()
+        connection = Connection(
+            self, websocket, client_id, self.queue_size, slow_consumer_policy or self.slow_consumer_policy
+        )
+        self.active_connections.setdefault(client_id, set()).add(connection)
+        self.subscribe(connection, user_topic(client_id))
+        for topic in topics:
+            self.subscribe(connection, topic)
+        connection.start()
+        return connection
+
+    def disconnect(self, connection: Connection):
+        if connection.closed:
+            return
+        connection.closed = True
+        for topic in list(connection.topics):
+            self.unsubscribe(connection, topic)
+        sockets = self.active_connections.get(connection.user_id)
+        if sockets is not None:
+            sockets.discard(connection)
+            if not sockets:
+                del self.active_connections[connection.user_id]
+        asyncio.ensure_future(connection.close())
+
+    def subscribe(self, connection: Connection, topic: str):
+        connection.topics.add(topic)
+        self.topics.setdefault(topic, set()).add(connection)
+
+    def unsubscribe(self, connection: Connection, topic: str):
+        connection.topics.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.topics[topic]
+
+    def _fan_out(self, connections: Iterable[Connection], message: Any) -> int:
+        data = encode_message(message)
+        delivered = 0
+        for connection in list(connections):
+            if connection.send(data):
+                delivered += 1
+        return delivered
+
+    def publish(self, topic: str, message: Any) -> int:
+        """Queue a message for every socket subscribed to ``topic``."""
+        return self._fan_out(self.topics.get(topic, ()), message)
+
+    async def send_personal_message(self, message: Any, client_id: str) -> int:
+        return self.publish(user_topic(client_id), message)
+
+    async def broadcast(self, message: Any) -> int:
+        connections = {c for sockets in self.active_connections.values() for c in sockets}
+        return self._fan_out(connections, message)
+
+    def is_connected(self, client_id: str) -> bool:
+        return bool(self.active_connections.get(client_id))
+
+
+manager = ConnectionManager()
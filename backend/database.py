@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, Float, ForeignKey, Text, JSON, Date, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, Float, ForeignKey, Text, JSON, Date, Index, Enum as SQLAlchemyEnum, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from datetime import datetime, date
@@ -62,15 +62,30 @@ class User(Base):
     department = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     role = Column(SQLAlchemyEnum(UserRole), default=UserRole.EMPLOYEE)
+    manager_id = Column(String, ForeignKey("users.id"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
+    manager = relationship("User", remote_side=[id], back_populates="direct_reports")
+    direct_reports = relationship("User", back_populates="manager")
     projects = relationship("Project", back_populates="owner")
     time_entries = relationship("TimeEntry", back_populates="user")
     screenshots = relationship("Screenshot", back_populates="user")
     activity_logs = relationship("ActivityLog", back_populates="user")
     reports = relationship("Report", back_populates="creator")
+    notifications = relationship("Notification", back_populates="user")
+
+class UserHierarchy(Base):
+    """
+    Closure table of the reporting lines: one row per (manager, report) pair
+    at any depth, plus a depth 0 row for every user.
+    """
+    __tablename__ = "user_hierarchy"
+
+    ancestor_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    descendant_id = Column(String, ForeignKey("users.id"), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False, default=0)
 
 class Project(Base):
     __tablename__ = "projects"
@@ -92,6 +107,19 @@ class Project(Base):
     time_entries = relationship("TimeEntry", back_populates="project")
     tasks = relationship("Task", back_populates="project")
 
+class ProjectMember(Base):
+    """Users with access to a project; keyed user first for the per-user access checks."""
+    __tablename__ = "project_members"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    project_id = Column(String, ForeignKey("projects.id"), primary_key=True)
+    role = Column(String, nullable=False, default="member")
+    added_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_project_members_project_user", "project_id", "user_id"),
+    )
+
 class Task(Base):
     __tablename__ = "tasks"
 
@@ -109,6 +137,52 @@ class Task(Base):
     project = relationship("Project", back_populates="tasks")
     time_entries = relationship("TimeEntry", back_populates="task")
 
+    __table_args__ = (
+        # Board columns: one project's tasks per status in board order
+        Index("ix_tasks_project_status_due", "project_id", "status", "due_date", "created_at"),
+    )
+
+class SearchDocument(Base):
+    """
+    Searchable text of one user, project or task, kept in step with its row
+    by the search module and indexed by it per database (FTS5 or tsvector).
+    """
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)  # "user", "project" or "task"
+    ref_id = Column(String, nullable=False)
+    project_id = Column(String, nullable=True, index=True)  # for permission filtering
+    title = Column(String, nullable=False)
+    subtitle = Column(String, nullable=True)
+    body = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_search_documents_kind_ref", "kind", "ref_id", unique=True),
+    )
+
+class SyncChange(Base):
+    """
+    Change feed for client sync: the latest change of every user, project,
+    task and time entry, re-numbered on each write so ``seq`` orders changes
+    by when they happened. Deletes stay behind as tombstones.
+    """
+    __tablename__ = "sync_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)  # user, project, task, time_entry or access
+    ref_id = Column(String, nullable=False)
+    op = Column(String, nullable=False, default="upsert")  # "upsert" or "delete"
+    project_id = Column(String, nullable=True)  # for permission filtering
+    user_id = Column(String, nullable=True)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_sync_changes_kind_ref", "kind", "ref_id", unique=True),
+        # Never reuse a sequence number, even after the newest row is replaced
+        {"sqlite_autoincrement": True},
+    )
+
 class TimeEntry(Base):
     __tablename__ = "time_entries"
 
@@ -131,6 +205,19 @@ class TimeEntry(Base):
     screenshots = relationship("Screenshot", back_populates="time_entry")
     activity_logs = relationship("ActivityLog", back_populates="time_entry")
 
+    __table_args__ = (
+        # Range scans per user (timesheets, summaries)
+        Index("ix_time_entries_user_start", "user_id", "start_time"),
+        # At most one running timer per user; backs the in-memory timer registry
+        Index(
+            "uq_time_entries_running_user",
+            "user_id",
+            unique=True,
+            sqlite_where=text("end_time IS NULL"),
+            postgresql_where=text("end_time IS NULL"),
+        ),
+    )
+
 class Screenshot(Base):
     __tablename__ = "screenshots"
 
@@ -140,13 +227,74 @@ class Screenshot(Base):
     image_path = Column(String, nullable=False)
     thumbnail_path = Column(String, nullable=False)
     activity_level = Column(Integer, nullable=False)  # 0-100
-    window_title = Column(String, nullable=True)
-    application_name = Column(String, nullable=True)
+    # Interned names; see the interning module
+    application_id = Column(Integer, ForeignKey("applications.id"), nullable=True, index=True)
+    window_title_id = Column(Integer, ForeignKey("window_titles.id"), nullable=True)
+    # Free text of screenshots stored before interning, until backfilled
+    legacy_window_title = Column("window_title", String, nullable=True)
+    legacy_application_name = Column("application_name", String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     user = relationship("User", back_populates="screenshots")
     time_entry = relationship("TimeEntry", back_populates="screenshots")
+    application = relationship("Application", lazy="joined")
+    title = relationship("WindowTitle", lazy="joined")
+
+    __table_args__ = (
+        # Neighbouring screenshots of a time entry, for the app usage counters
+        Index("ix_screenshots_entry_created", "time_entry_id", "created_at"),
+    )
+
+    @property
+    def application_name(self) -> Optional[str]:
+        return self.application.name if self.application is not None else self.legacy_application_name
+
+    @property
+    def window_title(self) -> Optional[str]:
+        return self.title.title if self.title is not None else self.legacy_window_title
+
+class Application(Base):
+    """Distinct application names, referenced by id from screenshots."""
+    __tablename__ = "applications"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)
+
+class WindowTitle(Base):
+    """Distinct window titles, referenced by id from screenshots."""
+    __tablename__ = "window_titles"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    title = Column(String, nullable=False, unique=True)
+
+class AppUsageDaily(Base):
+    """
+    Seconds and screenshots per user, UTC day and application, kept up to
+    date as screenshots arrive. ``application_id`` 0 stands for screenshots
+    without an application name.
+    """
+    __tablename__ = "app_usage_daily"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    application_id = Column(Integer, primary_key=True)
+    seconds = Column(Integer, nullable=False, default=0)
+    screenshots = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_app_usage_daily_day", "day"),
+    )
+
+class IdempotencyKey(Base):
+    """Client-supplied keys of agent writes already applied, so replays are no-ops."""
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    key = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)  # timer_start, timer_stop or screenshot
+    result_id = Column(String, nullable=True)  # row the write created or changed
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
@@ -163,6 +311,11 @@ class ActivityLog(Base):
     user = relationship("User", back_populates="activity_logs")
     time_entry = relationship("TimeEntry", back_populates="activity_logs")
 
+    __table_args__ = (
+        # Range joins from screenshots to the samples of the same time entry
+        Index("ix_activity_logs_entry_timestamp", "time_entry_id", "timestamp"),
+    )
+
 class Report(Base):
     __tablename__ = "reports"
 
@@ -173,16 +326,100 @@ class Report(Base):
     end_date = Column(Date, nullable=False)
     user_ids = Column(JSON, nullable=False, default=list)
     project_ids = Column(JSON, nullable=False, default=list)
-    report_type = Column(String, nullable=False)  # daily, weekly, monthly, custom
+    report_type = Column(String, nullable=False)  # a registered type: time_entries, activity, screenshots
     metrics = Column(JSON, nullable=False, default=list)
+    format = Column(String, nullable=False, default="csv")  # csv, parquet or arrow
     created_by = Column(String, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    status = Column(String, default="pending")  # pending, processing, completed, failed
+    status = Column(String, default="pending")  # pending, processing, completed, failed, cancelling, cancelled, expired
     file_path = Column(String, nullable=True)
+    # Progress, written once per finished partition
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    partitions_done = Column(Integer, nullable=False, default=0)
+    partitions_total = Column(Integer, nullable=True)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    rows_estimated = Column(Integer, nullable=True)  # extrapolated from the finished partitions
 
     # Relationships
     creator = relationship("User", back_populates="reports")
 
+class ReportSchedule(Base):
+    """
+    Recurring digest of time per user, project and day, generated by the
+    report scheduler for its creator at ``hour`` (UTC) every day, or every
+    week on ``weekday`` (0 is Monday).
+    """
+    __tablename__ = "report_schedules"
+
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    name = Column(String, nullable=False)
+    frequency = Column(String, nullable=False)  # daily or weekly
+    hour = Column(Integer, nullable=False, default=7)
+    weekday = Column(Integer, nullable=False, default=0)
+    user_ids = Column(JSON, nullable=False, default=list)  # empty: everyone the creator may see
+    project_ids = Column(JSON, nullable=False, default=list)
+    format = Column(String, nullable=False, default="csv")
+    created_by = Column(String, ForeignKey("users.id"), nullable=False)
+    active = Column(Boolean, nullable=False, default=True)
+    next_run_at = Column(DateTime, nullable=False, index=True)
+    last_run_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class DailyTimeTotal(Base):
+    """Seconds of completed time entries per user, project and UTC day."""
+    __tablename__ = "daily_time_totals"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    project_id = Column(String, ForeignKey("projects.id"), primary_key=True)
+    seconds = Column(Integer, nullable=False, default=0)
+    billable_seconds = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_daily_time_totals_day", "day"),
+        Index("ix_daily_time_totals_project_day", "project_id", "day"),
+    )
+
+class ProjectTimeStats(Base):
+    """Running totals of completed time per project, kept alongside ``daily_time_totals``."""
+    __tablename__ = "project_time_stats"
+
+    project_id = Column(String, ForeignKey("projects.id"), primary_key=True)
+    total_seconds = Column(Integer, nullable=False, default=0)
+    billable_seconds = Column(Integer, nullable=False, default=0)
+    last_activity_at = Column(DateTime(timezone=True), nullable=True)
+
+class ProjectWeeklyTime(Base):
+    """Seconds of completed time per project and week (weeks start on Monday, UTC)."""
+    __tablename__ = "project_weekly_time"
+
+    project_id = Column(String, ForeignKey("projects.id"), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    seconds = Column(Integer, nullable=False, default=0)
+    billable_seconds = Column(Integer, nullable=False, default=0)
+
+class Notification(Base):
+    __tablename__ = "notifications"
+
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    title = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    notification_type = Column(String, default="info")  # info, success, warning, error
+    read = Column(Boolean, default=False, nullable=False)
+    link = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    read_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Relationships
+    user = relationship("User", back_populates="notifications")
+
+    __table_args__ = (
+        # Serves unread lists, unread counts and cursor pagination per user
+        Index("ix_notifications_user_read_created", "user_id", "read", "created_at"),
+    )
+
 # Create tables
 async def create_tables():
     async with engine.begin() as conn:
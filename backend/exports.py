@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import date, datetime
+from typing import Any, AsyncIterator, List, Mapping, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from .database import async_session
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _ndjson_lines(rows: Sequence[Mapping[str, Any]]) -> bytes:
+    # Result rows are RowMappings, which neither encoder accepts as objects
+    if orjson is not None:
+        return b"".join(
+            orjson.dumps(dict(row), default=_json_default, option=orjson.OPT_APPEND_NEWLINE) for row in rows
+        )
+    return "".join(json.dumps(dict(row), default=_json_default) + "\n" for row in rows).encode()
+
+
+def _csv_value(value: Any):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_lines(rows: Sequence[Mapping[str, Any]], columns: Optional[List[str]] = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if columns is not None:
+        writer.writerow(columns)
+    writer.writerows([_csv_value(value) for value in row.values()] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def export_chunks(query, fmt: str, compress: bool) -> AsyncIterator[bytes]:
+    """
+    Encoded chunks of every row of the column query ``query``.
+
+    Rows come from a server-side cursor in batches of ``EXPORT_BATCH_SIZE``
+    on a session of the stream's own, so memory stays constant however many
+    rows match. With ``compress`` the output is one gzip stream, flushed
+    after every batch so clients see data as it is produced.
+    """
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    header = [column.name for column in query.selected_columns] if fmt == "csv" else None
+
+    async with async_session() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.mappings().partitions(EXPORT_BATCH_SIZE):
+            if fmt == "csv":
+                chunk = _csv_lines(batch, header)
+                header = None
+            else:
+                chunk = _ndjson_lines(batch)
+            yield gzip.compress(chunk) + gzip.flush(zlib.Z_SYNC_FLUSH) if gzip else chunk
+
+    if header:
+        # No rows: a CSV export still names its columns
+        chunk = _csv_lines([], header)
+        yield gzip.compress(chunk) if gzip else chunk
+    if gzip:
+        yield gzip.flush()
+
+
+def export_response(query, fmt: str, name: str, accept_encoding: str = "") -> StreamingResponse:
+    """
+    Stream ``query`` as NDJSON or CSV, gzip-encoded when the client accepts
+    it, as an attachment named after ``name``.
+    """
+    media_type, extension = FORMATS[fmt]
+    compress = "gzip" in accept_encoding.lower()
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(export_chunks(query, fmt, compress), media_type=media_type, headers=headers)
@@ -0,0 +1,191 @@
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import and_, delete, func, insert, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .database import User, UserHierarchy
+from .pubsub import bus
+from .sync import record_access_change, record_changes
+
+# Bus channel telling other workers that reporting lines changed
+HIERARCHY_CHANNEL = "users.hierarchy"
+
+
+class HierarchyError(ValueError):
+    pass
+
+
+def in_team(query, user_column, manager_id: str):
+    """
+    Restrict ``query`` to rows whose ``user_column`` is ``manager_id`` or
+    anyone reporting to them, directly or not, with one join on the closure
+    table's primary key.
+    """
+    return query.join(
+        UserHierarchy,
+        and_(UserHierarchy.ancestor_id == manager_id, UserHierarchy.descendant_id == user_column)
+    )
+
+
+class TeamCache:
+    """
+    Per-manager set of user ids in their team (the manager included).
+
+    Loaded from the closure table on first use and dropped whenever the
+    hierarchy changes, on this worker directly and on others over the bus.
+    Writers invalidate after their commit, so no worker reloads the rows
+    being replaced; a load already running when the cache is dropped is
+    returned but not kept.
+    """
+
+    def __init__(self):
+        self._teams: Dict[str, Set[str]] = {}
+        self._generation = 0
+
+    async def member_ids(self, db: AsyncSession, manager_id: str) -> Set[str]:
+        team = self._teams.get(manager_id)
+        if team is None:
+            generation = self._generation
+            result = await db.execute(
+                select(UserHierarchy.descendant_id).where(UserHierarchy.ancestor_id == manager_id)
+            )
+            team = {row[0] for row in result.all()}
+            team.add(manager_id)
+            if generation == self._generation:
+                self._teams[manager_id] = team
+        return team
+
+    async def contains(self, db: AsyncSession, manager_id: str, user_id: str) -> bool:
+        return user_id in await self.member_ids(db, manager_id)
+
+    def invalidate(self):
+        """Drop every team here and on other workers; call once the change is committed."""
+        self._clear()
+        bus.publish(HIERARCHY_CHANNEL, {"origin": bus.worker_id})
+
+    async def handle_event(self, event: Dict[str, Any]):
+        if event.get("origin") != bus.worker_id:
+            self._clear()
+
+    def _clear(self):
+        self._generation += 1
+        self._teams.clear()
+
+
+team_cache = TeamCache()
+
+
+async def _subtree_ids(db: AsyncSession, user_id: str) -> List[str]:
+    result = await db.execute(
+        select(UserHierarchy.descendant_id).where(UserHierarchy.ancestor_id == user_id)
+    )
+    return [row[0] for row in result.all()]
+
+
+async def add_user(db: AsyncSession, user: User):
+    """
+    Insert the closure rows of a new user, inside the caller's transaction;
+    with a manager, the caller invalidates ``team_cache`` after committing.
+    """
+    await db.execute(insert(UserHierarchy).values(ancestor_id=user.id, descendant_id=user.id, depth=0))
+    if user.manager_id:
+        await set_manager(db, user.id, user.manager_id)
+
+
+async def set_manager(db: AsyncSession, user_id: str, manager_id: Optional[str]):
+    """
+    Move ``user_id`` and everyone below them under ``manager_id`` (or to the
+    top when ``None``), rewriting only the closure rows of that subtree.
+    Runs in the caller's transaction; the caller invalidates ``team_cache``
+    after committing.
+    """
+    subtree = await _subtree_ids(db, user_id)
+    if manager_id is not None:
+        if manager_id == user_id or manager_id in subtree:
+            raise HierarchyError("A user cannot report to themselves or to someone reporting to them")
+        result = await db.execute(select(User.id).where(User.id == manager_id))
+        if result.first() is None:
+            raise HierarchyError("Manager not found")
+
+    # Detach the subtree from its old ancestors
+    await db.execute(
+        delete(UserHierarchy)
+        .where(
+            UserHierarchy.descendant_id.in_(subtree),
+            UserHierarchy.ancestor_id.not_in(subtree)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    # Attach it below every ancestor of the new manager (the manager included)
+    if manager_id is not None:
+        above = select(UserHierarchy.ancestor_id, UserHierarchy.depth).where(
+            UserHierarchy.descendant_id == manager_id
+        ).subquery()
+        below = select(UserHierarchy.descendant_id, UserHierarchy.depth).where(
+            UserHierarchy.ancestor_id == user_id
+        ).subquery()
+        await db.execute(
+            insert(UserHierarchy).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+                .select_from(above.join(below, true()))
+            )
+        )
+
+    await db.execute(
+        update(User).where(User.id == user_id).values(manager_id=manager_id)
+        .execution_options(synchronize_session=False)
+    )
+    await record_changes(db, "user", [(user_id, None, user_id)])
+    await record_access_change(db)
+
+
+async def remove_user(db: AsyncSession, user: User):
+    """
+    Hand a departing user's direct reports to their manager and drop their
+    closure rows; the caller invalidates ``team_cache`` after committing.
+    """
+    result = await db.execute(select(User.id).where(User.manager_id == user.id))
+    for (report_id,) in result.all():
+        await set_manager(db, report_id, user.manager_id)
+    await db.execute(
+        delete(UserHierarchy)
+        .where((UserHierarchy.ancestor_id == user.id) | (UserHierarchy.descendant_id == user.id))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def rebuild_hierarchy(db: AsyncSession) -> int:
+    """Recompute the closure table from ``users.manager_id``; returns the row count."""
+    result = await db.execute(select(User.id, User.manager_id))
+    managers = dict(result.all())
+
+    rows = []
+    for user_id in managers:
+        seen = set()
+        ancestor, depth = user_id, 0
+        while ancestor is not None and ancestor not in seen:
+            seen.add(ancestor)
+            rows.append({"ancestor_id": ancestor, "descendant_id": user_id, "depth": depth})
+            ancestor, depth = managers.get(ancestor), depth + 1
+
+    await db.execute(delete(UserHierarchy))
+    if rows:
+        await db.execute(insert(UserHierarchy), rows)
+    await record_access_change(db)
+    await db.commit()
+    team_cache.invalidate()
+    return len(rows)
+
+
+async def sync_hierarchy(db: AsyncSession):
+    """Rebuild the closure table on startup if any user is missing from it."""
+    users = (await db.execute(select(func.count()).select_from(User))).scalar() or 0
+    self_rows = (await db.execute(
+        select(func.count()).select_from(UserHierarchy).where(UserHierarchy.depth == 0)
+    )).scalar() or 0
+    if users != self_rows:
+        count = await rebuild_hierarchy(db)
+        print(f"Rebuilt user hierarchy: {count} rows")
@@ -0,0 +1,52 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .database import IdempotencyKey
+
+# Configuration
+IDEMPOTENCY_KEY_DAYS = int(os.getenv("IDEMPOTENCY_KEY_DAYS", "30"))
+MAX_KEY_LENGTH = 100
+
+_NAMESPACE = uuid.UUID("6f0c8a52-3b1e-4c8e-9d7a-2f4b5c6d7e8f")
+
+
+def stable_id(user_id: str, key: str) -> str:
+    """Id derived from a client key, so a replayed write lands on the same row and file."""
+    return str(uuid.uuid5(_NAMESPACE, f"{user_id}:{key}"))
+
+
+async def seen_keys(db: AsyncSession, user_id: str, keys: Iterable[str]) -> Dict[str, IdempotencyKey]:
+    """Already applied keys of ``user_id`` among ``keys``, in one IN query."""
+    keys = list({key for key in keys if key})
+    if not keys:
+        return {}
+    result = await db.execute(
+        select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key.in_(keys))
+    )
+    return {row.key: row for row in result.scalars().all()}
+
+
+async def find_key(db: AsyncSession, user_id: str, key: str) -> Optional[IdempotencyKey]:
+    return (await seen_keys(db, user_id, [key])).get(key)
+
+
+async def remember_keys(db: AsyncSession, user_id: str, rows: Iterable[Dict[str, Optional[str]]]):
+    """Store ``{"key", "kind", "result_id"}`` rows in the caller's transaction."""
+    now = datetime.utcnow()
+    rows = [{**row, "user_id": user_id, "created_at": now} for row in rows]
+    if rows:
+        await db.execute(insert(IdempotencyKey), rows)
+
+
+async def purge_keys(db: AsyncSession) -> int:
+    """Forget keys older than ``IDEMPOTENCY_KEY_DAYS``; agents do not replay that far back."""
+    cutoff = datetime.utcnow() - timedelta(days=IDEMPOTENCY_KEY_DAYS)
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,112 @@
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from .database import Application, Screenshot, WindowTitle, async_session
+
+# Configuration
+INTERN_CACHE_SIZE = int(os.getenv("INTERN_CACHE_SIZE", "10000"))
+# Longer values are cut, so they fit the unique index
+MAX_INTERNED_LENGTH = 512
+
+
+def normalize(value: Optional[str]) -> Optional[str]:
+    value = value.strip()[:MAX_INTERNED_LENGTH] if value else None
+    return value or None
+
+
+class StringInterner:
+    """
+    Id of every distinct value of a dictionary table's text column.
+
+    Ids never change once assigned, so an in-process LRU can answer most
+    lookups without invalidation across workers. Misses are looked up and
+    inserted in a session of their own that commits at once: a caller's
+    rollback must not take away an id the cache already holds.
+    """
+
+    def __init__(self, model, column: str, size: int = INTERN_CACHE_SIZE):
+        self.model = model
+        self.column = getattr(model, column)
+        self.size = size
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+
+    async def id_for(self, value: Optional[str]) -> Optional[int]:
+        value = normalize(value)
+        if value is None:
+            return None
+        return (await self.ids_for([value]))[value]
+
+    async def ids_for(self, values: Iterable[Optional[str]]) -> Dict[str, int]:
+        """Ids of the normalized ``values``, interning the new ones in one round trip."""
+        ids: Dict[str, int] = {}
+        missing = set()
+        for value in filter(None, map(normalize, values)):
+            found = self._ids.get(value)
+            if found is None:
+                missing.add(value)
+            else:
+                self._ids.move_to_end(value)
+                ids[value] = found
+        if missing:
+            for value, found in (await self._load(missing)).items():
+                ids[value] = found
+                self._remember(value, found)
+        return ids
+
+    async def _load(self, values) -> Dict[str, int]:
+        async with async_session() as db:
+            dialect_name = db.get_bind().dialect.name
+            rows = [{self.column.key: value} for value in values]
+            if dialect_name in ("sqlite", "postgresql"):
+                if dialect_name == "sqlite":
+                    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                else:
+                    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                await db.execute(
+                    dialect_insert(self.model).on_conflict_do_nothing(index_elements=[self.column.key]),
+                    rows
+                )
+                await db.commit()
+            else:
+                result = await db.execute(select(self.column).where(self.column.in_(values)))
+                known = {row[0] for row in result.all()}
+                for row in rows:
+                    if row[self.column.key] in known:
+                        continue
+                    try:
+                        await db.execute(insert(self.model), [row])
+                        await db.commit()
+                    except IntegrityError:
+                        # Interned concurrently by another worker
+                        await db.rollback()
+            result = await db.execute(select(self.column, self.model.id).where(self.column.in_(values)))
+            return dict(result.all())
+
+    def _remember(self, value: str, value_id: int):
+        self._ids[value] = value_id
+        self._ids.move_to_end(value)
+        while len(self._ids) > self.size:
+            self._ids.popitem(last=False)
+
+
+applications = StringInterner(Application, "name")
+window_titles = StringInterner(WindowTitle, "title")
+
+
+# Names of screenshots as stored: interned, or free text of older rows
+APPLICATION_NAME = func.coalesce(Application.name, Screenshot.legacy_application_name)
+WINDOW_TITLE = func.coalesce(WindowTitle.title, Screenshot.legacy_window_title)
+
+
+def join_names(query):
+    """Outer-join the dictionary tables ``APPLICATION_NAME`` and ``WINDOW_TITLE`` read from."""
+    return query.outerjoin(
+        Application, Application.id == Screenshot.application_id
+    ).outerjoin(
+        WindowTitle, WindowTitle.id == Screenshot.window_title_id
+    )
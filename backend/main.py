@@ -12,8 +12,22 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from . import schemas, auth
-from .database import engine, get_db, create_tables, Base, User, UserRole
-from .routers import users, projects, time_entries, screenshots, reports, tasks
+from .database import engine, get_db, create_tables, Base, User, UserRole, async_session
+from .timers import timer_registry, TIMER_CHANNEL
+from .presence import presence
+from .realtime import start_realtime, stop_realtime
+from .notifications import unread_counter, COUNTER_CHANNEL
+from .hierarchy import add_user, sync_hierarchy, team_cache, HIERARCHY_CHANNEL
+from .membership import sync_memberships, membership_cache, MEMBERSHIP_CHANNEL
+from .board import board_cache, BOARD_CHANNEL
+from .search import sync_search
+from .sync import purge_tombstones, sync_change_log
+from .idempotency import purge_keys
+from .report_engine import shutdown_report_pool
+from .report_schedules import report_scheduler
+from .pubsub import bus
+from .responses import DefaultResponse
+from .routers import users, projects, time_entries, screenshots, reports, tasks, ws, notifications, timesheet, activity, search, sync, agent, exports, report_schedules, presence as presence_router
 
 # Create database tables on startup
 import asyncio
@@ -36,7 +50,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    default_response_class=DefaultResponse
 )
 
 # CORS middleware
@@ -56,6 +71,16 @@ app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
 app.include_router(time_entries.router, prefix="/api/time-entries", tags=["time-entries"])
 app.include_router(screenshots.router, prefix="/api/screenshots", tags=["screenshots"])
 app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
+app.include_router(report_schedules.router, prefix="/api/report-schedules", tags=["reports"])
+app.include_router(notifications.router, prefix="/api/notifications", tags=["notifications"])
+app.include_router(timesheet.router, prefix="/api/timesheet", tags=["timesheet"])
+app.include_router(activity.router, prefix="/api/activity", tags=["activity"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
+app.include_router(agent.router, prefix="/api/agent", tags=["agent"])
+app.include_router(exports.router, prefix="/api/exports", tags=["exports"])
+app.include_router(presence_router.router, prefix="/api/presence", tags=["presence"])
+app.include_router(ws.router, tags=["websocket"])
 
 # Authentication endpoints
 @app.post("/auth/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED, include_in_schema=False)
@@ -86,6 +111,8 @@ async def register_user(
     )
     
     db.add(new_user)
+    await db.flush()
+    await add_user(db, new_user)
     await db.commit()
     await db.refresh(new_user)
     return new_user
@@ -339,6 +366,29 @@ async def health_check():
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    # Rebuild the running timer registry from open time entries
+    async with async_session() as db:
+        await timer_registry.load(db)
+        await sync_hierarchy(db)
+        await sync_memberships(db)
+        await sync_search(db)
+        await sync_change_log(db)
+        await purge_tombstones(db)
+        await purge_keys(db)
+    presence.load(timer_registry)
+    await bus.subscribe(TIMER_CHANNEL, timer_registry.handle_event)
+    await bus.subscribe(COUNTER_CHANNEL, unread_counter.handle_event)
+    await bus.subscribe(HIERARCHY_CHANNEL, team_cache.handle_event)
+    await bus.subscribe(MEMBERSHIP_CHANNEL, membership_cache.handle_event)
+    await bus.subscribe(BOARD_CHANNEL, board_cache.handle_event)
+    await start_realtime()
+    report_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await report_scheduler.stop()
+    await stop_realtime()
+    shutdown_report_pool()
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=9000, reload=True)
@@ -0,0 +1,145 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, exists, insert, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .database import Project, ProjectMember, User
+from .pubsub import bus
+from .sync import record_access_change
+
+# Bus channel telling other workers whose project access changed
+MEMBERSHIP_CHANNEL = "projects.members"
+
+
+def accessible_to(query, project_column, user_id: str):
+    """
+    Restrict ``query`` to rows whose ``project_column`` is a project
+    ``user_id`` is a member of, as an EXISTS semi-join on the
+    ``(user_id, project_id)`` primary key.
+    """
+    return query.where(
+        exists().where(
+            ProjectMember.user_id == user_id,
+            ProjectMember.project_id == project_column
+        )
+    )
+
+
+class MembershipCache:
+    """
+    Per-user set of accessible project ids, for point permission checks.
+
+    Entries are dropped for the users whose memberships change, on this
+    worker directly and on others over the bus. Writers invalidate after
+    their commit; a load already running when entries are dropped is
+    returned but not kept.
+    """
+
+    def __init__(self):
+        self._projects: Dict[str, Set[str]] = {}
+        self._generation = 0
+
+    async def project_ids(self, db: AsyncSession, user_id: str) -> Set[str]:
+        projects = self._projects.get(user_id)
+        if projects is None:
+            generation = self._generation
+            result = await db.execute(
+                select(ProjectMember.project_id).where(ProjectMember.user_id == user_id)
+            )
+            projects = {row[0] for row in result.all()}
+            if generation == self._generation:
+                self._projects[user_id] = projects
+        return projects
+
+    async def can_access(self, db: AsyncSession, user_id: str, project_id: str) -> bool:
+        return project_id in await self.project_ids(db, user_id)
+
+    def invalidate(self, user_ids: Optional[Iterable[str]] = None):
+        """Drop entries here and on other workers; call once the change is committed."""
+        user_ids = None if user_ids is None else list(user_ids)
+        self._forget(user_ids)
+        bus.publish(MEMBERSHIP_CHANNEL, {"origin": bus.worker_id, "user_ids": user_ids})
+
+    async def handle_event(self, event: Dict[str, Any]):
+        if event.get("origin") != bus.worker_id:
+            self._forget(event.get("user_ids"))
+
+    def _forget(self, user_ids):
+        self._generation += 1
+        if user_ids is None:
+            self._projects.clear()
+            return
+        for user_id in user_ids:
+            self._projects.pop(user_id, None)
+
+
+membership_cache = MembershipCache()
+
+
+async def add_members(db: AsyncSession, project_id: str, user_ids: List[str], role: str = "member") -> Dict[str, List[str]]:
+    """
+    Add users to a project in one statement. Unknown and existing users are
+    skipped and reported back; the caller commits, then invalidates
+    ``membership_cache`` for the added users.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    result = await db.execute(select(User.id).where(User.id.in_(user_ids)))
+    known = {row[0] for row in result.all()}
+    result = await db.execute(
+        select(ProjectMember.user_id).where(
+            ProjectMember.project_id == project_id,
+            ProjectMember.user_id.in_(user_ids)
+        )
+    )
+    existing = {row[0] for row in result.all()}
+
+    added = [user_id for user_id in user_ids if user_id in known and user_id not in existing]
+    if added:
+        now = datetime.utcnow()
+        await db.execute(insert(ProjectMember), [
+            {"project_id": project_id, "user_id": user_id, "role": role, "added_at": now}
+            for user_id in added
+        ])
+        await record_access_change(db, added)
+    return {
+        "added": added,
+        "already_members": [user_id for user_id in user_ids if user_id in existing],
+        "not_found": [user_id for user_id in user_ids if user_id not in known],
+    }
+
+
+async def remove_members(db: AsyncSession, project_id: str, user_ids: List[str]) -> List[str]:
+    """
+    Remove users from a project in one statement; returns the ids that were
+    members. The caller commits, then invalidates ``membership_cache`` for them.
+    """
+    result = await db.execute(
+        delete(ProjectMember)
+        .where(ProjectMember.project_id == project_id, ProjectMember.user_id.in_(user_ids))
+        .returning(ProjectMember.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    removed = [row[0] for row in result.all()]
+    await record_access_change(db, removed)
+    return removed
+
+
+async def sync_memberships(db: AsyncSession):
+    """Make every project creator a member of their project (backfill for older rows)."""
+    missing = select(Project.id, Project.created_by, literal("owner")).where(
+        ~exists().where(
+            ProjectMember.project_id == Project.id,
+            ProjectMember.user_id == Project.created_by
+        )
+    )
+    result = await db.execute(
+        insert(ProjectMember).from_select(["project_id", "user_id", "role"], missing)
+    )
+    if result.rowcount:
+        await record_access_change(db)
+    await db.commit()
+    if result.rowcount:
+        membership_cache.invalidate()
+        print(f"Added {result.rowcount} project owner memberships")
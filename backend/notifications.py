@@ -0,0 +1,193 @@
+import base64
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .connections import user_topic
+from .database import Notification
+from .pubsub import bus
+from .realtime import publish_to_topic
+
+# Bus channel carrying unread counter changes between workers
+COUNTER_CHANNEL = "notifications.unread"
+# Cached counts are re-read after this long, bounding drift from missed bus messages
+UNREAD_COUNT_TTL = float(os.getenv("UNREAD_COUNT_TTL", "60"))  # seconds
+
+
+def notify(user_id: str, notification: Dict[str, Any]):
+    """Push a notification to every socket of ``user_id``, whichever worker holds it."""
+    publish_to_topic(user_topic(user_id), {"type": "notification", "notification": notification})
+
+
+class UnreadCounter:
+    """
+    Per-user unread notification counts kept in memory.
+
+    A user's count is read from the database and then maintained by ``add``
+    on insert and by ``set`` with the count re-read in mark-read's
+    transaction, so the badge poll rarely queries. Other workers learn about
+    changes over the pub/sub bus. Counts expire after ``ttl`` seconds, so a
+    missed message or a race between workers cannot leave one wrong for good.
+    """
+
+    def __init__(self, ttl: float = UNREAD_COUNT_TTL):
+        self.ttl = ttl
+        # user_id -> (expires_at, count)
+        self._counts: Dict[str, Tuple[float, int]] = {}
+
+    async def get(self, db: AsyncSession, user_id: str) -> int:
+        entry = self._counts.get(user_id)
+        if entry is not None and entry[0] >= time.monotonic():
+            return entry[1]
+        count = await count_unread(db, user_id)
+        self._store(user_id, count)
+        return count
+
+    def add(self, user_id: str, delta: int):
+        if not delta:
+            return
+        self._apply(user_id, delta)
+        bus.publish(COUNTER_CHANNEL, {"origin": bus.worker_id, "user_id": user_id, "delta": delta})
+
+    def set(self, user_id: str, count: int):
+        """Store a count just read from the database, here and on every worker."""
+        self._store(user_id, count)
+        bus.publish(COUNTER_CHANNEL, {"origin": bus.worker_id, "user_id": user_id, "count": count})
+
+    async def handle_event(self, event: Dict[str, Any]):
+        if event.get("origin") == bus.worker_id:
+            return
+        if "count" in event:
+            self._store(event["user_id"], event["count"])
+        else:
+            self._apply(event["user_id"], event["delta"])
+
+    def _store(self, user_id: str, count: int):
+        self._counts[user_id] = (time.monotonic() + self.ttl, count)
+
+    def _apply(self, user_id: str, delta: int):
+        # Users whose count was never loaded are left alone; their first read loads it
+        entry = self._counts.get(user_id)
+        if entry is not None:
+            self._counts[user_id] = (entry[0], max(0, entry[1] + delta))
+
+
+async def count_unread(db: AsyncSession, user_id: str) -> int:
+    result = await db.execute(
+        select(func.count()).select_from(Notification).where(
+            Notification.user_id == user_id,
+            Notification.read.is_(False)
+        )
+    )
+    return result.scalar() or 0
+
+
+unread_counter = UnreadCounter()
+
+
+def encode_cursor(notification: Notification) -> str:
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    created_at, _, notification_id = raw.partition("|")
+    return datetime.fromisoformat(created_at), notification_id
+
+
+async def create_notification(
+    db: AsyncSession,
+    user_id: str,
+    title: str,
+    message: str,
+    notification_type: str = "info",
+    link: Optional[str] = None,
+) -> Notification:
+    notification = Notification(
+        user_id=user_id,
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        link=link,
+        read=False,
+        created_at=datetime.utcnow(),
+    )
+    db.add(notification)
+    await db.commit()
+
+    unread_counter.add(user_id, 1)
+    notify(user_id, {
+        "id": notification.id,
+        "title": title,
+        "message": message,
+        "notification_type": notification_type,
+        "link": link,
+        "read": False,
+        "created_at": notification.created_at.isoformat(),
+    })
+    return notification
+
+
+async def list_notifications(
+    db: AsyncSession,
+    user_id: str,
+    read: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> Tuple[List[Notification], Optional[str]]:
+    """Newest first, keyset paginated on ``(created_at, id)``."""
+    query = select(Notification).where(Notification.user_id == user_id)
+    if read is not None:
+        query = query.where(Notification.read.is_(read))
+    if cursor:
+        created_at, notification_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Notification.created_at < created_at,
+                and_(Notification.created_at == created_at, Notification.id < notification_id)
+            )
+        )
+    query = query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit + 1)
+
+    result = await db.execute(query)
+    items = list(result.scalars().all())
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+async def mark_read(
+    db: AsyncSession,
+    user_id: str,
+    ids: Optional[List[str]] = None,
+    before: Optional[datetime] = None,
+) -> int:
+    """
+    Mark notifications read with a single UPDATE: the given ids, everything
+    created up to ``before``, or all of the user's unread notifications.
+    """
+    conditions = [Notification.user_id == user_id, Notification.read.is_(False)]
+    if ids is not None:
+        if not ids:
+            return 0
+        conditions.append(Notification.id.in_(ids))
+    if before is not None:
+        conditions.append(Notification.created_at <= before)
+
+    result = await db.execute(
+        update(Notification)
+        .where(*conditions)
+        .values(read=True, read_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    # Re-read rather than subtract, so concurrent creates and reads elsewhere are counted
+    remaining = await count_unread(db, user_id)
+    await db.commit()
+
+    unread_counter.set(user_id, remaining)
+    return result.rowcount or 0
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+# Configuration
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "10"))  # seconds
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "2048"))
+# Above this many (estimated) rows we trust the Postgres planner instead of running COUNT(*)
+ESTIMATE_THRESHOLD = int(os.getenv("COUNT_ESTIMATE_THRESHOLD", "100000"))
+
+
+class CountCache:
+    """Small TTL cache of list totals keyed by the hash of the filtered query."""
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL, max_entries: int = COUNT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, int, bool]] = {}
+
+    def get(self, key: str) -> Optional[Tuple[int, bool]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, total, estimated = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        return total, estimated
+
+    def set(self, key: str, total: int, estimated: bool = False):
+        if len(self._entries) >= self.max_entries:
+            self._evict()
+        self._entries[key] = (time.monotonic() + self.ttl, total, estimated)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _evict(self):
+        # Drop expired entries first, then the oldest half if still full
+        now = time.monotonic()
+        self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+        if len(self._entries) >= self.max_entries:
+            oldest = sorted(self._entries.items(), key=lambda item: item[1][0])
+            self._entries = dict(oldest[len(oldest) // 2:])
+
+
+count_cache = CountCache()
+
+
+def query_cache_key(query) -> str:
+    """Hash the SQL text and bound filter values of a query."""
+    compiled = query.compile()
+    params = sorted((name, repr(value)) for name, value in compiled.params.items())
+    return hashlib.sha1(f"{compiled}|{params}".encode("utf-8")).hexdigest()
+
+
+async def exact_count(db: AsyncSession, query) -> int:
+    # ORDER BY is irrelevant for counting and only slows the subquery down
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+    return (await db.execute(count_query)).scalar() or 0
+
+
+async def estimated_count(db: AsyncSession, query) -> Optional[int]:
+    """Row estimate from the Postgres planner, or None on other databases."""
+    dialect = db.get_bind().dialect
+    if dialect.name != "postgresql":
+        return None
+    try:
+        compiled = query.order_by(None).compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True}
+        )
+        connection = await db.connection()
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        print(f"Error estimating row count: {e}")
+        return None
+
+
+async def count_total(db: AsyncSession, query) -> Tuple[int, bool]:
+    """
+    Return ``(total, estimated)`` for a filtered list query.
+
+    Totals are cached for a few seconds per filter combination. On Postgres,
+    result sets the planner expects to be huge get the planner estimate
+    instead of a full COUNT(*).
+    """
+    key = query_cache_key(query)
+    cached = count_cache.get(key)
+    if cached is not None:
+        return cached
+
+    estimate = await estimated_count(db, query)
+    if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+        total, estimated = estimate, True
+    else:
+        total, estimated = await exact_count(db, query), False
+
+    count_cache.set(key, total, estimated)
+    return total, estimated
+
+
+async def paginate(
+    db: AsyncSession,
+    query,
+    skip: int = 0,
+    limit: int = 100,
+    with_total: bool = True,
+    scalars: bool = True,
+    mappings: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run one page of ``query`` and build the ``PaginatedResponse`` payload.
+
+    With ``with_total=False`` no count query runs at all; one extra row is
+    fetched instead so clients still know whether another page exists.
+    ``mappings=True`` returns the rows of a column query as plain dicts.
+    """
+    page_query = query.offset(skip).limit(limit if with_total else limit + 1)
+    result = await db.execute(page_query)
+    if mappings:
+        items: List[Any] = [dict(row) for row in result.mappings().all()]
+    else:
+        items = list(result.scalars().all() if scalars else result.all())
+
+    if with_total and len(items) < limit and (items or skip == 0):
+        # A short page is the last one, so the total is known without counting
+        total, estimated = skip + len(items), False
+        has_more = False
+    elif with_total:
+        total, estimated = await count_total(db, query)
+        has_more = skip + len(items) < total
+    else:
+        has_more = len(items) > limit
+        items = items[:limit]
+        total, estimated = None, False
+
+    return {
+        "items": items,
+        "total": total,
+        "page": skip // limit + 1 if limit > 0 else 1,
+        "size": limit,
+        "pages": (total + limit - 1) // limit if total is not None and limit > 0 else None,
+        "has_more": has_more,
+        "estimated": estimated,
+    }
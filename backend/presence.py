@@ -0,0 +1,237 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .connections import Connection, ConnectionManager, encode_message, manager, team_topic
+from .database import async_session
+from .hierarchy import team_cache
+from .pubsub import PubSub, bus
+
+# Configuration
+PRESENCE_TICK_SECONDS = float(os.getenv("PRESENCE_TICK_SECONDS", "0.25"))
+# Bus channel carrying state changes, so every worker keeps the same board
+PRESENCE_CHANNEL = "presence"
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class PresenceService:
+    """
+    Live "who is working now" board.
+
+    Current state per tracking user is kept in memory and fed by timer
+    start/stop and activity ingest. Changes travel over the pub/sub bus so
+    every worker applies them. They are coalesced per tick and only the
+    delta is pushed to subscribed sockets; a full snapshot is sent when a
+    socket connects.
+
+    Managers only see their team: each socket keeps the team set its last
+    snapshot was filtered with, and gets a new snapshot when that set
+    changes or when it dropped messages. ``team:<manager id>`` topics on
+    the general socket get the same feed for that team, as
+    ``presence.snapshot`` and ``presence.delta`` messages.
+    """
+
+    def __init__(self, connections: ConnectionManager, events: PubSub, tick: float = PRESENCE_TICK_SECONDS):
+        self.connections = connections
+        self.events = events
+        self.tick = tick
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Set[str] = set()
+        self._removed: Set[str] = set()
+        # connection -> (manager id or None for admins, team set last sent)
+        self._viewers: Dict[Connection, Tuple[Optional[str], Optional[Set[str]]]] = {}
+        # manager id -> team set last sent to the team's topic
+        self._topic_teams: Dict[str, Set[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # State updates
+
+    def load(self, timers):
+        """Seed the board from the running timer registry."""
+        for timer in timers.values():
+            self._apply_started(self._timer_state(timer))
+
+    def timer_started(self, timer):
+        self.events.publish(PRESENCE_CHANNEL, {"event": "started", "state": self._timer_state(timer)})
+
+    def timer_stopped(self, user_id: str):
+        self.events.publish(PRESENCE_CHANNEL, {"event": "stopped", "user_id": user_id})
+
+    def activity(self, user_id: str, activity_level: int, timestamp: Optional[datetime] = None):
+        self.events.publish(PRESENCE_CHANNEL, {
+            "event": "activity",
+            "user_id": user_id,
+            "activity_level": activity_level,
+            "timestamp": _isoformat(timestamp or datetime.utcnow()),
+        })
+
+    async def handle_event(self, event: Dict[str, Any]):
+        kind = event.get("event")
+        if kind == "started":
+            self._apply_started(event["state"])
+        elif kind == "stopped":
+            self._apply_stopped(event["user_id"])
+        elif kind == "activity":
+            self._apply_activity(event["user_id"], event["activity_level"], event["timestamp"])
+
+    def _timer_state(self, timer) -> Dict[str, Any]:
+        return {
+            "user_id": timer.user_id,
+            "time_entry_id": timer.id,
+            "project_id": timer.project_id,
+            "task_id": timer.task_id,
+            "started_at": _isoformat(timer.start_time),
+            "activity_level": None,
+            "last_activity_at": None,
+        }
+
+    def _apply_started(self, state: Dict[str, Any]):
+        self._state[state["user_id"]] = dict(state)
+        self._mark(state["user_id"])
+
+    def _apply_stopped(self, user_id: str):
+        if self._state.pop(user_id, None) is not None:
+            self._dirty.discard(user_id)
+            self._removed.add(user_id)
+
+    def _apply_activity(self, user_id: str, activity_level: int, timestamp: Optional[str]):
+        state = self._state.get(user_id)
+        if state is None:
+            # Activity without a running timer does not put anyone on the board
+            return
+        state["activity_level"] = activity_level
+        state["last_activity_at"] = timestamp
+        self._mark(user_id)
+
+    def _mark(self, user_id: str):
+        self._removed.discard(user_id)
+        self._dirty.add(user_id)
+
+    def snapshot(self, user_ids: Optional[Set[str]] = None) -> Dict[str, Any]:
+        users = self._state.values()
+        if user_ids is not None:
+            users = [state for state in users if state["user_id"] in user_ids]
+        return {"type": "snapshot", "users": list(users)}
+
+    # Subscribers
+
+    async def subscribe(self, connection: Connection, manager_id: Optional[str] = None):
+        """Send the board to ``connection``, limited to ``manager_id``'s team unless that is None."""
+        team = (await self._teams([manager_id]))[manager_id] if manager_id else None
+        self._viewers[connection] = (manager_id, team)
+        connection.send(encode_message(self.snapshot(team)))
+
+    def unsubscribe(self, connection: Connection):
+        self._viewers.pop(connection, None)
+
+    async def send_team_snapshot(self, connection: Connection, manager_id: str):
+        """Start a socket subscribed to ``team:<manager_id>`` off with that team's board."""
+        team = (await self._teams([manager_id]))[manager_id]
+        connection.send(encode_message(self._team_snapshot(manager_id, team)))
+
+    def _team_snapshot(self, manager_id: str, team: Set[str]) -> Dict[str, Any]:
+        return {"type": "presence.snapshot", "team": manager_id, "users": self.snapshot(team)["users"]}
+
+    async def _teams(self, manager_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        teams: Dict[str, Set[str]] = {}
+        manager_ids = set(manager_ids)
+        if manager_ids:
+            # The session only connects when a team is not cached
+            async with async_session() as db:
+                for manager_id in manager_ids:
+                    teams[manager_id] = await team_cache.member_ids(db, manager_id)
+        return teams
+
+    # Tick loop
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing presence updates: {e}")
+
+    async def flush(self):
+        changed = [self._state[user_id] for user_id in self._dirty if user_id in self._state]
+        removed = list(self._removed)
+        self._dirty = set()
+        self._removed = set()
+        self._viewers = {
+            connection: viewer for connection, viewer in self._viewers.items() if not connection.closed
+        }
+        topic_managers = [
+            topic.partition(":")[2] for topic in self.connections.topics if topic.startswith(team_topic(""))
+        ]
+        self._topic_teams = {
+            manager_id: team for manager_id, team in self._topic_teams.items() if manager_id in topic_managers
+        }
+        if not self._viewers and not topic_managers:
+            return
+
+        teams = await self._teams(
+            [manager_id for manager_id, _ in self._viewers.values() if manager_id is not None] + topic_managers
+        )
+        # One encoded delta per viewer scope, shared by its sockets
+        deltas: Dict[Optional[str], Optional[str]] = {}
+        for connection, (manager_id, sent_team) in list(self._viewers.items()):
+            team = teams.get(manager_id)
+            if connection.dropped or team != sent_team:
+                # A delta alone would leave the socket wrong: it lost messages or its team changed
+                connection.dropped = 0
+                self._viewers[connection] = (manager_id, team)
+                connection.send(encode_message(self.snapshot(team)))
+                continue
+            if manager_id not in deltas:
+                users, gone = self._filter(changed, removed, team)
+                deltas[manager_id] = (
+                    encode_message({"type": "delta", "users": users, "removed": gone}) if users or gone else None
+                )
+            if deltas[manager_id] is not None:
+                connection.send(deltas[manager_id])
+
+        for manager_id in topic_managers:
+            team = teams[manager_id]
+            if manager_id in self._topic_teams and team != self._topic_teams[manager_id]:
+                # Members joined or left: resend the team's board
+                self.connections.publish(team_topic(manager_id), self._team_snapshot(manager_id, team))
+            else:
+                users, gone = self._filter(changed, removed, team)
+                if users or gone:
+                    self.connections.publish(team_topic(manager_id), {
+                        "type": "presence.delta", "team": manager_id, "users": users, "removed": gone,
+                    })
+            self._topic_teams[manager_id] = team
+
+    @staticmethod
+    def _filter(
+        changed: List[Dict[str, Any]],
+        removed: List[str],
+        team: Optional[Set[str]]
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        if team is None:
+            return changed, removed
+        return (
+            [state for state in changed if state["user_id"] in team],
+            [user_id for user_id in removed if user_id in team],
+        )
+
+
+presence = PresenceService(manager, bus)
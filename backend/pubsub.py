@@ -0,0 +1,292 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional; only redis:// bus URLs need it
+    aioredis = None
+
+# Configuration
+# memory:// (single process), sqlite:///path/to/bus.db (one host, many workers) or redis://host:port/db
+PUBSUB_URL = os.getenv("PUBSUB_URL", "memory://")
+PUBSUB_TICK_SECONDS = float(os.getenv("PUBSUB_TICK_SECONDS", "0.05"))
+PUBSUB_RETENTION_SECONDS = float(os.getenv("PUBSUB_RETENTION_SECONDS", "60"))
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+class PubSub:
+    """
+    Base class for the cross-worker message bus.
+
+    ``publish`` only buffers; once per tick the buffer is sent as one batch
+    per channel. Every worker, the publisher included, receives each batch
+    and hands the messages to its local handlers, so delivery works the same
+    whether one or many workers are running.
+    """
+
+    def __init__(self, tick: float = PUBSUB_TICK_SECONDS):
+        self.tick = tick
+        self.worker_id = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._pending: Dict[str, List[Any]] = defaultdict(list)
+        self._tasks: List[asyncio.Task] = []
+        self._started = False
+
+    def publish(self, channel: str, message: Any):
+        self._pending[channel].append(message)
+
+    async def subscribe(self, channel: str, handler: Handler):
+        self._handlers[channel].append(handler)
+
+    async def start(self):
+        if self._started:
+            return
+        self._started = True
+        await self._open()
+        self._tasks.append(asyncio.create_task(self._flush_loop()))
+
+    async def _open(self):
+        """Backend specific setup, e.g. starting a receive loop."""
+
+    async def stop(self):
+        if not self._started:
+            return
+        self._started = False
+        await self.flush()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing pub/sub batch: {e}")
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, defaultdict(list)
+        await self._send_batches({channel: messages for channel, messages in pending.items() if messages})
+
+    async def _send_batches(self, batches: Dict[str, List[Any]]):
+        raise NotImplementedError
+
+    async def _dispatch(self, channel: str, messages: List[Any]):
+        for handler in list(self._handlers.get(channel, ())):
+            for message in messages:
+                try:
+                    await handler(message)
+                except Exception as e:
+                    print(f"Error handling pub/sub message on {channel}: {e}")
+
+    def _encode(self, messages: List[Any]) -> str:
+        return json.dumps({"origin": self.worker_id, "messages": messages}, default=str)
+
+    def _decode(self, payload) -> List[Any]:
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8")
+        return json.loads(payload)["messages"]
+
+
+class InProcessPubSub(PubSub):
+    """Delivers batches to handlers in the same process; for tests and single-worker runs."""
+
+    async def _send_batches(self, batches: Dict[str, List[Any]]):
+        for channel, messages in batches.items():
+            await self._dispatch(channel, messages)
+
+
+class SQLitePubSub(PubSub):
+    """
+    Broker for several workers on one host, backed by a shared SQLite file.
+
+    Each batch is one row; workers poll for rows newer than the last one they
+    saw, and old rows are pruned after ``retention`` seconds.
+    """
+
+    def __init__(self, path: str, tick: float = PUBSUB_TICK_SECONDS, retention: float = PUBSUB_RETENTION_SECONDS):
+        super().__init__(tick)
+        self.path = path
+        self.retention = retention
+        self._last_id = 0
+        self._last_prune = 0.0
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _setup(self) -> int:
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pubsub_messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+                "payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM pubsub_messages").fetchone()[0]
+
+    def _insert(self, rows):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO pubsub_messages (channel, payload, created_at) VALUES (?, ?, ?)", rows
+            )
+
+    def _fetch(self, last_id: int, prune_before: Optional[float]):
+        with self._connect() as conn:
+            if prune_before is not None:
+                conn.execute("DELETE FROM pubsub_messages WHERE created_at < ?", (prune_before,))
+            return conn.execute(
+                "SELECT id, channel, payload FROM pubsub_messages WHERE id > ? ORDER BY id", (last_id,)
+            ).fetchall()
+
+    async def _open(self):
+        self._last_id = await asyncio.to_thread(self._setup)
+        self._tasks.append(asyncio.create_task(self._poll_loop()))
+
+    async def _send_batches(self, batches: Dict[str, List[Any]]):
+        now = time.time()
+        rows = [(channel, self._encode(messages), now) for channel, messages in batches.items()]
+        await asyncio.to_thread(self._insert, rows)
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                prune_before = None
+                now = time.time()
+                if now - self._last_prune > self.retention:
+                    prune_before = now - self.retention
+                    self._last_prune = now
+                for row_id, channel, payload in await asyncio.to_thread(self._fetch, self._last_id, prune_before):
+                    self._last_id = row_id
+                    await self._dispatch(channel, self._decode(payload))
+            except Exception as e:
+                print(f"Error polling pub/sub messages: {e}")
+
+
+class RedisPubSub(PubSub):
+    """
+    Bus over the Redis PUBLISH/SUBSCRIBE protocol.
+
+    ``client`` is a ``redis.asyncio.Redis`` or anything with the same
+    ``publish``/``pubsub`` surface, such as ``InMemoryRedis``.
+    """
+
+    def __init__(self, client, tick: float = PUBSUB_TICK_SECONDS, prefix: str = "activity-tracker:"):
+        super().__init__(tick)
+        self.client = client
+        self.prefix = prefix
+        self._pubsub = None
+
+    async def subscribe(self, channel: str, handler: Handler):
+        await super().subscribe(channel, handler)
+        if self._pubsub is not None:
+            await self._pubsub.subscribe(self.prefix + channel)
+
+    async def _open(self):
+        self._pubsub = self.client.pubsub()
+        channels = [self.prefix + channel for channel in self._handlers]
+        if channels:
+            await self._pubsub.subscribe(*channels)
+        self._tasks.append(asyncio.create_task(self._listen_loop()))
+
+    async def stop(self):
+        await super().stop()
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+
+    async def _send_batches(self, batches: Dict[str, List[Any]]):
+        for channel, messages in batches.items():
+            await self.client.publish(self.prefix + channel, self._encode(messages))
+
+    async def _listen_loop(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    await asyncio.sleep(0)
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode("utf-8")
+                await self._dispatch(channel[len(self.prefix):], self._decode(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error reading pub/sub messages: {e}")
+                await asyncio.sleep(self.tick)
+
+
+class InMemoryRedis:
+    """Stand-in for the subset of the Redis client used by ``RedisPubSub``."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List["InMemoryRedisPubSub"]] = defaultdict(list)
+
+    async def publish(self, channel: str, data: str) -> int:
+        subscribers = self._subscribers.get(channel, [])
+        for pubsub in subscribers:
+            pubsub.queue.put_nowait({"type": "message", "channel": channel, "data": data})
+        return len(subscribers)
+
+    def pubsub(self) -> "InMemoryRedisPubSub":
+        return InMemoryRedisPubSub(self)
+
+
+class InMemoryRedisPubSub:
+    def __init__(self, broker: InMemoryRedis):
+        self.broker = broker
+        self.channels: List[str] = []
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, *channels: str):
+        for channel in channels:
+            if channel not in self.channels:
+                self.channels.append(channel)
+                self.broker._subscribers[channel].append(self)
+
+    async def get_message(self, ignore_subscribe_messages: bool = True, timeout: float = 0.0):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        for channel in self.channels:
+            self.broker._subscribers[channel].remove(self)
+        self.channels = []
+
+
+def create_pubsub(url: str = PUBSUB_URL) -> PubSub:
+    if url.startswith("sqlite:///"):
+        return SQLitePubSub(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if aioredis is None:
+            raise RuntimeError(f"PUBSUB_URL {url!r} needs the 'redis' package: pip install redis")
+        return RedisPubSub(aioredis.from_url(url))
+    return InProcessPubSub()
+
+
+bus = create_pubsub()
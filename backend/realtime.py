@@ -0,0 +1,29 @@
+from typing import Any
+
+from .connections import manager
+from .presence import presence, PRESENCE_CHANNEL
+from .pubsub import bus
+
+# Bus channel carrying messages for WebSocket topics
+WS_CHANNEL = "ws"
+
+
+def publish_to_topic(topic: str, message: Any):
+    """Deliver ``message`` to subscribers of ``topic`` on every worker."""
+    bus.publish(WS_CHANNEL, {"topic": topic, "message": message})
+
+
+async def _deliver_to_sockets(envelope: dict):
+    manager.publish(envelope["topic"], envelope["message"])
+
+
+async def start_realtime():
+    await bus.subscribe(WS_CHANNEL, _deliver_to_sockets)
+    await bus.subscribe(PRESENCE_CHANNEL, presence.handle_event)
+    await bus.start()
+    presence.start()
+
+
+async def stop_realtime():
+    await presence.stop()
+    await bus.stop()
@@ -0,0 +1,243 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .report_formats import ReportCancelled, ReportColumn, merge_report_parts, report_path, write_report
+
+# Configuration
+REPORTS_DIR = "reports"
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", str(os.cpu_count() or 1)))
+REPORT_PARTITION_DAYS = int(os.getenv("REPORT_PARTITION_DAYS", "7"))
+REPORT_PARTITION_USERS = int(os.getenv("REPORT_PARTITION_USERS", "200"))
+
+# (start date, end date exclusive, user ids or None for all)
+Partition = Tuple[date, date, Optional[List[str]]]
+
+
+class ReportDefinition(NamedTuple):
+    """
+    One report type: ``query`` builds a select of exactly ``columns`` from
+    the report's parameters, ordered within a partition. Partitions split
+    the report on ``time_column`` by date range and on ``user_column`` by
+    user set, so each partition's rows follow the previous one's. Queries
+    that must filter before a window or aggregate leave both columns
+    ``None`` and apply ``params["partition"]`` (start, stop, user ids)
+    themselves.
+    """
+    query: Callable[[Dict[str, Any]], Any]
+    columns: List[ReportColumn]
+    time_column: Any
+    user_column: Any
+    file_prefix: str
+
+
+REPORT_TYPES: Dict[str, ReportDefinition] = {}
+
+
+def register_report(report_type: str, definition: ReportDefinition):
+    REPORT_TYPES[report_type] = definition
+
+
+# Called after every finished partition with (partitions done, partitions total, rows so far)
+ProgressCallback = Callable[[int, int, int], Awaitable[None]]
+
+
+def _cancel_marker(report_id: str) -> Path:
+    return Path(REPORTS_DIR) / f".cancel_{report_id}"
+
+
+def request_cancel(report_id: str):
+    """
+    Ask a running report to stop. The marker file is seen by the partition
+    workers between batches, in whichever process they run.
+    """
+    _cancel_marker(report_id).touch()
+
+
+def is_cancelled(report_id: str) -> bool:
+    return _cancel_marker(report_id).exists()
+
+
+def clear_cancel(report_id: str):
+    _cancel_marker(report_id).unlink(missing_ok=True)
+
+
+def progress_snapshot(report, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Progress of ``report`` with an ETA extrapolated from its finished partitions."""
+    now = now or datetime.utcnow()
+    done, total = report.partitions_done or 0, report.partitions_total
+    percent = 100.0 if report.status == "completed" else (100.0 * done / total if total else 0.0)
+    eta = None
+    if report.status == "processing" and report.started_at and done and total:
+        elapsed = (now - report.started_at).total_seconds()
+        eta = round(elapsed * (total - done) / done, 1)
+    return {
+        "id": report.id,
+        "status": report.status,
+        "partitions_done": done,
+        "partitions_total": total,
+        "rows_processed": report.rows_processed or 0,
+        "rows_estimated": report.rows_estimated,
+        "percent": round(percent, 1),
+        "eta_seconds": eta,
+    }
+
+
+def plan_partitions(params: Dict[str, Any], workers: int = REPORT_WORKERS) -> List[Partition]:
+    """Date ranges of ``REPORT_PARTITION_DAYS`` times user groups of ``REPORT_PARTITION_USERS``."""
+    start, end = params["start_date"], params["end_date"] + timedelta(days=1)
+    if workers <= 1:
+        return [(start, end, None)]
+
+    ranges = []
+    while start < end:
+        stop = min(start + timedelta(days=REPORT_PARTITION_DAYS), end)
+        ranges.append((start, stop))
+        start = stop
+
+    user_ids = params.get("user_ids") or []
+    groups: List[Optional[List[str]]] = [None]
+    if len(user_ids) > REPORT_PARTITION_USERS:
+        groups = [user_ids[i:i + REPORT_PARTITION_USERS] for i in range(0, len(user_ids), REPORT_PARTITION_USERS)]
+    return [(start, stop, group) for start, stop in ranges for group in groups]
+
+
+async def write_partition(report_type: str, params: Dict[str, Any], index: int, partition: Partition) -> Tuple[Path, int]:
+    """
+    Write one partition of a report to its own part file, on a session of
+    its own, and return the file and its row count.
+    """
+    from .database import async_session
+
+    definition = REPORT_TYPES[report_type]
+    start, stop, user_ids = partition
+    bounds = (datetime.combine(start, time.min), datetime.combine(stop, time.min), user_ids)
+    query = definition.query({**params, "partition": bounds})
+    if definition.time_column is not None:
+        query = query.where(definition.time_column >= bounds[0], definition.time_column < bounds[1])
+        if user_ids is not None:
+            query = query.where(definition.user_column.in_(user_ids))
+
+    stem = Path(REPORTS_DIR) / f"{definition.file_prefix}_{params['id']}_part{index}"
+    async with async_session() as db:
+        return await write_report(
+            db, query, definition.columns, params["format"], stem,
+            should_stop=lambda: is_cancelled(params["id"]), header=index == 0
+        )
+
+
+async def _write_partition_in_worker(*args) -> Tuple[Path, int]:
+    from .database import engine
+
+    try:
+        return await write_partition(*args)
+    finally:
+        # The worker's event loop ends with this call; close its connections with it
+        await engine.dispose()
+
+
+def _run_partition(args) -> Tuple[Path, int]:
+    # Entry point in the worker process; importing the types fills the registry
+    from . import report_types  # noqa: F401
+
+    return asyncio.run(_write_partition_in_worker(*args))
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned workers start with fresh engines instead of the parent's connections
+        _pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_report_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def generate_report(report_type: str, params: Dict[str, Any], progress: Optional[ProgressCallback] = None) -> Path:
+    """
+    Generate a report of a registered type and return its file.
+
+    The report is split into partitions written concurrently by a pool of
+    ``REPORT_WORKERS`` processes, then merged in partition order. With one
+    partition or one worker it runs inline. ``progress`` is awaited after
+    each partition. On cancellation the partitions finished in a row from
+    the start are merged and handed back on ``ReportCancelled.partial``.
+    """
+    definition = REPORT_TYPES.get(report_type)
+    if definition is None:
+        raise ValueError(f"Unknown report type: {report_type}")
+
+    fmt = params["format"]
+    path = report_path(Path(REPORTS_DIR) / f"{definition.file_prefix}_{params['id']}", fmt)
+    partitions = plan_partitions(params)
+    if is_cancelled(params["id"]):
+        raise ReportCancelled()
+
+    if len(partitions) == 1:
+        part, rows = await write_partition(report_type, params, 0, partitions[0])
+        if progress is not None:
+            await progress(1, 1, rows)
+        return await asyncio.to_thread(merge_report_parts, fmt, [part], path)
+
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    futures = {
+        loop.run_in_executor(pool, _run_partition, (report_type, params, index, partition)): index
+        for index, partition in enumerate(partitions)
+    }
+    parts: Dict[int, Path] = {}
+    rows_done = 0
+    cancelled = False
+    pending = set(futures)
+    try:
+        while pending and not cancelled:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    part, rows = future.result()
+                except ReportCancelled:
+                    cancelled = True
+                    continue
+                parts[futures[future]] = part
+                rows_done += rows
+            cancelled = cancelled or is_cancelled(params["id"])
+            if progress is not None:
+                await progress(len(parts), len(partitions), rows_done)
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        for part in parts.values():
+            os.remove(part)
+        raise
+
+    if cancelled:
+        # Stop queued partitions; running ones see the marker at their next batch
+        pending = list(pending)
+        for future in pending:
+            future.cancel()
+        for future, result in zip(pending, await asyncio.gather(*pending, return_exceptions=True)):
+            if isinstance(result, tuple):
+                parts[futures[future]] = result[0]
+        finished = []
+        for index in range(len(partitions)):
+            if index not in parts:
+                break
+            finished.append(parts.pop(index))
+        for part in parts.values():
+            os.remove(part)
+        partial = await asyncio.to_thread(merge_report_parts, fmt, finished, path) if finished else None
+        raise ReportCancelled(partial)
+
+    return await asyncio.to_thread(merge_report_parts, fmt, [parts[index] for index in range(len(partitions))], path)
@@ -0,0 +1,294 @@
+import csv
+import gzip
+import io
+import os
+import shutil
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional; only the CSV format is available without it
+    pa = None
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used without it
+    zstandard = None
+
+# Rows fetched from the cursor and written per record batch
+REPORT_BATCH_SIZE = 10000
+
+# Report format -> (file extension, media type)
+FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+MEDIA_TYPES = {extension: media_type for extension, media_type in FORMATS.values()}
+
+COLUMNAR_FORMATS = {"parquet", "arrow"}
+
+# How CSV reports are stored: "gzip", "zstd" or "none". Columnar formats
+# compress their pages and buffers with zstd internally instead.
+REPORT_COMPRESSION = os.getenv("REPORT_COMPRESSION", "gzip")
+if REPORT_COMPRESSION == "zstd" and zstandard is None:
+    REPORT_COMPRESSION = "gzip"
+
+# Content-Encoding -> file suffix
+ENCODINGS = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def _iso(value) -> str:
+    if value is None:
+        return ""
+    # SQLite returns func.date() as text already
+    return value.isoformat() if isinstance(value, (datetime, date)) else str(value)
+
+
+class ReportColumn(NamedTuple):
+    """
+    One output column: its header, its type (``string``, ``int``,
+    ``float``, ``bool``, ``date`` or ``timestamp``) and how CSV renders it.
+    """
+    name: str
+    kind: str
+    to_csv: Optional[Callable[[Any], Any]] = None
+
+
+def text(name: str) -> ReportColumn:
+    return ReportColumn(name, "string", lambda value: value or "")
+
+
+def number(name: str, digits: Optional[int] = None) -> ReportColumn:
+    if digits is None:
+        return ReportColumn(name, "int")
+    return ReportColumn(name, "float", lambda value: f"{value or 0:.{digits}f}")
+
+
+def flag(name: str) -> ReportColumn:
+    return ReportColumn(name, "bool", lambda value: "Yes" if value else "No")
+
+
+def day(name: str) -> ReportColumn:
+    return ReportColumn(name, "date", _iso)
+
+
+def timestamp(name: str) -> ReportColumn:
+    return ReportColumn(name, "timestamp", _iso)
+
+
+def format_available(fmt: str) -> bool:
+    return fmt in FORMATS and (fmt not in COLUMNAR_FORMATS or pa is not None)
+
+
+def _open_compressed(path: Path, encoding: Optional[str]):
+    if encoding == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+    return open(path, "wb")
+
+
+class CsvReportWriter:
+    """
+    CSV compressed as it is written. Parts written without a header can be
+    appended to a part with one: gzip members and zstd frames concatenate.
+    """
+
+    def __init__(self, path: Path, columns: Sequence[ReportColumn], header: bool = True):
+        encoding = next((name for name, suffix in ENCODINGS.items() if path.name.endswith(suffix)), None)
+        self._file = io.TextIOWrapper(_open_compressed(path, encoding), encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        if header:
+            self._writer.writerow([column.name for column in columns])
+        self._formatters = [column.to_csv for column in columns]
+
+    def write(self, rows: Sequence[Sequence[Any]]):
+        formatters = self._formatters
+        self._writer.writerows(
+            [value if to_csv is None else to_csv(value) for to_csv, value in zip(formatters, row)]
+            for row in rows
+        )
+
+    def close(self):
+        self._file.close()
+
+
+def _ipc_options():
+    return pa.ipc.IpcWriteOptions(compression="zstd") if pa is not None else None
+
+
+IPC_OPTIONS = _ipc_options()
+
+
+class ColumnarReportWriter:
+    """
+    Parquet or Arrow IPC file written one record batch per cursor chunk.
+    Each column is converted as a whole by Arrow rather than row by row.
+    """
+
+    def __init__(self, path: Path, columns: Sequence[ReportColumn], fmt: str):
+        types = {
+            "string": pa.string(),
+            "int": pa.int64(),
+            "float": pa.float64(),
+            "bool": pa.bool_(),
+            "date": pa.date32(),
+            "timestamp": pa.timestamp("us"),
+        }
+        self._schema = pa.schema([pa.field(column.name, types[column.kind]) for column in columns])
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(str(path), self._schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(str(path), self._schema, options=IPC_OPTIONS)
+
+    def write(self, rows: Sequence[Sequence[Any]]):
+        if not rows:
+            return
+        arrays = [
+            self._to_array(values, field.type)
+            for values, field in zip(zip(*rows), self._schema)
+        ]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+
+    @staticmethod
+    def _to_array(values, arrow_type):
+        try:
+            return pa.array(values, type=arrow_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Drivers that return dates or numbers as text: parse them in bulk
+            return pa.array(values).cast(arrow_type)
+
+    def close(self):
+        self._writer.close()
+
+
+def report_path(stem: Path, fmt: str) -> Path:
+    """File a report of ``fmt`` is stored in: CSV gets the compression suffix."""
+    suffix = FORMATS[fmt][0]
+    if fmt == "csv" and REPORT_COMPRESSION in ENCODINGS:
+        suffix += ENCODINGS[REPORT_COMPRESSION]
+    return stem.parent / (stem.name + suffix)
+
+
+def describe_report_file(path: str) -> Tuple[str, Optional[str], str]:
+    """Media type, content encoding and decoded file name of a stored report."""
+    name = os.path.basename(path)
+    encoding = None
+    for candidate, suffix in ENCODINGS.items():
+        if name.endswith(suffix):
+            encoding, name = candidate, name[:-len(suffix)]
+    media_type = MEDIA_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream")
+    return media_type, encoding, name
+
+
+def read_decoded(path: str, encoding: Optional[str], chunk_size: int = 64 * 1024):
+    """Chunks of a stored report, decompressed, for clients that do not accept its encoding."""
+    with open(path, "rb") as raw:
+        if encoding == "gzip":
+            source = gzip.GzipFile(fileobj=raw)
+        elif encoding == "zstd":
+            source = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        else:
+            source = raw
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def open_report_writer(fmt: str, path: Path, columns: Sequence[ReportColumn], header: bool = True):
+    if fmt in COLUMNAR_FORMATS:
+        return ColumnarReportWriter(path, columns, fmt)
+    return CsvReportWriter(path, columns, header)
+
+
+class ReportCancelled(Exception):
+    """Raised between batches when a report's generation has been cancelled."""
+
+    def __init__(self, partial: Optional[Path] = None):
+        super().__init__("Report cancelled")
+        self.partial = partial
+
+
+async def write_report(
+    db,
+    query,
+    columns: List[ReportColumn],
+    fmt: str,
+    stem: Path,
+    should_stop: Optional[Callable[[], bool]] = None,
+    header: bool = True,
+) -> Tuple[Path, int]:
+    """
+    Stream ``query`` from a server-side cursor into ``stem`` plus the
+    extension of ``fmt``, one batch of ``REPORT_BATCH_SIZE`` rows at a time,
+    and return the file and its row count. The query selects exactly
+    ``columns``, in order. ``should_stop`` is checked before every batch;
+    when it returns true the file is removed and ``ReportCancelled`` raised.
+    CSV parts after the first are written with ``header=False``.
+    """
+    path = report_path(stem, fmt)
+    writer = open_report_writer(fmt, path, columns, header)
+    rows_written = 0
+    try:
+        result = await db.stream(query.execution_options(yield_per=REPORT_BATCH_SIZE))
+        async for rows in result.partitions(REPORT_BATCH_SIZE):
+            if should_stop is not None and should_stop():
+                raise ReportCancelled()
+            writer.write(rows)
+            rows_written += len(rows)
+    except BaseException:
+        writer.close()
+        os.remove(path)
+        raise
+    writer.close()
+    return path, rows_written
+
+
+def merge_report_parts(fmt: str, parts: List[Path], path: Path) -> Path:
+    """
+    Concatenate partition files written by ``write_report`` into ``path``,
+    in the order given, and remove them. CSV parts are appended byte for
+    byte, compressed as they are. Columnar parts are copied one row group or
+    record batch at a time, so memory stays bounded by one batch, but each
+    is decoded and written again: Parquet re-encodes its pages and Arrow
+    recompresses its buffers.
+    """
+    if len(parts) == 1:
+        os.replace(parts[0], path)
+        return path
+
+    if fmt == "csv":
+        with open(path, "wb") as out:
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out)
+    elif fmt == "parquet":
+        writer = None
+        for part in parts:
+            parquet = pq.ParquetFile(str(part))
+            if writer is None:
+                writer = pq.ParquetWriter(str(path), parquet.schema_arrow, compression="zstd")
+            for group in range(parquet.num_row_groups):
+                writer.write_table(parquet.read_row_group(group))
+        writer.close()
+    else:
+        writer = None
+        for part in parts:
+            with pa.memory_map(str(part)) as source:
+                reader = pa.ipc.open_file(source)
+                if writer is None:
+                    writer = pa.ipc.new_file(str(path), reader.schema, options=IPC_OPTIONS)
+                for batch in range(reader.num_record_batches):
+                    writer.write_batch(reader.get_batch(batch))
+        writer.close()
+
+    for part in parts:
+        os.remove(part)
+    return path
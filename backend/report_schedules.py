@@ -0,0 +1,246 @@
+import asyncio
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .database import Report, ReportSchedule, User, UserRole, async_session
+from .hierarchy import team_cache
+from .notifications import create_notification
+from .report_engine import REPORTS_DIR
+from .report_formats import day, number, open_report_writer, report_path, text
+from .rollups import read_daily_totals
+
+# Configuration
+SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", "60"))
+REPORT_RETENTION_DAYS = int(os.getenv("REPORT_RETENTION_DAYS", "30"))
+REPORT_SWEEP_INTERVAL = timedelta(hours=1)
+
+DIGEST_COLUMNS = [
+    text("User"), text("Project"), day("Date"), number("Hours", 2), number("Billable Hours", 2)
+]
+
+
+def next_run(schedule: ReportSchedule, after: datetime) -> datetime:
+    """First run time of ``schedule`` strictly after ``after``."""
+    run = datetime.combine(after.date(), time(schedule.hour))
+    if schedule.frequency == "weekly":
+        run += timedelta(days=(schedule.weekday - run.weekday()) % 7)
+        step = timedelta(days=7)
+    else:
+        step = timedelta(days=1)
+    while run <= after:
+        run += step
+    return run
+
+
+def digest_period(schedule: ReportSchedule, run_at: datetime) -> Tuple[date, date]:
+    """Days a run covers: the previous day, or the previous Monday to Sunday."""
+    if schedule.frequency == "weekly":
+        this_monday = run_at.date() - timedelta(days=run_at.weekday())
+        return this_monday - timedelta(days=7), this_monday - timedelta(days=1)
+    yesterday = run_at.date() - timedelta(days=1)
+    return yesterday, yesterday
+
+
+async def schedule_scope(db: AsyncSession, schedule: ReportSchedule, creator: User) -> Optional[Set[str]]:
+    """Users a schedule's digest covers: its ``user_ids`` within what the creator may see (None: everyone)."""
+    if creator.role == UserRole.ADMIN:
+        visible = None
+    elif creator.role == UserRole.MANAGER:
+        visible = await team_cache.member_ids(db, creator.id)
+    else:
+        visible = {creator.id}
+    if not schedule.user_ids:
+        return visible
+    return set(schedule.user_ids) if visible is None else set(schedule.user_ids) & visible
+
+
+def write_digest(rows: List[Any], names: Dict[str, str], users: Optional[Set[str]], projects: Set[str], fmt: str, stem: Path) -> Tuple[Path, int]:
+    """Slice one recipient's rows out of the shared totals and write them."""
+    rows = [
+        (names.get(row.user_id, ""), row.project_name, row.day, row.seconds / 3600, row.billable_seconds / 3600)
+        for row in rows
+        if (users is None or row.user_id in users) and (not projects or row.project_id in projects)
+    ]
+    rows.sort(key=lambda row: (row[2], row[0], row[1]))
+    path = report_path(stem, fmt)
+    writer = open_report_writer(fmt, path, DIGEST_COLUMNS)
+    try:
+        writer.write(rows)
+    finally:
+        writer.close()
+    return path, len(rows)
+
+
+async def purge_reports(db: AsyncSession, now: Optional[datetime] = None) -> int:
+    """
+    Delete the files of reports finished more than ``REPORT_RETENTION_DAYS``
+    ago and mark them ``expired``; the report rows stay as history.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=REPORT_RETENTION_DAYS)
+    result = await db.execute(
+        select(Report).where(
+            Report.file_path.is_not(None),
+            func.coalesce(Report.finished_at, Report.created_at) < cutoff
+        )
+    )
+    reports = result.scalars().all()
+    for report in reports:
+        try:
+            os.remove(report.file_path)
+        except FileNotFoundError:
+            pass
+        report.file_path = None
+        report.status = "expired"
+    await db.commit()
+    return len(reports)
+
+
+class ReportScheduler:
+    """
+    Runs due report schedules every ``SCHEDULER_POLL_SECONDS``, and the
+    report retention sweep every ``REPORT_SWEEP_INTERVAL``.
+
+    Due schedules are claimed by moving their ``next_run_at`` forward, so
+    with several workers each run happens once. Schedules covering the same
+    days share one read of ``daily_time_totals`` over the union of their
+    scopes; each recipient's digest is then sliced from it in memory, so a
+    run costs one scan per period however many recipients there are.
+    """
+
+    def __init__(self, poll: float = SCHEDULER_POLL_SECONDS):
+        self.poll = poll
+        self._task: Optional[asyncio.Task] = None
+        self._last_sweep: Optional[datetime] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll)
+            try:
+                async with async_session() as db:
+                    await self.run_due(db)
+                    now = datetime.utcnow()
+                    if self._last_sweep is None or now - self._last_sweep >= REPORT_SWEEP_INTERVAL:
+                        self._last_sweep = now
+                        await purge_reports(db, now)
+            except Exception as e:
+                print(f"Error running report schedules: {e}")
+
+    async def claim_due(self, db: AsyncSession, now: datetime) -> List[Tuple[ReportSchedule, datetime]]:
+        """Due active schedules this worker won, with the time each was due."""
+        result = await db.execute(
+            select(ReportSchedule).where(ReportSchedule.active.is_(True), ReportSchedule.next_run_at <= now)
+        )
+        claimed = []
+        for schedule in result.scalars().all():
+            due_at = schedule.next_run_at
+            won = await db.execute(
+                update(ReportSchedule)
+                .where(ReportSchedule.id == schedule.id, ReportSchedule.next_run_at == due_at)
+                .values(next_run_at=next_run(schedule, now), last_run_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if won.rowcount == 1:
+                claimed.append((schedule, due_at))
+        await db.commit()
+        return claimed
+
+    async def run_due(self, db: AsyncSession, now: Optional[datetime] = None) -> List[Report]:
+        now = now or datetime.utcnow()
+        claimed = await self.claim_due(db, now)
+        if not claimed:
+            return []
+
+        result = await db.execute(
+            select(User).where(User.id.in_({schedule.created_by for schedule, _ in claimed}))
+        )
+        creators = {user.id: user for user in result.scalars().all()}
+
+        # Group by covered days; each group's scope is the union of its members'
+        groups: Dict[Tuple[date, date], List[Tuple[ReportSchedule, Optional[Set[str]]]]] = defaultdict(list)
+        for schedule, due_at in claimed:
+            creator = creators.get(schedule.created_by)
+            if creator is None or not creator.is_active:
+                continue
+            scope = await schedule_scope(db, schedule, creator)
+            groups[digest_period(schedule, due_at)].append((schedule, scope))
+
+        reports = []
+        for (start_date, end_date), members in groups.items():
+            scopes = [scope for _, scope in members]
+            union = None if any(scope is None for scope in scopes) else set().union(*scopes)
+            rows = await read_daily_totals(db, start_date, end_date, None if union is None else list(union))
+            names_result = await db.execute(
+                select(User.id, User.full_name).where(User.id.in_({row.user_id for row in rows}))
+            )
+            names = dict(names_result.all())
+            for schedule, scope in members:
+                reports.append(await self._deliver(db, schedule, scope, rows, names, start_date, end_date))
+        return reports
+
+    async def _deliver(self, db, schedule, scope, rows, names, start_date, end_date) -> Report:
+        started_at = datetime.utcnow()
+        report = Report(
+            name=f"{schedule.name} ({start_date.isoformat()})" if start_date == end_date
+            else f"{schedule.name} ({start_date.isoformat()} - {end_date.isoformat()})",
+            start_date=start_date,
+            end_date=end_date,
+            user_ids=schedule.user_ids,
+            project_ids=schedule.project_ids,
+            report_type="digest",
+            metrics=["hours", "billable_hours"],
+            format=schedule.format,
+            created_by=schedule.created_by,
+            status="processing",
+            started_at=started_at,
+        )
+        db.add(report)
+        await db.flush()
+
+        try:
+            path, count = await asyncio.to_thread(
+                write_digest, rows, names, scope, set(schedule.project_ids), schedule.format,
+                Path(REPORTS_DIR) / f"digest_{report.id}"
+            )
+            report.file_path = str(path)
+            report.status = "completed"
+            report.partitions_done = report.partitions_total = 1
+            report.rows_processed = report.rows_estimated = count
+        except Exception as e:
+            report.status = "failed"
+            print(f"Error writing scheduled report {schedule.id}: {e}")
+        report.finished_at = datetime.utcnow()
+        await db.commit()
+
+        if report.status == "completed":
+            await create_notification(
+                db,
+                schedule.created_by,
+                title=report.name,
+                message=f"Your {schedule.frequency} report is ready.",
+                notification_type="success",
+                link=f"/api/reports/{report.id}/download",
+            )
+        return report
+
+
+report_scheduler = ReportScheduler()
@@ -0,0 +1,272 @@
+from datetime import timedelta
+from typing import Any, Dict
+
+from sqlalchemy import DateTime, Float, and_, case, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.future import select
+from sqlalchemy.sql.functions import FunctionElement
+
+from .app_usage import SCREENSHOT_MAX_GAP_SECONDS
+from .database import ActivityLog, Project, Screenshot, Task, TimeEntry, User
+from .interning import APPLICATION_NAME, WINDOW_TITLE, join_names
+from .report_engine import ReportDefinition, register_report
+from .report_formats import day, flag, number, text, timestamp
+
+# Report types. Each query applies the report's filters other than its date
+# range, which the engine applies per partition on the definition's time column.
+
+
+class seconds_between(FunctionElement):
+    """Seconds from the first timestamp argument to the second, per dialect."""
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(seconds_between)
+def _seconds_between(element, compiler, **kw):
+    start, end = [compiler.process(clause, **kw) for clause in element.clauses]
+    return f"EXTRACT(EPOCH FROM ({end} - {start}))"
+
+
+@compiles(seconds_between, "sqlite")
+def _seconds_between_sqlite(element, compiler, **kw):
+    start, end = [compiler.process(clause, **kw) for clause in element.clauses]
+    return f"((julianday({end}) - julianday({start})) * 86400.0)"
+
+
+class seconds_after(FunctionElement):
+    """The timestamp argument plus a number of seconds, per dialect."""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(seconds_after)
+def _seconds_after(element, compiler, **kw):
+    value, seconds = [compiler.process(clause, **kw) for clause in element.clauses]
+    return f"({value} + {seconds} * INTERVAL '1 second')"
+
+
+@compiles(seconds_after, "sqlite")
+def _seconds_after_sqlite(element, compiler, **kw):
+    # Same text layout as stored timestamps, so comparisons stay chronological
+    value, seconds = [compiler.process(clause, **kw) for clause in element.clauses]
+    return f"strftime('%Y-%m-%d %H:%M:%f', {value}, '+' || {seconds} || ' seconds')"
+
+
+def time_entries_query(params: Dict[str, Any]):
+    # Values are typed in SQL so every format writes them as-is
+    query = select(
+        User.full_name,
+        Project.name,
+        Task.title,
+        TimeEntry.start_time,
+        TimeEntry.end_time,
+        func.coalesce(TimeEntry.duration_seconds, 0) / 3600.0,
+        TimeEntry.description,
+        TimeEntry.is_billable
+    ).join(
+        User, TimeEntry.user_id == User.id
+    ).join(
+        Project, TimeEntry.project_id == Project.id
+    ).outerjoin(
+        Task, TimeEntry.task_id == Task.id
+    )
+
+    if params.get("user_id"):
+        query = query.where(TimeEntry.user_id == params["user_id"])
+    if params.get("project_id"):
+        query = query.where(TimeEntry.project_id == params["project_id"])
+    if params.get("task_id"):
+        query = query.where(TimeEntry.task_id == params["task_id"])
+    if params.get("end_date"):
+        query = query.where(TimeEntry.end_time <= params["end_date"] + timedelta(days=1))
+    if params.get("user_ids"):
+        query = query.where(TimeEntry.user_id.in_(params["user_ids"]))
+    if params.get("project_ids"):
+        query = query.where(TimeEntry.project_id.in_(params["project_ids"]))
+    return query.order_by(TimeEntry.start_time, TimeEntry.id)
+
+
+def activity_query(params: Dict[str, Any]):
+    # Average activity per user and day, aggregated from the activity_logs table
+    query = select(
+        User.full_name,
+        func.date(ActivityLog.timestamp),
+        func.avg(ActivityLog.overall_activity),
+        func.count(ActivityLog.id)
+    ).join(
+        User, ActivityLog.user_id == User.id
+    )
+
+    if params.get("user_id"):
+        query = query.where(ActivityLog.user_id == params["user_id"])
+    if params.get("user_ids"):
+        query = query.where(ActivityLog.user_id.in_(params["user_ids"]))
+
+    # Partitions start at midnight, so no day is split between two of them
+    return query.group_by(
+        func.date(ActivityLog.timestamp),
+        User.full_name
+    ).order_by(
+        func.date(ActivityLog.timestamp),
+        User.full_name
+    )
+
+
+def screenshots_query(params: Dict[str, Any]):
+    query = select(
+        User.full_name,
+        Project.name,
+        Screenshot.created_at,
+        Screenshot.activity_level,
+        WINDOW_TITLE,
+        APPLICATION_NAME
+    ).join(
+        User, Screenshot.user_id == User.id
+    ).outerjoin(
+        TimeEntry, Screenshot.time_entry_id == TimeEntry.id
+    ).outerjoin(
+        Project, TimeEntry.project_id == Project.id
+    )
+    query = join_names(query)
+
+    if params.get("user_id"):
+        query = query.where(Screenshot.user_id == params["user_id"])
+    if params.get("project_id"):
+        query = query.where(TimeEntry.project_id == params["project_id"])
+    if params.get("user_ids"):
+        query = query.where(Screenshot.user_id.in_(params["user_ids"]))
+    if params.get("project_ids"):
+        query = query.where(Project.id.in_(params["project_ids"]))
+    return query.order_by(Screenshot.created_at, Screenshot.id)
+
+
+def screenshot_activity_query(params: Dict[str, Any]):
+    """
+    Time and activity per day, user and application, set-based in SQL.
+
+    Each screenshot stands for the time until the next screenshot of its
+    time entry (or the entry's end), capped at ``SCREENSHOT_MAX_GAP_SECONDS``,
+    and is joined to the activity samples of that entry within the same
+    span on ``ix_activity_logs_entry_timestamp``. The next screenshot is
+    looked up among all screenshots of the entries the partition touches,
+    and only then are the partition's bounds applied, so an entry crossing
+    a partition boundary counts the same however the report is split.
+    """
+    start, stop, user_ids = params["partition"]
+    in_partition = and_(Screenshot.created_at >= start, Screenshot.created_at < stop)
+    entries = select(Screenshot.time_entry_id).where(in_partition)
+    if user_ids is not None:
+        entries = entries.where(Screenshot.user_id.in_(user_ids))
+    if params.get("user_ids"):
+        entries = entries.where(Screenshot.user_id.in_(params["user_ids"]))
+
+    following = func.coalesce(
+        func.lead(Screenshot.created_at).over(partition_by=Screenshot.time_entry_id, order_by=Screenshot.created_at),
+        TimeEntry.end_time
+    )
+    cap = seconds_after(Screenshot.created_at, SCREENSHOT_MAX_GAP_SECONDS)
+    ordered = select(
+        Screenshot.id,
+        Screenshot.user_id,
+        Screenshot.time_entry_id,
+        Screenshot.created_at,
+        func.coalesce(APPLICATION_NAME, "Unknown").label("application"),
+        case((following > cap, cap), else_=following).label("next_at")
+    ).join(
+        TimeEntry, Screenshot.time_entry_id == TimeEntry.id
+    )
+    ordered = join_names(ordered).where(Screenshot.time_entry_id.in_(entries))
+    if params.get("project_ids"):
+        ordered = ordered.where(TimeEntry.project_id.in_(params["project_ids"]))
+    ordered = ordered.subquery("ordered")
+
+    shots = select(ordered).where(ordered.c.created_at >= start, ordered.c.created_at < stop).cte("shots")
+
+    # Activity samples per screenshot, bucketed by quartile
+    def bucket(low, high):
+        return func.sum(case((and_(ActivityLog.overall_activity >= low, ActivityLog.overall_activity < high), 1), else_=0))
+
+    samples = select(
+        shots.c.id,
+        func.count(ActivityLog.id).label("count"),
+        func.sum(ActivityLog.overall_activity).label("total"),
+        bucket(0, 25).label("low"),
+        bucket(25, 50).label("moderate"),
+        bucket(50, 75).label("active"),
+        bucket(75, 101).label("high")
+    ).select_from(shots).join(
+        ActivityLog,
+        and_(
+            ActivityLog.time_entry_id == shots.c.time_entry_id,
+            ActivityLog.timestamp >= shots.c.created_at,
+            ActivityLog.timestamp < shots.c.next_at
+        )
+    ).group_by(shots.c.id).subquery("samples")
+
+    gap = func.coalesce(seconds_between(shots.c.created_at, shots.c.next_at), 0)
+    day_column = func.date(shots.c.created_at)
+    return select(
+        day_column,
+        User.full_name,
+        shots.c.application,
+        func.count(shots.c.id),
+        func.sum(gap) / 3600.0,
+        func.sum(samples.c.total) * 1.0 / func.nullif(func.sum(samples.c.count), 0),
+        func.coalesce(func.sum(samples.c.count), 0),
+        func.coalesce(func.sum(samples.c.low), 0),
+        func.coalesce(func.sum(samples.c.moderate), 0),
+        func.coalesce(func.sum(samples.c.active), 0),
+        func.coalesce(func.sum(samples.c.high), 0)
+    ).select_from(shots).join(
+        User, User.id == shots.c.user_id
+    ).outerjoin(
+        samples, samples.c.id == shots.c.id
+    ).group_by(
+        day_column, User.full_name, shots.c.application
+    ).order_by(
+        day_column, User.full_name, shots.c.application
+    )
+
+
+register_report("time_entries", ReportDefinition(
+    query=time_entries_query,
+    columns=[
+        text("User"), text("Project"), text("Task"), timestamp("Start Time"), timestamp("End Time"),
+        number("Duration (hours)", 2), text("Description"), flag("Billable")
+    ],
+    time_column=TimeEntry.start_time,
+    user_column=TimeEntry.user_id,
+    file_prefix="time_entries",
+))
+
+register_report("activity", ReportDefinition(
+    query=activity_query,
+    columns=[text("User"), day("Date"), number("Average Activity (%)", 1), number("Data Points")],
+    time_column=ActivityLog.timestamp,
+    user_column=ActivityLog.user_id,
+    file_prefix="activity",
+))
+
+register_report("screenshots", ReportDefinition(
+    query=screenshots_query,
+    columns=[
+        text("User"), text("Project"), timestamp("Timestamp"), number("Activity Level (0-100)"),
+        text("Window Title"), text("Application")
+    ],
+    time_column=Screenshot.created_at,
+    user_column=Screenshot.user_id,
+    file_prefix="screenshots",
+))
+
+register_report("screenshot_activity", ReportDefinition(
+    query=screenshot_activity_query,
+    columns=[
+        day("Date"), text("User"), text("Application"), number("Screenshots"), number("Hours", 2),
+        number("Average Activity (%)", 1), number("Activity Samples"), number("Samples 0-24%"),
+        number("Samples 25-49%"), number("Samples 50-74%"), number("Samples 75-100%")
+    ],
+    time_column=None,
+    user_column=None,
+    file_prefix="screenshot_activity",
+))
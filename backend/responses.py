@@ -0,0 +1,104 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiofiles
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+# Default response class of the app: orjson when it is installed
+DefaultResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def schema_columns(model, schema, overrides: Optional[Dict[str, Any]] = None) -> List[Any]:
+    """
+    Table columns of ``model`` that ``schema`` outputs, in schema order, for
+    list queries that fetch rows instead of ORM objects. Columns the schema
+    does not expose (such as password hashes) are never read; ``overrides``
+    gives the labelled expressions of fields not read from a column as-is.
+    """
+    columns = model.__table__.columns
+    overrides = overrides or {}
+    return [
+        overrides[name] if name in overrides else columns[name]
+        for name in schema.__fields__ if name in overrides or name in columns
+    ]
+
+
+def page_response(page: Dict[str, Any]) -> Response:
+    """
+    Render a ``paginate(..., mappings=True)`` page directly. The rows come
+    from the database with exactly the response schema's columns, so they
+    skip per-row validation and ``jsonable_encoder``.
+    """
+    if orjson is not None:
+        return ORJSONResponse(page)
+    return JSONResponse(jsonable_encoder(page))
+
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive byte range of a single-range ``Range`` header, ``None`` to
+    serve the whole file (no header, or several ranges). Raises
+    ``ValueError`` when the range lies outside the file.
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+async def _file_chunks(path: str, start: int, end: int, chunk_size: int = 64 * 1024):
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_range_response(request: Request, path: str, media_type: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serve ``path`` with ``Range`` support so large downloads can resume.
+    ``If-Range`` with a stale ETag gets the whole file back.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{int(stat.st_mtime)}-{size}"'
+    headers = {**(headers or {}), "Accept-Ranges": "bytes", "ETag": etag}
+
+    if_range = request.headers.get("if-range")
+    try:
+        byte_range = None if if_range and if_range != etag else parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_file_chunks(path, start, end), status_code=206, media_type=media_type, headers=headers)
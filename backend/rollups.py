@@ -0,0 +1,354 @@
+"""
+Time rollups maintained incrementally from time entry writes: seconds per
+user, project and day, per project and week, and per project overall.
+
+Usage (backfill and verification):
+    python -m backend.rollups rebuild
+    python -m backend.rollups check
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .database import DailyTimeTotal, Project, ProjectTimeStats, ProjectWeeklyTime, TimeEntry
+
+# (user_id, project_id, day) -> [seconds, billable_seconds]
+Deltas = Dict[Tuple[str, str, date], List[int]]
+
+
+def _naive(value: datetime) -> datetime:
+    # Stored timestamps are UTC; SQLite hands them back naive, Postgres aware
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+def split_by_day(start: datetime, end: datetime) -> List[Tuple[date, int]]:
+    """Seconds of ``[start, end)`` falling on each UTC calendar day."""
+    start, end = _naive(start), _naive(end)
+    parts = []
+    while start < end:
+        next_midnight = datetime.combine(start.date() + timedelta(days=1), time.min)
+        part_end = min(end, next_midnight)
+        parts.append((start.date(), int((part_end - start).total_seconds())))
+        start = part_end
+    return parts
+
+
+def entry_contribution(entry) -> Deltas:
+    """What a time entry adds to the totals; running timers add nothing yet."""
+    deltas: Deltas = defaultdict(lambda: [0, 0])
+    if entry is None or entry.start_time is None or entry.end_time is None:
+        return deltas
+    for day, seconds in split_by_day(entry.start_time, entry.end_time):
+        cell = deltas[(entry.user_id, entry.project_id, day)]
+        cell[0] += seconds
+        if entry.is_billable:
+            cell[1] += seconds
+    return deltas
+
+
+@dataclass
+class EntrySnapshot:
+    """The fields of a time entry the totals depend on."""
+    user_id: str
+    project_id: str
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    is_billable: bool
+
+    @classmethod
+    def from_entry(cls, entry) -> "EntrySnapshot":
+        return cls(entry.user_id, entry.project_id, entry.start_time, entry.end_time, entry.is_billable)
+
+
+def entry_change(old, new) -> Deltas:
+    """Deltas turning the contribution of ``old`` into that of ``new`` (either may be None)."""
+    deltas = entry_contribution(new)
+    for key, (seconds, billable) in entry_contribution(old).items():
+        cell = deltas[key]
+        cell[0] -= seconds
+        cell[1] -= billable
+    return {key: cell for key, cell in deltas.items() if cell[0] or cell[1]}
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def rollup_deltas(deltas: Deltas) -> Tuple[Dict[Tuple[str, date], List[int]], Dict[str, List[int]]]:
+    """Fold daily deltas into per-project weekly and per-project overall deltas."""
+    weekly: Dict[Tuple[str, date], List[int]] = defaultdict(lambda: [0, 0])
+    projects: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    for (_, project_id, day), (seconds, billable) in deltas.items():
+        for cell in (weekly[(project_id, week_start(day))], projects[project_id]):
+            cell[0] += seconds
+            cell[1] += billable
+    return weekly, projects
+
+
+async def _upsert_add(db: AsyncSession, model, keys: List[str], columns: List[str], rows: List[dict]):
+    """
+    Add ``columns`` of each row onto the existing row with the same ``keys``,
+    inserting it if missing.
+
+    Uses INSERT ... ON CONFLICT DO UPDATE on SQLite and Postgres; other
+    databases fall back to update-then-insert.
+    """
+    if not rows:
+        return
+    dialect_name = db.get_bind().dialect.name
+
+    if dialect_name in ("sqlite", "postgresql"):
+        if dialect_name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in columns},
+        )
+        await db.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = await db.execute(
+            update(model)
+            .where(*[getattr(model, key) == row[key] for key in keys])
+            .values({column: getattr(model, column) + row[column] for column in columns})
+        )
+        if not result.rowcount:
+            db.add(model(**row))
+
+
+async def apply_deltas(db: AsyncSession, deltas: Deltas):
+    """Add ``deltas`` to the daily, weekly and per-project totals inside the caller's transaction."""
+    if not deltas:
+        return
+    weekly, projects = rollup_deltas(deltas)
+    await _upsert_add(db, DailyTimeTotal, ["user_id", "day", "project_id"], ["seconds", "billable_seconds"], [
+        {"user_id": user_id, "project_id": project_id, "day": day, "seconds": seconds, "billable_seconds": billable}
+        for (user_id, project_id, day), (seconds, billable) in deltas.items()
+    ])
+    await _upsert_add(db, ProjectWeeklyTime, ["project_id", "week_start"], ["seconds", "billable_seconds"], [
+        {"project_id": project_id, "week_start": week, "seconds": seconds, "billable_seconds": billable}
+        for (project_id, week), (seconds, billable) in weekly.items()
+    ])
+    await _upsert_add(db, ProjectTimeStats, ["project_id"], ["total_seconds", "billable_seconds"], [
+        {"project_id": project_id, "total_seconds": seconds, "billable_seconds": billable}
+        for project_id, (seconds, billable) in projects.items()
+    ])
+
+
+async def apply_entry_change(db: AsyncSession, old, new):
+    """
+    Update every rollup for a time entry going from ``old`` to ``new``
+    (``None`` for inserts and deletes), in the caller's transaction.
+    """
+    deltas = entry_change(old, new)
+    await apply_deltas(db, deltas)
+    if deltas and new is not None and new.end_time is not None:
+        # Last activity only moves forward; a rebuild corrects it after deletes
+        end_time = _naive(new.end_time)
+        await db.execute(
+            update(ProjectTimeStats)
+            .where(
+                ProjectTimeStats.project_id == new.project_id,
+                or_(ProjectTimeStats.last_activity_at.is_(None), ProjectTimeStats.last_activity_at < end_time)
+            )
+            .values(last_activity_at=end_time)
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def read_daily_totals(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    user_ids: Optional[List[str]] = None,
+):
+    """Stored totals for ``start_date..end_date`` with project names; an index range read."""
+    query = select(
+        DailyTimeTotal.user_id,
+        DailyTimeTotal.project_id,
+        Project.name.label("project_name"),
+        DailyTimeTotal.day,
+        DailyTimeTotal.seconds,
+        DailyTimeTotal.billable_seconds,
+    ).join(
+        Project, DailyTimeTotal.project_id == Project.id
+    ).where(
+        DailyTimeTotal.day >= start_date,
+        DailyTimeTotal.day <= end_date,
+        DailyTimeTotal.seconds > 0
+    )
+    if user_ids is not None:
+        query = query.where(DailyTimeTotal.user_id.in_(user_ids))
+    result = await db.execute(query)
+    return result.all()
+
+
+async def expected_totals(db: AsyncSession) -> Deltas:
+    """Daily totals recomputed from scratch out of all completed time entries."""
+    totals: Deltas = defaultdict(lambda: [0, 0])
+    result = await db.stream(
+        select(TimeEntry).where(TimeEntry.end_time.is_not(None)).execution_options(yield_per=1000)
+    )
+    async for entry in result.scalars():
+        for key, (seconds, billable) in entry_contribution(entry).items():
+            totals[key][0] += seconds
+            totals[key][1] += billable
+    return totals
+
+
+async def rebuild_rollups(db: AsyncSession) -> int:
+    """Replace all rollups with freshly computed totals; returns the number of daily rows."""
+    totals = await expected_totals(db)
+    for model in (DailyTimeTotal, ProjectWeeklyTime, ProjectTimeStats):
+        await db.execute(delete(model))
+    await apply_deltas(db, totals)
+
+    result = await db.execute(
+        select(TimeEntry.project_id, func.max(TimeEntry.end_time))
+        .where(TimeEntry.end_time.is_not(None))
+        .group_by(TimeEntry.project_id)
+    )
+    for project_id, last_activity_at in result.all():
+        await db.execute(
+            update(ProjectTimeStats)
+            .where(ProjectTimeStats.project_id == project_id)
+            .values(last_activity_at=last_activity_at)
+        )
+    await db.commit()
+    return len(totals)
+
+
+def _compare(table: str, key_names: Tuple[str, ...], expected: dict, stored: dict) -> List[dict]:
+    mismatches = []
+    for key in set(expected) | set(stored):
+        want = list(expected.get(key, [0, 0]))
+        have = list(stored.get(key, [0, 0]))
+        if want != have:
+            values = key if isinstance(key, tuple) else (key,)
+            mismatches.append({
+                "table": table,
+                "key": {name: str(value) for name, value in zip(key_names, values)},
+                "expected": want,
+                "stored": have,
+            })
+    return mismatches
+
+
+async def check_rollups(db: AsyncSession) -> List[dict]:
+    """List every rollup row whose stored totals differ from the recomputed ones."""
+    expected = await expected_totals(db)
+    weekly, projects = rollup_deltas(expected)
+
+    result = await db.execute(select(DailyTimeTotal))
+    stored_daily = {
+        (row.user_id, row.project_id, row.day): [row.seconds, row.billable_seconds]
+        for row in result.scalars().all()
+    }
+    result = await db.execute(select(ProjectWeeklyTime))
+    stored_weekly = {
+        (row.project_id, row.week_start): [row.seconds, row.billable_seconds]
+        for row in result.scalars().all()
+    }
+    result = await db.execute(select(ProjectTimeStats))
+    stored_projects = {
+        row.project_id: [row.total_seconds, row.billable_seconds]
+        for row in result.scalars().all()
+    }
+    return (
+        _compare("daily_time_totals", ("user_id", "project_id", "day"), expected, stored_daily)
+        + _compare("project_weekly_time", ("project_id", "week_start"), weekly, stored_weekly)
+        + _compare("project_time_stats", ("project_id",), projects, stored_projects)
+    )
+
+
+def project_stats(project: Project, stats: Optional[ProjectTimeStats]) -> dict:
+    """Hours burned against the project budget, which is expressed in hours."""
+    total_seconds = stats.total_seconds if stats else 0
+    total_hours = round(total_seconds / 3600, 2)
+    budget = project.budget
+    return {
+        "total_hours": total_hours,
+        "billable_hours": round((stats.billable_seconds if stats else 0) / 3600, 2),
+        "budget_hours": budget,
+        "remaining_hours": round(budget - total_hours, 2) if budget is not None else None,
+        "burned_percent": round(total_seconds / 36 / budget, 1) if budget else None,
+        "last_activity_at": stats.last_activity_at if stats else None,
+    }
+
+
+async def burn_down_series(db: AsyncSession, project: Project, today: Optional[date] = None) -> List[dict]:
+    """
+    Weekly burn for a project from its start (or first tracked week) to its
+    end date (or the current week), with the cumulative hours, what is left of
+    the budget and the ideal straight-line burn.
+    """
+    today = today or datetime.utcnow().date()
+    result = await db.execute(
+        select(ProjectWeeklyTime)
+        .where(ProjectWeeklyTime.project_id == project.id)
+        .order_by(ProjectWeeklyTime.week_start)
+    )
+    weeks = {row.week_start: row for row in result.scalars().all()}
+
+    candidates_start = [d for d in (project.start_date, min(weeks, default=None)) if d is not None]
+    first = week_start(min(candidates_start) if candidates_start else today)
+    last = week_start(max(d for d in (project.end_date or today, max(weeks, default=None)) if d is not None))
+
+    ideal_weeks = None
+    if project.budget and project.start_date and project.end_date:
+        ideal_weeks = max(1, (week_start(project.end_date) - week_start(project.start_date)).days // 7 + 1)
+
+    series = []
+    burned_seconds = 0
+    week = first
+    while week <= last:
+        row = weeks.get(week)
+        seconds = row.seconds if row else 0
+        burned_seconds += seconds
+        burned_hours = round(burned_seconds / 3600, 2)
+        point = {
+            "week_start": week.isoformat(),
+            "hours": round(seconds / 3600, 2),
+            "billable_hours": round((row.billable_seconds if row else 0) / 3600, 2),
+            "burned_hours": burned_hours,
+            "remaining_hours": round(project.budget - burned_hours, 2) if project.budget is not None else None,
+            "ideal_remaining_hours": None,
+        }
+        if ideal_weeks is not None:
+            elapsed = (week - week_start(project.start_date)).days // 7 + 1
+            point["ideal_remaining_hours"] = round(max(0.0, project.budget * (1 - elapsed / ideal_weeks)), 2)
+        series.append(point)
+        week += timedelta(days=7)
+    return series
+
+
+async def _main(command: str):
+    from .database import async_session, create_tables
+
+    await create_tables()
+    async with async_session() as db:
+        if command == "rebuild":
+            count = await rebuild_rollups(db)
+            print(f"Rebuilt time rollups: {count} daily rows")
+        else:
+            mismatches = await check_rollups(db)
+            for mismatch in mismatches:
+                print(mismatch)
+            print(f"{len(mismatches)} mismatching rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the time entry rollups")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    asyncio.run(_main(parser.parse_args().command))
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import date
+
+from .. import auth
+from ..database import get_db, User, UserRole
+from ..hierarchy import team_cache
+from ..app_usage import read_app_usage
+from ..timesheet import MAX_TIMESHEET_DAYS, timesheet_cells
+
+router = APIRouter()
+
+@router.get("/summary")
+async def get_activity_summary(
+    date: date,
+    user_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Hours per project for one user and day, read from the daily totals."""
+    user_id = user_id or current_user.id
+    # Managers may look at their team, admins at anyone
+    if user_id != current_user.id and not (
+        current_user.role == UserRole.ADMIN
+        or (current_user.role == UserRole.MANAGER and await team_cache.contains(db, current_user.id, user_id))
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this summary"
+        )
+
+    cells = await timesheet_cells(db, date, date, [user_id])
+    projects = [
+        {
+            "id": cell["project_id"],
+            "name": cell["project_name"],
+            "hours": round(cell["seconds"] / 3600, 2)
+        }
+        for cell in cells
+    ]
+    return {
+        "total_hours": round(sum(cell["seconds"] for cell in cells) / 3600, 2),
+        "projects": projects,
+        "date": date.isoformat()
+    }
+
+@router.get("/apps")
+async def get_app_usage(
+    start_date: date,
+    end_date: date,
+    user_id: Optional[str] = None,
+    team: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Time per user, day and application, read from the app usage counters."""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days >= MAX_TIMESHEET_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_TIMESHEET_DAYS} days")
+
+    # Employees only see their own usage, managers their team's, admins everyone's
+    is_manager = current_user.role in [UserRole.ADMIN, UserRole.MANAGER]
+    if (team or (user_id and user_id != current_user.id)) and not is_manager:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this usage"
+        )
+    team_ids = None
+    if current_user.role == UserRole.MANAGER:
+        team_ids = await team_cache.member_ids(db, current_user.id)
+        if user_id and user_id not in team_ids:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions to view this usage"
+            )
+    if team:
+        user_ids = sorted(team_ids) if team_ids is not None else None
+    else:
+        user_ids = [user_id or current_user.id]
+
+    rows = await read_app_usage(db, start_date, end_date, user_ids)
+    return [
+        {
+            "user_id": row.user_id,
+            "date": row.day.isoformat(),
+            "application": row.application or "Unknown",
+            "hours": round(row.seconds / 3600, 2),
+            "screenshots": row.screenshots
+        }
+        for row in rows
+    ]
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File, Form
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from .. import schemas, auth
+from ..database import get_db, User
+from ..agent_batch import MAX_BATCH_BYTES, MAX_BATCH_EVENTS, apply_batch, batch_gate
+
+router = APIRouter()
+
+@router.post("/batch", response_model=schemas.AgentBatchResult)
+async def upload_batch(
+    request: Request,
+    manifest: str = Form(...),
+    files: List[UploadFile] = File([]),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """
+    Replay of an agent's offline queue: ``manifest`` is a JSON ``{"events": [...]}``
+    of timer starts, timer stops and screenshots in the order they happened;
+    screenshot events name one of the uploaded ``files``. Every event carries
+    an idempotency key, so resending a bundle (or part of it) after a failed
+    attempt reports those events as duplicates instead of writing them again.
+    The bundle is written in one transaction.
+    """
+    if int(request.headers.get("content-length") or 0) > MAX_BATCH_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Bundle too large")
+    try:
+        batch = schemas.AgentBatch.parse_raw(manifest)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid manifest: {e}")
+    if len(batch.events) > MAX_BATCH_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BATCH_EVENTS} events per bundle"
+        )
+    
+    # Turn agents away while the worker is busy instead of queueing them all
+    if not await batch_gate.acquire(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many uploads in progress; retry later",
+            headers={"Retry-After": str(batch_gate.retry_after())}
+        )
+    try:
+        result = await apply_batch(db, current_user, batch.events, {file.filename: file for file in files})
+    finally:
+        batch_gate.release(current_user.id)
+    
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Bundle conflicts with a concurrent upload; retry it",
+            headers={"Retry-After": str(batch_gate.retry_after())}
+        )
+    return result
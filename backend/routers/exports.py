@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.future import select
+from typing import Optional
+from datetime import datetime
+
+from .. import schemas, auth
+from ..responses import schema_columns
+from ..exports import export_response
+from ..database import User, UserRole, TimeEntry, ActivityLog, Screenshot, Task
+from ..hierarchy import in_team
+from ..interning import join_names
+from ..membership import accessible_to
+from .screenshots import SCREENSHOT_COLUMNS
+
+router = APIRouter()
+
+ENTRY_COLUMNS = schema_columns(TimeEntry, schemas.TimeEntryResponse)
+ACTIVITY_COLUMNS = list(ActivityLog.__table__.columns)
+TASK_COLUMNS = schema_columns(Task, schemas.TaskResponse)
+
+FORMAT = Query("ndjson", regex="^(ndjson|csv)$")
+
+
+def scope_to_team(query, user_column, current_user: User):
+    """Employees export their own rows, managers their team's, admins everyone's."""
+    if current_user.role == UserRole.EMPLOYEE:
+        return query.where(user_column == current_user.id)
+    if current_user.role == UserRole.MANAGER:
+        return in_team(query, user_column, current_user.id)
+    return query
+
+
+@router.get("/time-entries")
+async def export_time_entries(
+    request: Request,
+    format: str = FORMAT,
+    user_id: Optional[str] = None,
+    project_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Every time entry the caller may see, streamed as NDJSON or CSV."""
+    query = scope_to_team(select(*ENTRY_COLUMNS), TimeEntry.user_id, current_user)
+    if user_id:
+        query = query.where(TimeEntry.user_id == user_id)
+    if project_id:
+        query = query.where(TimeEntry.project_id == project_id)
+    if start_date:
+        query = query.where(TimeEntry.start_time >= start_date)
+    if end_date:
+        query = query.where(TimeEntry.start_time < end_date)
+    query = query.order_by(TimeEntry.start_time, TimeEntry.id)
+    return export_response(query, format, "time-entries", request.headers.get("accept-encoding", ""))
+
+@router.get("/activity-logs")
+async def export_activity_logs(
+    request: Request,
+    format: str = FORMAT,
+    user_id: Optional[str] = None,
+    time_entry_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Every activity sample the caller may see, streamed as NDJSON or CSV."""
+    query = scope_to_team(select(*ACTIVITY_COLUMNS), ActivityLog.user_id, current_user)
+    if user_id:
+        query = query.where(ActivityLog.user_id == user_id)
+    if time_entry_id:
+        query = query.where(ActivityLog.time_entry_id == time_entry_id)
+    if start_date:
+        query = query.where(ActivityLog.timestamp >= start_date)
+    if end_date:
+        query = query.where(ActivityLog.timestamp < end_date)
+    query = query.order_by(ActivityLog.timestamp, ActivityLog.id)
+    return export_response(query, format, "activity-logs", request.headers.get("accept-encoding", ""))
+
+@router.get("/screenshots")
+async def export_screenshots(
+    request: Request,
+    format: str = FORMAT,
+    user_id: Optional[str] = None,
+    time_entry_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Screenshot metadata (not the images) the caller may see, as NDJSON or CSV."""
+    query = join_names(select(*SCREENSHOT_COLUMNS))
+    if user_id:
+        # Only admins and managers can export other users' screenshots
+        if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER] and user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions to export these screenshots"
+            )
+        query = query.where(Screenshot.user_id == user_id)
+    elif current_user.role == UserRole.EMPLOYEE:
+        query = query.where(Screenshot.user_id == current_user.id)
+    if time_entry_id:
+        query = query.where(Screenshot.time_entry_id == time_entry_id)
+    if start_date:
+        query = query.where(Screenshot.created_at >= start_date)
+    if end_date:
+        query = query.where(Screenshot.created_at <= end_date)
+    query = query.order_by(Screenshot.created_at, Screenshot.id)
+    return export_response(query, format, "screenshots", request.headers.get("accept-encoding", ""))
+
+@router.get("/tasks")
+async def export_tasks(
+    request: Request,
+    format: str = FORMAT,
+    project_id: Optional[str] = None,
+    assignee_id: Optional[str] = None,
+    status: Optional[str] = None,
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Every task the caller may see, streamed as NDJSON or CSV."""
+    query = select(*TASK_COLUMNS)
+    # Regular users can only export tasks in projects they're members of
+    if current_user.role == UserRole.EMPLOYEE:
+        query = accessible_to(query, Task.project_id, current_user.id)
+    if project_id:
+        query = query.where(Task.project_id == project_id)
+    if assignee_id:
+        query = query.where(Task.assignee_id == assignee_id)
+    if status:
+        query = query.where(Task.status == status)
+    query = query.order_by(Task.created_at, Task.id)
+    return export_response(query, format, "tasks", request.headers.get("accept-encoding", ""))
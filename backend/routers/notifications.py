@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Optional
+
+from .. import schemas, auth
+from ..database import get_db, User, Notification
+from ..notifications import create_notification, list_notifications, mark_read, unread_counter
+
+router = APIRouter()
+
+@router.get("/", response_model=schemas.NotificationPage)
+async def get_notifications(
+    read: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    limit = max(1, min(limit, 200))
+    try:
+        items, next_cursor = await list_notifications(db, current_user.id, read, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "unread_count": await unread_counter.get(db, current_user.id)
+    }
+
+@router.get("/unread-count")
+async def get_unread_count(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    # Served from the in-memory counter; the DB is read once per UNREAD_COUNT_TTL per user
+    return {"unread_count": await unread_counter.get(db, current_user.id)}
+
+@router.post("/", response_model=schemas.NotificationResponse, status_code=status.HTTP_201_CREATED)
+async def send_notification(
+    notification: schemas.NotificationCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.manager_only)
+):
+    # Check if recipient exists
+    result = await db.execute(select(User.id).where(User.id == notification.user_id))
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return await create_notification(db, **notification.dict())
+
+@router.post("/mark-read")
+async def mark_notifications_read(
+    body: schemas.NotificationMarkRead,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    if body.ids is None and body.before is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide notification ids or a 'before' timestamp"
+        )
+    updated = await mark_read(db, current_user.id, ids=body.ids, before=body.before)
+    return {"updated": updated, "unread_count": await unread_counter.get(db, current_user.id)}
+
+@router.post("/mark-all-read")
+async def mark_all_notifications_read(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    updated = await mark_read(db, current_user.id)
+    return {"updated": updated, "unread_count": 0}
+
+@router.post("/{notification_id}/read")
+@router.post("/mark-as-read/{notification_id}", include_in_schema=False)
+async def mark_notification_as_read(
+    notification_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    updated = await mark_read(db, current_user.id, ids=[notification_id])
+    if not updated:
+        # Either already read, someone else's or missing; only the latter two are errors
+        result = await db.execute(select(Notification.user_id).where(Notification.id == notification_id))
+        owner_id = result.scalar()
+        if owner_id is None:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        if owner_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to update this notification")
+    return {"status": "success"}
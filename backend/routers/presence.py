@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import auth
+from ..connections import manager
+from ..database import async_session, get_db, User, UserRole
+from ..hierarchy import team_cache
+from ..presence import presence
+
+router = APIRouter()
+
+@router.get("/")
+async def read_presence(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.manager_only)
+):
+    """Snapshot of who is tracking right now; managers see their team."""
+    if current_user.role == UserRole.ADMIN:
+        return presence.snapshot()
+    return presence.snapshot(await team_cache.member_ids(db, current_user.id))
+
+@router.websocket("/ws")
+async def presence_websocket(websocket: WebSocket, token: str):
+    # Browsers cannot set headers on WebSocket requests, so the token comes in the query
+    async with async_session() as db:
+        user = await auth.get_user_from_token(db, token)
+    if user is None or not user.is_active or user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    # A slow board drops messages rather than the socket; presence resyncs it with a snapshot
+    connection = await manager.connect(websocket, user.id, slow_consumer_policy="drop")
+    await presence.subscribe(connection, None if user.role == UserRole.ADMIN else user.id)
+    try:
+        while True:
+            # Nothing is expected from the client; this just waits for the disconnect
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        presence.unsubscribe(connection)
+        manager.disconnect(connection)
@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import delete, func
 from typing import List, Optional
 from datetime import date
 
 from .. import schemas, auth
-from ..database import get_db, User, UserRole, Project, Task
+from ..pagination import paginate
+from ..database import get_db, User, UserRole, Project, ProjectMember, ProjectTimeStats, Task
+from ..board import board_cache
+from ..membership import accessible_to, add_members, membership_cache, remove_members
+from ..rollups import burn_down_series, project_stats
+from ..sync import record_access_change
+from ..timers import existence_cache
 
 router = APIRouter()
 
@@ -30,7 +36,12 @@ async def create_project(
     )
     
     db.add(db_project)
+    await db.flush()
+    
+    # The creator is the project's first member
+    await add_members(db, db_project.id, [current_user.id], role="owner")
     await db.commit()
+    membership_cache.invalidate([current_user.id])
     await db.refresh(db_project)
     return db_project
 
@@ -38,12 +49,15 @@ async def create_project(
 async def read_projects(
     skip: int = 0,
     limit: int = 100,
+    with_total: bool = True,
     filter: Optional[schemas.ProjectFilter] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.any_authenticated)
 ):
-    # Build query
-    query = select(Project)
+    # Build query; time stats come along in the same statement
+    query = select(Project, ProjectTimeStats).outerjoin(
+        ProjectTimeStats, ProjectTimeStats.project_id == Project.id
+    )
     
     # Apply filters
     if filter:
@@ -56,30 +70,43 @@ async def read_projects(
         if filter.end_date:
             query = query.where(Project.end_date <= filter.end_date)
     
-    # Regular users can only see projects they're assigned to
+    # Regular users can only see projects they're members of
     if current_user.role != UserRole.ADMIN and current_user.role != UserRole.MANAGER:
-        # Regular users can only see projects they own
-        query = query.where(
-            Project.created_by == current_user.id
-        )
-    
-    # Get total count (SQLAlchemy 1.4/2.0 compatible)
-    count_query = select(func.count()).select_from(query.subquery())
-    total = (await db.execute(count_query)).scalar() or 0
+        query = accessible_to(query, Project.id, current_user.id)
     
-    # Apply pagination
-    query = query.offset(skip).limit(limit)
+    # Fetch the page; the total comes from the cached count strategy
+    page = await paginate(db, query, skip, limit, with_total, scalars=False)
+    page["items"] = [
+        schemas.ProjectWithStats.from_orm(project).copy(
+            update={"stats": schemas.ProjectStats(**project_stats(project, stats))}
+        )
+        for project, stats in page["items"]
+    ]
+    return page
+
+@router.get("/{project_id}/burndown", response_model=schemas.ProjectBurnDown)
+async def read_project_burn_down(
+    project_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.manager_only)
+):
+    """Weekly hours burned against the project budget, read from the weekly rollup."""
+    result = await db.execute(
+        select(Project, ProjectTimeStats).outerjoin(
+            ProjectTimeStats, ProjectTimeStats.project_id == Project.id
+        ).where(Project.id == project_id)
+    )
+    row = result.first()
     
-    # Execute query
-    result = await db.execute(query)
-    projects = result.scalars().all()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Project not found")
     
+    project, stats = row
     return {
-        "items": projects,
-        "total": total,
-        "page": skip // limit + 1,
-        "size": limit,
-        "pages": (total + limit - 1) // limit if limit > 0 else 0
+        "project_id": project.id,
+        "budget_hours": project.budget,
+        "stats": project_stats(project, stats),
+        "series": await burn_down_series(db, project)
     }
 
 @router.get("/{project_id}", response_model=schemas.ProjectResponse)
@@ -99,13 +126,7 @@ async def read_project(
     # Check permissions
     if current_user.role != UserRole.ADMIN and current_user.role != UserRole.MANAGER:
         # Check if user is a member of the project
-        member_result = await db.execute(
-            select(ProjectMember).where(
-                ProjectMember.project_id == project_id,
-                ProjectMember.user_id == current_user.id
-            )
-        )
-        if not member_result.scalars().first():
+        if not await membership_cache.can_access(db, current_user.id, project_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions to view this project"
@@ -160,14 +181,70 @@ async def delete_project(
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    result = await db.execute(
+        delete(ProjectMember).where(ProjectMember.project_id == project_id).returning(ProjectMember.user_id)
+    )
+    await record_access_change(db, [row[0] for row in result.all()])
     await db.delete(db_project)
     await db.commit()
+    existence_cache.forget_project(project_id)
+    board_cache.invalidate([project_id])
+    membership_cache.invalidate()
     return None
 
-# Project members endpoints - Not implemented in current schema
-# The current schema doesn't support multiple members per project.
-# To implement this, you'll need to create a ProjectMember model and set up the many-to-many relationship.
-# Here's a placeholder for future implementation:
+# Project members endpoints
+
+async def get_project_or_404(db: AsyncSession, project_id: str) -> Project:
+    result = await db.execute(select(Project).where(Project.id == project_id))
+    project = result.scalars().first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+@router.get("/{project_id}/members", response_model=List[schemas.ProjectMemberResponse])
+async def read_project_members(
+    project_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    if current_user.role == UserRole.EMPLOYEE and not await membership_cache.can_access(db, current_user.id, project_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this project"
+        )
+    result = await db.execute(
+        select(ProjectMember)
+        .where(ProjectMember.project_id == project_id)
+        .order_by(ProjectMember.added_at)
+    )
+    return result.scalars().all()
+
+@router.post("/{project_id}/members", response_model=schemas.ProjectMembersResult)
+async def add_project_members(
+    project_id: str,
+    members: schemas.ProjectMembersAdd,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.manager_only)
+):
+    """Add many users at once; unknown users and existing members are reported, not errors."""
+    await get_project_or_404(db, project_id)
+    outcome = await add_members(db, project_id, members.all_user_ids(), members.role)
+    await db.commit()
+    membership_cache.invalidate(outcome["added"])
+    return outcome
+
+@router.post("/{project_id}/members/remove", response_model=schemas.ProjectMembersResult)
+async def remove_project_members(
+    project_id: str,
+    members: schemas.ProjectMembersRemove,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.manager_only)
+):
+    await get_project_or_404(db, project_id)
+    removed = await remove_members(db, project_id, members.user_ids)
+    await db.commit()
+    membership_cache.invalidate(removed)
+    return {"removed": removed}
 
 @router.post("/{project_id}/members/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def add_project_member(
@@ -176,10 +253,13 @@ async def add_project_member(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.manager_only)
 ):
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="Project members feature is not implemented in the current schema"
-    )
+    await get_project_or_404(db, project_id)
+    outcome = await add_members(db, project_id, [user_id])
+    if outcome["not_found"]:
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.commit()
+    membership_cache.invalidate(outcome["added"])
+    return None
 
 @router.delete("/{project_id}/members/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_project_member(
@@ -188,7 +268,9 @@ async def remove_project_member(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.manager_only)
 ):
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="Project members feature is not implemented in the current schema"
-    )
+    await get_project_or_404(db, project_id)
+    if not await remove_members(db, project_id, [user_id]):
+        raise HTTPException(status_code=404, detail="User is not a member of this project")
+    await db.commit()
+    membership_cache.invalidate([user_id])
+    return None
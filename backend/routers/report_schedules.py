@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List
+from datetime import datetime
+
+from .. import schemas, auth
+from ..database import get_db, User, UserRole, ReportSchedule
+from ..report_formats import format_available
+from ..report_schedules import next_run
+
+router = APIRouter()
+
+@router.post("/", response_model=schemas.ReportScheduleResponse, status_code=status.HTTP_201_CREATED)
+async def create_schedule(
+    schedule: schemas.ReportScheduleCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Recurring digest for the caller, covering the users they may see."""
+    if not format_available(schedule.format):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Report format '{schedule.format}' is not available on this server"
+        )
+
+    db_schedule = ReportSchedule(**schedule.dict(), created_by=current_user.id, active=True)
+    db_schedule.next_run_at = next_run(db_schedule, datetime.utcnow())
+    db.add(db_schedule)
+    await db.commit()
+    await db.refresh(db_schedule)
+    return db_schedule
+
+@router.get("/", response_model=List[schemas.ReportScheduleResponse])
+async def read_schedules(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    query = select(ReportSchedule).order_by(ReportSchedule.created_at)
+    # Admins see every schedule, everyone else their own
+    if current_user.role != UserRole.ADMIN:
+        query = query.where(ReportSchedule.created_by == current_user.id)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@router.delete("/{schedule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_schedule(
+    schedule_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    result = await db.execute(
+        select(ReportSchedule).where(ReportSchedule.id == schedule_id)
+    )
+    db_schedule = result.scalars().first()
+
+    if db_schedule is None:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+
+    # Only the creator or an admin can delete the schedule
+    if db_schedule.created_by != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to delete this schedule"
+        )
+
+    await db.delete(db_schedule)
+    await db.commit()
+    return None
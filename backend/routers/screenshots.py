@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 import os
 import uuid
@@ -9,10 +10,22 @@ from pathlib import Path
 import aiofiles
 
 from .. import schemas, auth
-from ..database import get_db, User, TimeEntry, Screenshot
+from ..pagination import paginate
+from ..responses import page_response, schema_columns
+from ..database import get_db, User, TimeEntry, Screenshot, UserRole
+from ..app_usage import record_screenshot, remove_screenshot
+from ..interning import APPLICATION_NAME, WINDOW_TITLE, applications, join_names, window_titles
+from ..presence import presence
+from ..idempotency import MAX_KEY_LENGTH, find_key, remember_keys, stable_id
 
 router = APIRouter()
 
+# Names are read through the dictionary tables, see the interning module
+SCREENSHOT_COLUMNS = schema_columns(Screenshot, schemas.ScreenshotResponse, overrides={
+    "window_title": WINDOW_TITLE.label("window_title"),
+    "application_name": APPLICATION_NAME.label("application_name"),
+})
+
 # Configuration
 UPLOAD_DIR = "uploads/screenshots"
 THUMBNAIL_DIR = "uploads/thumbnails"
@@ -26,16 +39,44 @@ os.makedirs(THUMBNAIL_DIR, exist_ok=True)
 def allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+async def save_screenshot_files(contents: bytes, filename: str):
+    """Write an image and its thumbnail; returns their paths."""
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    async with aiofiles.open(file_path, 'wb') as f:
+        await f.write(contents)
+    
+    # In a real application, you would also generate a thumbnail here
+    # For now, we'll just use the same path for the thumbnail
+    thumbnail_path = os.path.join(THUMBNAIL_DIR, filename)
+    async with aiofiles.open(thumbnail_path, 'wb') as f:
+        await f.write(contents)  # In reality, create a thumbnail
+    return file_path, thumbnail_path
+
+def remove_screenshot_files(*paths: str):
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
 @router.post("/upload", response_model=schemas.ScreenshotResponse, status_code=status.HTTP_201_CREATED)
 async def upload_screenshot(
     time_entry_id: str = Form(...),
     activity_level: int = Form(..., ge=0, le=100),
     window_title: Optional[str] = Form(None),
     application_name: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Form(None, max_length=MAX_KEY_LENGTH),
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.any_authenticated)
 ):
+    # A retried upload returns the screenshot stored the first time
+    if idempotency_key:
+        seen = await find_key(db, current_user.id, idempotency_key)
+        if seen is not None:
+            result = await db.execute(select(Screenshot).where(Screenshot.id == seen.result_id))
+            screenshot = result.scalars().first()
+            if screenshot is not None:
+                return screenshot
+    
     # Check if time entry exists and belongs to the user
     time_entry = await db.execute(
         select(TimeEntry).where(
@@ -55,10 +96,16 @@ async def upload_screenshot(
     if not allowed_file(file.filename):
         raise HTTPException(status_code=400, detail="File type not allowed")
     
-    # Generate unique filename
+    # Intern the names up front; the ids survive a rollback of this request
+    application_id = await applications.id_for(application_name)
+    window_title_id = await window_titles.id_for(window_title)
+    
+    # Generate unique filename; keyed uploads get a stable one so retries overwrite
+    screenshot_id = stable_id(current_user.id, idempotency_key) if idempotency_key else str(uuid.uuid4())
     file_ext = file.filename.rsplit('.', 1)[1].lower()
-    filename = f"{uuid.uuid4()}.{file_ext}"
+    filename = f"{screenshot_id}.{file_ext}"
     file_path = os.path.join(UPLOAD_DIR, filename)
+    thumbnail_path = os.path.join(THUMBNAIL_DIR, filename)
     
     # Save file
     try:
@@ -67,37 +114,48 @@ async def upload_screenshot(
         if len(contents) > MAX_FILE_SIZE:
             raise HTTPException(status_code=400, detail="File too large")
         
-        # Save original file
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(contents)
-        
-        # In a real application, you would also generate a thumbnail here
-        # For now, we'll just use the same path for the thumbnail
-        thumbnail_path = os.path.join(THUMBNAIL_DIR, filename)
-        async with aiofiles.open(thumbnail_path, 'wb') as f:
-            await f.write(contents)  # In reality, create a thumbnail
+        await save_screenshot_files(contents, filename)
         
         # Create screenshot record in database
-        db_screenshot = models.Screenshot(
+        db_screenshot = Screenshot(
+            id=screenshot_id,
             user_id=current_user.id,
             time_entry_id=time_entry_id,
             image_path=file_path,
             thumbnail_path=thumbnail_path,
             activity_level=activity_level,
-            window_title=window_title,
-            application_name=application_name
+            application_id=application_id,
+            window_title_id=window_title_id,
+            created_at=datetime.utcnow()
         )
         
+        await record_screenshot(db, current_user.id, time_entry_id, db_screenshot.created_at, application_id)
         db.add(db_screenshot)
+        if idempotency_key:
+            await remember_keys(db, current_user.id, [
+                {"key": idempotency_key, "kind": "screenshot", "result_id": screenshot_id}
+            ])
         await db.commit()
         await db.refresh(db_screenshot)
         
+        # Feed the live presence board
+        presence.activity(current_user.id, activity_level)
+        
         return db_screenshot
         
+    except HTTPException:
+        raise
+    except IntegrityError:
+        # The same keyed upload was stored concurrently; its files are ours too
+        await db.rollback()
+        seen = await find_key(db, current_user.id, idempotency_key) if idempotency_key else None
+        if seen is None:
+            raise HTTPException(status_code=409, detail="Screenshot conflicts with an existing one")
+        result = await db.execute(select(Screenshot).where(Screenshot.id == seen.result_id))
+        return result.scalars().first()
     except Exception as e:
         # Clean up if something went wrong
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        remove_screenshot_files(file_path, thumbnail_path)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/", response_model=schemas.PaginatedResponse)
@@ -108,55 +166,41 @@ async def get_screenshots(
     end_date: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 100,
+    with_total: bool = True,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.any_authenticated)
 ):
-    # Build query
-    query = select(Screenshot)
+    # Build query; rows carry exactly the response columns
+    query = join_names(select(*SCREENSHOT_COLUMNS))
     
     # Apply filters
     if time_entry_id:
-        query = query.where(models.Screenshot.time_entry_id == time_entry_id)
+        query = query.where(Screenshot.time_entry_id == time_entry_id)
     
     if user_id:
         # Only admins can view other users' screenshots
-        if current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER] and user_id != current_user.id:
+        if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER] and user_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions to view these screenshots"
             )
-        query = query.where(models.Screenshot.user_id == user_id)
+        query = query.where(Screenshot.user_id == user_id)
     else:
         # Regular users can only see their own screenshots
-        if current_user.role == models.UserRole.EMPLOYEE:
-            query = query.where(models.Screenshot.user_id == current_user.id)
+        if current_user.role == UserRole.EMPLOYEE:
+            query = query.where(Screenshot.user_id == current_user.id)
     
     if start_date:
-        query = query.where(models.Screenshot.created_at >= start_date)
+        query = query.where(Screenshot.created_at >= start_date)
     
     if end_date:
-        query = query.where(models.Screenshot.created_at <= end_date)
+        query = query.where(Screenshot.created_at <= end_date)
     
     # Order by creation time (newest first)
-    query = query.order_by(models.Screenshot.created_at.desc())
-    
-    # Get total count
-    total = (await db.execute(select([query.subquery()]))).scalars().count()
+    query = query.order_by(Screenshot.created_at.desc())
     
-    # Apply pagination
-    query = query.offset(skip).limit(limit)
-    
-    # Execute query
-    result = await db.execute(query)
-    screenshots = result.scalars().all()
-    
-    return {
-        "items": screenshots,
-        "total": total,
-        "page": skip // limit + 1,
-        "size": limit,
-        "pages": (total + limit - 1) // limit if limit > 0 else 0
-    }
+    # Fetch the page; the total comes from the cached count strategy
+    return page_response(await paginate(db, query, skip, limit, with_total, mappings=True))
 
 @router.get("/{screenshot_id}", response_model=schemas.ScreenshotResponse)
 async def get_screenshot(
@@ -173,7 +217,7 @@ async def get_screenshot(
         raise HTTPException(status_code=404, detail="Screenshot not found")
     
     # Check permissions
-    if screenshot.user_id != current_user.id and current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+    if screenshot.user_id != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to view this screenshot"
@@ -197,7 +241,7 @@ async def get_screenshot_image(
         raise HTTPException(status_code=404, detail="Screenshot not found")
     
     # Check permissions
-    if screenshot.user_id != current_user.id and current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+    if screenshot.user_id != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to view this screenshot"
@@ -233,7 +277,7 @@ async def delete_screenshot(
         raise HTTPException(status_code=404, detail="Screenshot not found")
     
     # Check permissions
-    if db_screenshot.user_id != current_user.id and current_user.role != models.UserRole.ADMIN:
+    if db_screenshot.user_id != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to delete this screenshot"
@@ -250,6 +294,9 @@ async def delete_screenshot(
         print(f"Error deleting screenshot files: {e}")
     
     # Delete the database record
+    await remove_screenshot(
+        db, db_screenshot.user_id, db_screenshot.time_entry_id, db_screenshot.created_at, db_screenshot.application_id
+    )
     await db.delete(db_screenshot)
     await db.commit()
     
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from .. import schemas, auth
+from ..database import get_db, User
+from ..search import SEARCH_KINDS, SEARCH_LIMIT, search
+
+router = APIRouter()
+
+@router.get("/", response_model=List[schemas.SearchHit])
+async def search_everything(
+    q: str = Query(..., max_length=200),
+    types: Optional[str] = None,
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """
+    Typeahead over users, projects and tasks. Every word of ``q`` matches as
+    a prefix; results are ranked best first and limited to what the caller
+    may see. ``types`` is a comma separated subset of user, project, task.
+    """
+    kinds = SEARCH_KINDS
+    if types:
+        kinds = [kind.strip() for kind in types.split(",") if kind.strip()]
+        unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(unknown)}")
+    
+    return await search(db, current_user, q, kinds, limit)
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from .. import schemas, auth
+from ..database import get_db, User
+from ..sync import SYNC_PAGE_SIZE, changes_since
+
+router = APIRouter()
+
+@router.get("/", response_model=schemas.SyncResponse)
+async def sync_changes(
+    token: Optional[str] = None,
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """
+    Users, projects, tasks and time entries created, updated or deleted since
+    ``token``, oldest change first. Start without a token for a full snapshot,
+    then keep passing the returned token; repeat while ``has_more`` is set.
+    """
+    return await changes_since(db, current_user, token, limit)
@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 from typing import List, Optional
 from datetime import datetime
 
 from .. import schemas, auth
+from ..pagination import paginate
+from ..responses import page_response, schema_columns
 from ..database import get_db, User, Project, Task, UserRole
+from ..timers import existence_cache
+from ..membership import accessible_to, membership_cache
+from ..board import BOARD_COLUMN_LIMIT, board_cache, build_board, read_column
+from ..bulk_tasks import (
+    MAX_BULK_TASKS, bulk_create, bulk_delete, bulk_move, bulk_update, finish,
+    import_tasks, read_csv_rows, read_json_rows
+)
 
 router = APIRouter()
 
+TASK_COLUMNS = schema_columns(Task, schemas.TaskResponse)
+
 @router.post("/", response_model=schemas.TaskResponse, status_code=status.HTTP_201_CREATED)
 async def create_task(
     task: schemas.TaskCreate,
@@ -26,44 +37,110 @@ async def create_task(
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Check permissions
-    if current_user.role == UserRole.EMPLOYEE and project.created_by != current_user.id:
-        # Regular users can only create tasks in their own projects
+    if current_user.role == UserRole.EMPLOYEE and not await membership_cache.can_access(db, current_user.id, project.id):
+        # Regular users can only create tasks in projects they're members of
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to create tasks in this project"
         )
     
-    # Check if assignee exists and has access to the project
+    # Check if assignee exists
     if task.assignee_id:
         assignee = await db.execute(
-            select(User).where(User.id == task.assignee_id)
+            select(User.id).where(User.id == task.assignee_id)
         )
-        if not assignee.scalars().first():
+        if assignee.first() is None:
             raise HTTPException(status_code=404, detail="Assignee not found")
-        
-        # Check if assignee exists
-        assignee_user = await db.execute(
-            select(User).where(User.id == task.assignee_id)
-        )
-        if not assignee_user.scalars().first():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Assignee not found"
-            )
     
     # Create new task
+    now = datetime.utcnow()
     db_task = Task(
         **task.dict(),
-        created_by=current_user.id,
-        created_at=datetime.utcnow()
+        created_at=now,
+        updated_at=now
     )
     
     db.add(db_task)
     await db.commit()
     await db.refresh(db_task)
+    board_cache.invalidate([db_task.project_id])
     
     return db_task
 
+def check_bulk_size(count: int):
+    if count > MAX_BULK_TASKS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_TASKS} tasks per request"
+        )
+
+@router.post("/bulk/create", response_model=schemas.TaskBulkResult)
+async def bulk_create_tasks(
+    bulk: schemas.TaskBulkCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Create many tasks in one transaction, reporting the outcome per item."""
+    check_bulk_size(len(bulk.items))
+    result = await bulk_create(db, current_user, bulk.items)
+    return result.summary(await finish(db, result, bulk.atomic))
+
+@router.post("/bulk/update", response_model=schemas.TaskBulkResult)
+async def bulk_update_tasks(
+    bulk: schemas.TaskBulkUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    check_bulk_size(len(bulk.items))
+    result = await bulk_update(db, current_user, bulk.items)
+    return result.summary(await finish(db, result, bulk.atomic))
+
+@router.post("/bulk/move", response_model=schemas.TaskBulkResult)
+async def bulk_move_tasks(
+    bulk: schemas.TaskBulkMove,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Move tasks to another project and/or status."""
+    if bulk.project_id is None and bulk.status is None:
+        raise HTTPException(status_code=400, detail="Nothing to move: give project_id and/or status")
+    check_bulk_size(len(bulk.task_ids))
+    result = await bulk_move(db, current_user, bulk.task_ids, bulk.project_id, bulk.status)
+    return result.summary(await finish(db, result, bulk.atomic))
+
+@router.post("/bulk/delete", response_model=schemas.TaskBulkResult)
+async def bulk_delete_tasks(
+    bulk: schemas.TaskBulkDelete,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    check_bulk_size(len(bulk.task_ids))
+    result = await bulk_delete(db, current_user, bulk.task_ids)
+    return result.summary(await finish(db, result, bulk.atomic))
+
+@router.post("/import", response_model=schemas.TaskImportResult)
+async def import_task_file(
+    file: UploadFile = File(...),
+    project_id: Optional[str] = Form(None),
+    atomic: bool = Form(False),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """
+    Import tasks from a CSV file (header row with title, description, status,
+    due_date, project_id, assignee_id) or JSON (an array or one object per
+    line). ``project_id`` applies to rows that do not name one.
+    """
+    name = (file.filename or "").lower()
+    if name.endswith(".csv") or file.content_type in ("text/csv", "application/vnd.ms-excel"):
+        rows = read_csv_rows(file.file)
+    elif name.endswith((".json", ".ndjson", ".jsonl")) or "json" in (file.content_type or ""):
+        rows = read_json_rows(file.file)
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported file type; upload CSV or JSON")
+    
+    return await import_tasks(db, current_user, rows, project_id, atomic)
+
 @router.get("/", response_model=schemas.PaginatedResponse)
 async def get_tasks(
     project_id: Optional[str] = None,
@@ -71,11 +148,12 @@ async def get_tasks(
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    with_total: bool = True,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.any_authenticated)
 ):
-    # Build query
-    query = select(Task)
+    # Build query; rows carry exactly the response columns
+    query = select(*TASK_COLUMNS)
     
     # Apply filters
     if project_id:
@@ -93,14 +171,9 @@ async def get_tasks(
     if status:
         query = query.where(Task.status == status)
     
-    # Regular users can only see tasks in their own projects
+    # Regular users can only see tasks in projects they're members of
     if current_user.role == UserRole.EMPLOYEE:
-        query = query.join(
-            Project,
-            Task.project_id == Project.id
-        ).where(
-            Project.created_by == current_user.id
-        )
+        query = accessible_to(query, Task.project_id, current_user.id)
     # Managers can see all tasks
     elif current_user.role == UserRole.MANAGER:
         # Managers can see all tasks
@@ -112,23 +185,51 @@ async def get_tasks(
         Task.created_at.desc()
     )
     
-    # Get total count
-    total = (await db.execute(select([query.subquery()]))).scalars().count()
-    
-    # Apply pagination
-    query = query.offset(skip).limit(limit)
-    
-    # Execute query
-    result = await db.execute(query)
-    tasks = result.scalars().all()
-    
-    return {
-        "items": tasks,
-        "total": total,
-        "page": skip // limit + 1,
-        "size": limit,
-        "pages": (total + limit - 1) // limit if limit > 0 else 0
-    }
+    # Fetch the page; the total comes from the cached count strategy
+    return page_response(await paginate(db, query, skip, limit, with_total, mappings=True))
+
+async def check_board_access(db: AsyncSession, current_user: User, project_id: str):
+    if not await existence_cache.project_exists(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    if current_user.role == UserRole.EMPLOYEE and not await membership_cache.can_access(db, current_user.id, project_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this board"
+        )
+
+@router.get("/board", response_model=schemas.TaskBoard)
+async def get_board(
+    project_id: str,
+    limit: int = Query(BOARD_COLUMN_LIMIT, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """
+    Kanban board of a project: every status column with its task count and
+    first ``limit`` tasks. Further tasks of a column are read with its
+    ``next_cursor``.
+    """
+    await check_board_access(db, current_user, project_id)
+    board = board_cache.get(project_id, limit)
+    if board is None:
+        board = await build_board(db, project_id, limit)
+        board_cache.put(project_id, limit, board)
+    return board
+
+@router.get("/board/{project_id}/columns/{column_status}", response_model=schemas.TaskBoardPage)
+async def get_board_column(
+    project_id: str,
+    column_status: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(BOARD_COLUMN_LIMIT, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    await check_board_access(db, current_user, project_id)
+    try:
+        return await read_column(db, project_id, column_status, cursor, limit)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/{task_id}", response_model=schemas.TaskResponse)
 async def get_task(
@@ -146,14 +247,8 @@ async def get_task(
     
     # Check permissions
     if current_user.role == UserRole.EMPLOYEE:
-        # Check if user is the owner of the project
-        project = await db.execute(
-            select(Project).where(
-                Project.id == task.project_id,
-                Project.created_by == current_user.id
-            )
-        )
-        if not project.scalars().first():
+        # Check if user is a member of the project
+        if not await membership_cache.can_access(db, current_user.id, task.project_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions to view this task"
@@ -179,16 +274,10 @@ async def update_task(
     
     # Check permissions
     if current_user.role == UserRole.EMPLOYEE:
-        # Regular users can only update their own tasks in their own projects
+        # Regular users can only update their own tasks or tasks in their projects
         if db_task.assignee_id != current_user.id:
-            # Check if user is the owner of the project
-            project = await db.execute(
-                select(Project).where(
-                    Project.id == db_task.project_id,
-                    Project.created_by == current_user.id
-                )
-            )
-            if not project.scalars().first():
+            # Check if user is a member of the project
+            if not await membership_cache.can_access(db, current_user.id, db_task.project_id):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="Not enough permissions to update this task"
@@ -210,6 +299,7 @@ async def update_task(
     
     await db.commit()
     await db.refresh(db_task)
+    board_cache.invalidate([db_task.project_id])
     return db_task
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -231,31 +321,16 @@ async def delete_task(
     if current_user.role == UserRole.EMPLOYEE:
         # Regular users can only delete their own tasks or tasks in their projects
         if db_task.assignee_id != current_user.id:
-            # Check if user is the owner of the project
-            project = await db.execute(
-                select(Project).where(
-                    Project.id == db_task.project_id,
-                    Project.created_by == current_user.id
-                )
-            )
-            if not project.scalars().first():
+            # Check if user is a member of the project
+            if not await membership_cache.can_access(db, current_user.id, db_task.project_id):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="Not enough permissions to delete this task"
                 )
     
+    project_id = db_task.project_id
     await db.delete(db_task)
     await db.commit()
+    existence_cache.forget_task(task_id)
+    board_cache.invalidate([project_id])
     return None
-
-# Helper function to get team member IDs for a manager
-async def get_team_member_ids(db: AsyncSession, manager_id: str) -> List[str]:
-    # This is a placeholder implementation
-    # You'll need to implement this based on your team structure
-    # For example, you might have a Team model with a manager_id field
-    result = await db.execute(
-        select(User.id).where(
-            User.manager_id == manager_id
-        )
-    )
-    return [row[0] for row in result.all()]
@@ -1,73 +1,140 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func, update
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 
 from .. import schemas, auth
-from ..database import get_db, User
+from ..pagination import paginate
+from ..responses import page_response, schema_columns
+from ..database import get_db, User, UserRole, Project, Task, TimeEntry
+from ..timers import timer_registry, existence_cache, RunningTimer, elapsed_seconds
+from ..presence import presence
+from ..hierarchy import in_team
+from ..membership import membership_cache
+from ..rollups import EntrySnapshot, apply_entry_change
+from ..app_usage import remove_time_entry
+from ..sync import record_changes
 
 router = APIRouter()
 
+ENTRY_COLUMNS = schema_columns(TimeEntry, schemas.TimeEntryResponse)
+
 @router.post("/start", response_model=schemas.TimeEntryResponse, status_code=status.HTTP_201_CREATED)
 async def start_time_entry(
     time_entry: schemas.TimeEntryCreate,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.any_authenticated)
 ):
-    # Check if user already has a running timer
-    running_timer = await db.execute(
-        select(models.TimeEntry).where(
-            and_(
-                models.TimeEntry.user_id == current_user.id,
-                models.TimeEntry.end_time.is_(None)
-            )
-        )
-    )
-    
-    if running_timer.scalars().first():
+    # Check if user already has a running timer; a registry hit is confirmed against the database
+    if await timer_registry.confirm(db, current_user.id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You already have a running timer. Please stop it first."
         )
     
     # Check if project exists
-    project = await db.execute(
-        select(models.Project).where(models.Project.id == time_entry.project_id)
-    )
-    if not project.scalars().first():
+    if not await existence_cache.project_exists(db, time_entry.project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     
+    # Employees can only track time on projects they're members of
+    if current_user.role == UserRole.EMPLOYEE and not await membership_cache.can_access(db, current_user.id, time_entry.project_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to track time on this project"
+        )
+    
     # Check if task exists if provided
     if time_entry.task_id:
-        task = await db.execute(
-            select(models.Task).where(models.Task.id == time_entry.task_id)
-        )
-        if not task.scalars().first():
+        if await existence_cache.task_project_id(db, time_entry.task_id) is None:
             raise HTTPException(status_code=404, detail="Task not found")
     
-    # Create new time entry
-    db_time_entry = models.TimeEntry(
+    # Create new time entry; timestamps are set here so no refresh is needed
+    now = datetime.utcnow()
+    db_time_entry = TimeEntry(
         **time_entry.dict(exclude={"start_time"}),
         user_id=current_user.id,
-        start_time=datetime.utcnow()
+        start_time=now,
+        created_at=now,
+        updated_at=now
     )
     
     db.add(db_time_entry)
-    await db.commit()
-    await db.refresh(db_time_entry)
+    user_id = current_user.id
+    try:
+        # Entries submitted already finished count towards the daily totals right away
+        await apply_entry_change(db, None, db_time_entry)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        # Only an open entry of this user means the running-timer index caught it
+        if time_entry.end_time is not None or await timer_registry.refresh_user(db, user_id) is None:
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already have a running timer. Please stop it first."
+        )
+    
+    timer = RunningTimer.from_entry(db_time_entry)
+    timer_registry.add(timer)
+    presence.timer_started(timer)
     return db_time_entry
 
+@router.get("/current", response_model=Optional[schemas.TimeEntryResponse])
+async def read_current_time_entry(
+    user_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """Return the running timer of the current user (or ``user_id`` for managers)."""
+    if user_id and user_id != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this time entry"
+        )
+    timer = await timer_registry.confirm(db, user_id or current_user.id)
+    return timer.to_response() if timer else None
+
 @router.post("/{time_entry_id}/stop", response_model=schemas.TimeEntryResponse)
 async def stop_time_entry(
     time_entry_id: str,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.any_authenticated)
 ):
+    now = datetime.utcnow()
+    timer = timer_registry.get_entry(time_entry_id)
+    
+    if timer is not None:
+        # Check permissions
+        if timer.user_id != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions to stop this time entry"
+            )
+        
+        # Stop the timer with a single conditional UPDATE
+        duration_seconds = elapsed_seconds(timer.start_time, now)
+        result = await db.execute(
+            update(TimeEntry)
+            .where(TimeEntry.id == time_entry_id, TimeEntry.end_time.is_(None))
+            .values(end_time=now, duration_seconds=duration_seconds, updated_at=now)
+        )
+        if result.rowcount:
+            stopped = EntrySnapshot(timer.user_id, timer.project_id, timer.start_time, now, timer.is_billable)
+            await apply_entry_change(db, None, stopped)
+            await record_changes(db, "time_entry", [(time_entry_id, timer.project_id, timer.user_id)])
+        await db.commit()
+        timer_registry.discard(time_entry_id)
+        presence.timer_stopped(timer.user_id)
+        if result.rowcount:
+            return timer.to_response(end_time=now, duration_seconds=duration_seconds)
+        # Stopped elsewhere in the meantime; fall through and report the stored row
+    
     # Get the time entry
     result = await db.execute(
-        select(models.TimeEntry).where(models.TimeEntry.id == time_entry_id)
+        select(TimeEntry).where(TimeEntry.id == time_entry_id)
     )
     db_time_entry = result.scalars().first()
     
@@ -75,85 +142,66 @@ async def stop_time_entry(
         raise HTTPException(status_code=404, detail="Time entry not found")
     
     # Check permissions
-    if db_time_entry.user_id != current_user.id and current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+    if db_time_entry.user_id != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to stop this time entry"
         )
     
     # Stop the timer
-    now = datetime.utcnow()
-    db_time_entry.end_time = now
-    if db_time_entry.start_time:
-        db_time_entry.duration_seconds = int((now - db_time_entry.start_time).total_seconds())
-    
-    await db.commit()
-    await db.refresh(db_time_entry)
+    if db_time_entry.end_time is None:
+        db_time_entry.end_time = now
+        db_time_entry.duration_seconds = elapsed_seconds(db_time_entry.start_time, now)
+        db_time_entry.updated_at = now
+        await apply_entry_change(db, None, db_time_entry)
+        await db.commit()
+        await db.refresh(db_time_entry)
+        # Started on another worker; drop it from every registry
+        timer_registry.discard(db_time_entry.id)
+        presence.timer_stopped(db_time_entry.user_id)
     return db_time_entry
 
 @router.get("/", response_model=schemas.PaginatedResponse)
 async def read_time_entries(
     skip: int = 0,
     limit: int = 100,
+    with_total: bool = True,
     filter: Optional[schemas.TimeEntryFilter] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.any_authenticated)
 ):
-    # Build query
-    query = select(models.TimeEntry)
+    # Build query; rows carry exactly the response columns
+    query = select(*ENTRY_COLUMNS)
     
     # Apply filters
     if filter:
         if filter.user_id:
-            query = query.where(models.TimeEntry.user_id == filter.user_id)
+            query = query.where(TimeEntry.user_id == filter.user_id)
         if filter.project_id:
-            query = query.where(models.TimeEntry.project_id == filter.project_id)
+            query = query.where(TimeEntry.project_id == filter.project_id)
         if filter.task_id:
-            query = query.where(models.TimeEntry.task_id == filter.task_id)
+            query = query.where(TimeEntry.task_id == filter.task_id)
         if filter.is_billable is not None:
-            query = query.where(models.TimeEntry.is_billable == filter.is_billable)
+            query = query.where(TimeEntry.is_billable == filter.is_billable)
         if filter.start_date:
-            query = query.where(models.TimeEntry.start_time >= filter.start_date)
+            query = query.where(TimeEntry.start_time >= filter.start_date)
         if filter.end_date:
             # Add one day to include the entire end date
             end_date = filter.end_date + timedelta(days=1)
-            query = query.where(models.TimeEntry.start_time < end_date)
+            query = query.where(TimeEntry.start_time < end_date)
     
     # Regular users can only see their own time entries
-    if current_user.role == models.UserRole.EMPLOYEE:
-        query = query.where(models.TimeEntry.user_id == current_user.id)
-    # Managers can see their team's time entries
-    elif current_user.role == models.UserRole.MANAGER:
-        # This assumes there's a way to determine team members
-        # You'll need to implement this based on your team structure
-        team_member_ids = await get_team_member_ids(db, current_user.id)
-        query = query.where(
-            or_(
-                models.TimeEntry.user_id == current_user.id,
-                models.TimeEntry.user_id.in_(team_member_ids)
-            )
-        )
+    if current_user.role == UserRole.EMPLOYEE:
+        query = query.where(TimeEntry.user_id == current_user.id)
+    # Managers can see the time entries of anyone in their team, themselves included
+    elif current_user.role == UserRole.MANAGER:
+        query = in_team(query, TimeEntry.user_id, current_user.id)
     
     # Order by start time (newest first)
-    query = query.order_by(models.TimeEntry.start_time.desc())
-    
-    # Get total count
-    total = (await db.execute(select([query.subquery()]))).scalars().count()
-    
-    # Apply pagination
-    query = query.offset(skip).limit(limit)
-    
-    # Execute query
-    result = await db.execute(query)
-    time_entries = result.scalars().all()
+    query = query.order_by(TimeEntry.start_time.desc())
     
-    return {
-        "items": time_entries,
-        "total": total,
-        "page": skip // limit + 1,
-        "size": limit,
-        "pages": (total + limit - 1) // limit if limit > 0 else 0
-    }
+    # Fetch the page; the total comes from the cached count strategy
+    return page_response(await paginate(db, query, skip, limit, with_total, mappings=True))
 
 @router.get("/{time_entry_id}", response_model=schemas.TimeEntryResponse)
 async def read_time_entry(
@@ -162,7 +210,7 @@ async def read_time_entry(
     current_user: User = Depends(auth.any_authenticated)
 ):
     result = await db.execute(
-        select(models.TimeEntry).where(models.TimeEntry.id == time_entry_id)
+        select(TimeEntry).where(TimeEntry.id == time_entry_id)
     )
     time_entry = result.scalars().first()
     
@@ -170,7 +218,7 @@ async def read_time_entry(
         raise HTTPException(status_code=404, detail="Time entry not found")
     
     # Check permissions
-    if time_entry.user_id != current_user.id and current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+    if time_entry.user_id != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to view this time entry"
@@ -187,7 +235,7 @@ async def update_time_entry(
 ):
     # Get the time entry
     result = await db.execute(
-        select(models.TimeEntry).where(models.TimeEntry.id == time_entry_id)
+        select(TimeEntry).where(TimeEntry.id == time_entry_id)
     )
     db_time_entry = result.scalars().first()
     
@@ -195,25 +243,36 @@ async def update_time_entry(
         raise HTTPException(status_code=404, detail="Time entry not found")
     
     # Check permissions
-    if db_time_entry.user_id != current_user.id and current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+    if db_time_entry.user_id != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to update this time entry"
         )
     
-    # Update time entry fields
+    # Update time entry fields, remembering what the daily totals were built from
+    before = EntrySnapshot.from_entry(db_time_entry)
     for field, value in time_entry_update.dict(exclude_unset=True).items():
         setattr(db_time_entry, field, value)
     
     # Recalculate duration if start_time or end_time was updated
     if 'start_time' in time_entry_update.dict(exclude_unset=True) or 'end_time' in time_entry_update.dict(exclude_unset=True):
         if db_time_entry.start_time and db_time_entry.end_time:
-            db_time_entry.duration_seconds = int((db_time_entry.end_time - db_time_entry.start_time).total_seconds())
+            db_time_entry.duration_seconds = elapsed_seconds(db_time_entry.start_time, db_time_entry.end_time)
     
-    db_time_entry.updated_at = models.func.now()
+    db_time_entry.updated_at = func.now()
     
+    await apply_entry_change(db, before, db_time_entry)
     await db.commit()
     await db.refresh(db_time_entry)
+    
+    # Keep the running timer registry in sync
+    if db_time_entry.end_time is None:
+        timer = RunningTimer.from_entry(db_time_entry)
+        timer_registry.add(timer)
+        presence.timer_started(timer)
+    elif before.end_time is None:
+        timer_registry.discard(db_time_entry.id)
+        presence.timer_stopped(db_time_entry.user_id)
     return db_time_entry
 
 @router.delete("/{time_entry_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -224,7 +283,7 @@ async def delete_time_entry(
 ):
     # Get the time entry
     result = await db.execute(
-        select(models.TimeEntry).where(models.TimeEntry.id == time_entry_id)
+        select(TimeEntry).where(TimeEntry.id == time_entry_id)
     )
     db_time_entry = result.scalars().first()
     
@@ -232,24 +291,18 @@ async def delete_time_entry(
         raise HTTPException(status_code=404, detail="Time entry not found")
     
     # Check permissions
-    if db_time_entry.user_id != current_user.id and current_user.role != models.UserRole.ADMIN:
+    if db_time_entry.user_id != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to delete this time entry"
         )
     
+    was_running = db_time_entry.end_time is None
+    await apply_entry_change(db, db_time_entry, None)
+    await remove_time_entry(db, time_entry_id)
     await db.delete(db_time_entry)
     await db.commit()
+    if was_running:
+        timer_registry.discard(time_entry_id)
+        presence.timer_stopped(db_time_entry.user_id)
     return None
-
-# Helper function to get team member IDs for a manager
-async def get_team_member_ids(db: AsyncSession, manager_id: str) -> List[str]:
-    # This is a placeholder implementation
-    # You'll need to implement this based on your team structure
-    # For example, you might have a Team model with a manager_id field
-    result = await db.execute(
-        select(models.User.id).where(
-            models.User.manager_id == manager_id
-        )
-    )
-    return [row[0] for row in result.all()]
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import date
+
+from .. import auth
+from ..database import get_db, User, UserRole
+from ..hierarchy import team_cache
+from ..timesheet import MAX_TIMESHEET_DAYS, build_grid, timesheet_cells
+
+router = APIRouter()
+
+@router.get("/entries")
+async def get_timesheet_entries(
+    start_date: date,
+    end_date: date,
+    user_id: Optional[str] = None,
+    team: bool = False,
+    view: str = "cells",
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth.any_authenticated)
+):
+    """
+    Hours per user, project and day. ``view=cells`` returns one row per cell
+    (the shape the timesheet page consumes); ``view=grid`` pivots them into
+    per-project rows with an hours-per-day map.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days >= MAX_TIMESHEET_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_TIMESHEET_DAYS} days")
+    
+    # Employees only see their own timesheet, managers their team's, admins everyone's
+    is_manager = current_user.role in [UserRole.ADMIN, UserRole.MANAGER]
+    if (team or (user_id and user_id != current_user.id)) and not is_manager:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this timesheet"
+        )
+    team_ids = None
+    if current_user.role == UserRole.MANAGER:
+        team_ids = await team_cache.member_ids(db, current_user.id)
+        if user_id and user_id not in team_ids:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions to view this timesheet"
+            )
+    if team:
+        user_ids = sorted(team_ids) if team_ids is not None else None
+    else:
+        user_ids = [user_id or current_user.id]
+    
+    cells = await timesheet_cells(db, start_date, end_date, user_ids)
+    if view == "grid":
+        return build_grid(cells, start_date, end_date)
+    
+    return [
+        {
+            "id": f"{cell['user_id']}:{cell['project_id']}:{cell['date']}",
+            "user_id": cell["user_id"],
+            "project_id": cell["project_id"],
+            "project_name": cell["project_name"],
+            "date": cell["date"],
+            "hours": round(cell["seconds"] / 3600, 2)
+        }
+        for cell in cells
+    ]
@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import delete, func
 from typing import List, Optional
 
 from .. import schemas, auth
-from ..database import get_db, User, UserRole
+from ..pagination import paginate
+from ..responses import page_response, schema_columns
+from ..database import get_db, User, UserRole, ProjectMember
+from ..hierarchy import HierarchyError, add_user, remove_user, set_manager, team_cache
+from ..membership import membership_cache
 
 router = APIRouter()
 
+USER_COLUMNS = schema_columns(User, schemas.UserResponse)
+
 @router.post("/", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
     user: schemas.UserCreate,
@@ -31,11 +38,20 @@ async def create_user(
         position=user.position,
         department=user.department,
         is_active=user.is_active,
-        role=user.role
+        role=user.role,
+        manager_id=user.manager_id
     )
     
     db.add(new_user)
+    await db.flush()
+    try:
+        await add_user(db, new_user)
+    except HierarchyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     await db.commit()
+    if user.manager_id:
+        team_cache.invalidate()
     await db.refresh(new_user)
     return new_user
 
@@ -47,6 +63,7 @@ async def read_users_me(current_user: User = Depends(auth.get_current_active_use
 async def read_users(
     skip: int = 0,
     limit: int = 100,
+    with_total: bool = True,
     filter: Optional[schemas.UserFilter] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth.any_authenticated)
@@ -58,35 +75,20 @@ async def read_users(
             detail="Not enough permissions"
         )
     
-    # Build query
-    query = select(models.User)
+    # Build query; rows carry exactly the response columns
+    query = select(*USER_COLUMNS)
     
     # Apply filters
     if filter:
         if filter.role:
-            query = query.where(models.User.role == filter.role)
+            query = query.where(User.role == filter.role)
         if filter.is_active is not None:
-            query = query.where(models.User.is_active == filter.is_active)
+            query = query.where(User.is_active == filter.is_active)
         if filter.department:
-            query = query.where(models.User.department == filter.department)
-    
-    # Get total count
-    total = (await db.execute(select([query.subquery()]))).scalars().count()
-    
-    # Apply pagination
-    query = query.offset(skip).limit(limit)
+            query = query.where(User.department == filter.department)
     
-    # Execute query
-    result = await db.execute(query)
-    users = result.scalars().all()
-    
-    return {
-        "items": users,
-        "total": total,
-        "page": skip // limit + 1,
-        "size": limit,
-        "pages": (total + limit - 1) // limit if limit > 0 else 0
-    }
+    # Fetch the page; the total comes from the cached count strategy
+    return page_response(await paginate(db, query, skip, limit, with_total, mappings=True))
 
 @router.get("/{user_id}", response_model=schemas.UserResponse)
 async def read_user(
@@ -128,21 +130,42 @@ async def update_user(
             detail="Only admins can change user roles"
         )
     
+    changes = user_update.dict(exclude_unset=True)
+    
+    # Only admins can change reporting lines
+    if "manager_id" in changes and current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can change a user's manager"
+        )
+    
     result = await db.execute(select(User).where(User.id == user_id))
     db_user = result.scalars().first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Reporting line changes rewrite the closure table in the same transaction
+    manager_changed = "manager_id" in changes and changes["manager_id"] != db_user.manager_id
+    if manager_changed:
+        try:
+            await set_manager(db, user_id, changes["manager_id"])
+        except HierarchyError as e:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    changes.pop("manager_id", None)
+    
     # Update user fields
-    for field, value in user_update.dict(exclude_unset=True).items():
+    for field, value in changes.items():
         if field == "password":
             db_user.hashed_password = auth.get_password_hash(value)
         else:
             setattr(db_user, field, value)
     
-    db_user.updated_at = models.func.now()
+    db_user.updated_at = func.now()
     
     await db.commit()
+    if manager_changed:
+        team_cache.invalidate()
     await db.refresh(db_user)
     return db_user
 
@@ -164,6 +187,10 @@ async def delete_user(
             detail="Cannot delete your own account"
         )
     
+    await remove_user(db, db_user)
+    await db.execute(delete(ProjectMember).where(ProjectMember.user_id == user_id))
     await db.delete(db_user)
     await db.commit()
+    team_cache.invalidate()
+    membership_cache.invalidate([user_id])
     return None
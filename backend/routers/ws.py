@@ -0,0 +1,78 @@
+import json
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import auth
+from ..connections import manager, team_topic
+from ..database import async_session, User, UserRole
+from ..hierarchy import team_cache
+from ..membership import membership_cache
+from ..presence import presence
+
+router = APIRouter()
+
+async def can_subscribe(db: AsyncSession, user: User, topic: str) -> bool:
+    """Same visibility as the REST endpoints: projects by membership, teams by hierarchy."""
+    if user.role == UserRole.ADMIN:
+        return True
+    kind, _, target = topic.partition(":")
+    if not target:
+        return False
+    if kind == "user":
+        return target == user.id
+    if kind == "project":
+        # Managers see every project; employees the ones they are members of
+        return user.role == UserRole.MANAGER or await membership_cache.can_access(db, user.id, target)
+    if kind == "team":
+        # A manager's own team or any team inside it
+        return user.role == UserRole.MANAGER and await team_cache.contains(db, user.id, target)
+    return False
+
+async def _subscribe(connection, topic: str):
+    manager.subscribe(connection, topic)
+    connection.send(json.dumps({"type": "subscribed", "topic": topic}))
+    kind, _, target = topic.partition(":")
+    if kind == "team":
+        # Team topics carry presence deltas; start them off with the team's board
+        await presence.send_team_snapshot(connection, target)
+
+@router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, token: str):
+    # Browsers cannot set headers on WebSocket requests, so the token comes in the query
+    async with async_session() as db:
+        user = await auth.get_user_from_token(db, token)
+    if user is None or not user.is_active:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    connection = await manager.connect(websocket, user.id)
+    if user.role == UserRole.MANAGER:
+        await _subscribe(connection, team_topic(user.id))
+    try:
+        while True:
+            # Clients manage their subscriptions with {"action": "subscribe", "topic": "project:<id>"}
+            try:
+                message = json.loads(await websocket.receive_text())
+                action, topic = message.get("action"), message.get("topic", "")
+            except (ValueError, AttributeError):
+                connection.send(json.dumps({"type": "error", "detail": "Invalid message"}))
+                continue
+
+            if action == "subscribe":
+                async with async_session() as db:
+                    allowed = await can_subscribe(db, user, topic)
+                if not allowed:
+                    connection.send(json.dumps({"type": "error", "detail": "Not allowed", "topic": topic}))
+                    continue
+                await _subscribe(connection, topic)
+            elif action == "unsubscribe":
+                manager.unsubscribe(connection, topic)
+                connection.send(json.dumps({"type": "unsubscribed", "topic": topic}))
+            elif action == "ping":
+                connection.send(json.dumps({"type": "pong"}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(connection)
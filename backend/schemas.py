@@ -27,6 +27,7 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str = Field(..., min_length=8, max_length=100)
     role: UserRole = UserRole.EMPLOYEE
+    manager_id: Optional[str] = None
 
 class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
@@ -35,10 +36,12 @@ class UserUpdate(BaseModel):
     department: Optional[str] = None
     is_active: Optional[bool] = None
     role: Optional[UserRole] = None
+    manager_id: Optional[str] = None
 
 class UserInDB(UserBase):
     id: str
     role: UserRole
+    manager_id: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -73,7 +76,7 @@ class ProjectInDB(ProjectBase):
     id: str
     created_by: str
     created_at: datetime
-    updated_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -81,6 +84,58 @@ class ProjectInDB(ProjectBase):
 class ProjectResponse(ProjectInDB):
     pass
 
+class ProjectStats(BaseModel):
+    # Budget is expressed in hours
+    total_hours: float = 0
+    billable_hours: float = 0
+    budget_hours: Optional[float] = None
+    remaining_hours: Optional[float] = None
+    burned_percent: Optional[float] = None
+    last_activity_at: Optional[datetime] = None
+
+class ProjectWithStats(ProjectResponse):
+    stats: ProjectStats = ProjectStats()
+
+class BurnDownPoint(BaseModel):
+    week_start: date
+    hours: float
+    billable_hours: float
+    burned_hours: float
+    remaining_hours: Optional[float] = None
+    ideal_remaining_hours: Optional[float] = None
+
+class ProjectBurnDown(BaseModel):
+    project_id: str
+    budget_hours: Optional[float] = None
+    stats: ProjectStats
+    series: List[BurnDownPoint]
+
+class ProjectMemberResponse(BaseModel):
+    project_id: str
+    user_id: str
+    role: str
+    added_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class ProjectMembersAdd(BaseModel):
+    user_ids: List[str] = []
+    user_id: Optional[str] = None  # single-member form used by the frontend
+    role: str = "member"
+
+    def all_user_ids(self) -> List[str]:
+        return self.user_ids + ([self.user_id] if self.user_id else [])
+
+class ProjectMembersRemove(BaseModel):
+    user_ids: List[str]
+
+class ProjectMembersResult(BaseModel):
+    added: List[str] = []
+    already_members: List[str] = []
+    not_found: List[str] = []
+    removed: List[str] = []
+
 class TaskBase(BaseModel):
     title: str = Field(..., max_length=200)
     description: Optional[str] = None
@@ -102,7 +157,7 @@ class TaskUpdate(BaseModel):
 class TaskInDB(TaskBase):
     id: str
     created_at: datetime
-    updated_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -110,6 +165,70 @@ class TaskInDB(TaskBase):
 class TaskResponse(TaskInDB):
     pass
 
+class TaskBulkCreate(BaseModel):
+    items: List[TaskCreate]
+    atomic: bool = False  # roll everything back if any item fails
+
+class TaskBulkUpdateItem(TaskUpdate):
+    id: str
+
+class TaskBulkUpdate(BaseModel):
+    items: List[TaskBulkUpdateItem]
+    atomic: bool = False
+
+class TaskBulkMove(BaseModel):
+    task_ids: List[str]
+    project_id: Optional[str] = None
+    status: Optional[str] = None
+    atomic: bool = False
+
+class TaskBulkDelete(BaseModel):
+    task_ids: List[str]
+    atomic: bool = False
+
+class TaskBulkItemResult(BaseModel):
+    index: Optional[int] = None
+    id: Optional[str] = None
+    ok: bool
+    error: Optional[str] = None
+
+class TaskBulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    committed: bool
+    results: List[TaskBulkItemResult]
+
+class TaskImportResult(BaseModel):
+    created: int
+    failed: int
+    committed: bool
+    errors: List[TaskBulkItemResult]  # first 100 failures
+
+class TaskBoardColumn(BaseModel):
+    status: str
+    count: int
+    tasks: List[TaskResponse]
+    next_cursor: Optional[str] = None  # pass to the column endpoint for the next page
+
+class TaskBoard(BaseModel):
+    project_id: str
+    limit: int
+    total: int
+    columns: List[TaskBoardColumn]
+
+class TaskBoardPage(BaseModel):
+    status: str
+    tasks: List[TaskResponse]
+    next_cursor: Optional[str] = None
+
+class SearchHit(BaseModel):
+    kind: str  # user, project or task
+    id: str
+    title: str
+    subtitle: Optional[str] = None
+    project_id: Optional[str] = None
+    score: float
+
 class TimeEntryBase(BaseModel):
     project_id: str
     task_id: Optional[str] = None
@@ -139,6 +258,22 @@ class TimeEntryInDB(TimeEntryBase):
 class TimeEntryResponse(TimeEntryInDB):
     pass
 
+class SyncDeleted(BaseModel):
+    users: List[str] = []
+    projects: List[str] = []
+    tasks: List[str] = []
+    time_entries: List[str] = []
+
+class SyncResponse(BaseModel):
+    token: str  # pass back as ``token`` on the next sync
+    reset: bool  # full snapshot: replace the local copy instead of merging
+    has_more: bool  # more changes are waiting; sync again right away
+    users: List[UserResponse] = []
+    projects: List[ProjectResponse] = []
+    tasks: List[TaskResponse] = []
+    time_entries: List[TimeEntryResponse] = []
+    deleted: SyncDeleted
+
 class ScreenshotBase(BaseModel):
     image_path: str
     thumbnail_path: str
@@ -161,6 +296,39 @@ class ScreenshotInDB(ScreenshotBase):
 class ScreenshotResponse(ScreenshotInDB):
     pass
 
+class AgentEvent(BaseModel):
+    key: str = Field(..., min_length=1, max_length=100)  # client idempotency key
+    type: str  # timer_start, timer_stop or screenshot
+    at: Optional[datetime] = None  # when it happened on the agent
+    # timer_start
+    project_id: Optional[str] = None
+    task_id: Optional[str] = None
+    description: Optional[str] = None
+    is_billable: bool = True
+    # timer_stop and screenshot: a server id, or the key of the timer_start event
+    time_entry_id: Optional[str] = None
+    entry_key: Optional[str] = None
+    # screenshot
+    file: Optional[str] = None  # filename of the uploaded part
+    activity_level: Optional[int] = Field(None, ge=0, le=100)
+    window_title: Optional[str] = None
+    application_name: Optional[str] = None
+
+class AgentBatch(BaseModel):
+    events: List[AgentEvent]
+
+class AgentEventResult(BaseModel):
+    key: str
+    status: str  # created, duplicate or failed
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class AgentBatchResult(BaseModel):
+    created: int
+    duplicates: int
+    failed: int
+    results: List[AgentEventResult]
+
 class ReportBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -170,6 +338,7 @@ class ReportBase(BaseModel):
     project_ids: List[str] = []
     report_type: str
     metrics: List[str]
+    format: str = Field("csv", regex="^(csv|parquet|arrow)$")
 
 class ReportCreate(ReportBase):
     pass
@@ -180,6 +349,12 @@ class ReportInDB(ReportBase):
     created_at: datetime
     status: str
     file_path: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    partitions_done: int = 0
+    partitions_total: Optional[int] = None
+    rows_processed: int = 0
+    rows_estimated: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -187,6 +362,71 @@ class ReportInDB(ReportBase):
 class ReportResponse(ReportInDB):
     pass
 
+class ReportProgress(BaseModel):
+    id: str
+    status: str
+    partitions_done: int
+    partitions_total: Optional[int] = None
+    rows_processed: int
+    rows_estimated: Optional[int] = None
+    percent: float
+    eta_seconds: Optional[float] = None
+
+class ReportScheduleBase(BaseModel):
+    name: str
+    frequency: str = Field(..., regex="^(daily|weekly)$")
+    hour: int = Field(7, ge=0, le=23)
+    weekday: int = Field(0, ge=0, le=6)
+    user_ids: List[str] = []
+    project_ids: List[str] = []
+    format: str = Field("csv", regex="^(csv|parquet|arrow)$")
+
+class ReportScheduleCreate(ReportScheduleBase):
+    pass
+
+class ReportScheduleResponse(ReportScheduleBase):
+    id: str
+    created_by: str
+    active: bool
+    next_run_at: datetime
+    last_run_at: Optional[datetime] = None
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class NotificationBase(BaseModel):
+    title: str = Field(..., max_length=200)
+    message: str
+    notification_type: str = "info"
+    link: Optional[str] = None
+
+class NotificationCreate(NotificationBase):
+    user_id: str
+
+class NotificationInDB(NotificationBase):
+    id: str
+    user_id: str
+    read: bool
+    created_at: datetime
+    read_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class NotificationResponse(NotificationInDB):
+    pass
+
+class NotificationPage(BaseModel):
+    items: List[NotificationResponse]
+    next_cursor: Optional[str] = None
+    unread_count: int
+
+class NotificationMarkRead(BaseModel):
+    # Either explicit ids or everything created up to a timestamp
+    ids: Optional[List[str]] = None
+    before: Optional[datetime] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -199,10 +439,12 @@ class TokenData(BaseModel):
 # Response models for pagination and filtering
 class PaginatedResponse(BaseModel):
     items: List[Any]
-    total: int
+    total: Optional[int] = None  # None when requested with ?with_total=false
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    has_more: bool = False
+    estimated: bool = False  # total is a planner estimate, not an exact count
 
 class TimeRangeFilter(BaseModel):
     start_date: Optional[date] = None
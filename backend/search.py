@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import DDL, and_, delete, event, exists, func, insert, literal, literal_column, null, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import attributes
+from sqlalchemy.sql import column, table
+
+from .database import Project, ProjectMember, SearchDocument, Task, User, UserHierarchy, UserRole
+
+# Configuration
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "10"))
+SEARCH_MAX_TERMS = 8
+
+SEARCH_KINDS = ("user", "project", "task")
+
+# Title matches count ten times as much as matches in the rest of the text
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# SQLite: external content FTS5 table over search_documents, kept in sync by
+# triggers, with prefix indexes so typeahead queries stay index lookups
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title, body,
+        content='search_documents', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+# PostgreSQL: weighted tsvector expression index plus a trigram index on the
+# title for typo-tolerant matches. Queries must use the same expression.
+PG_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(body, '')), 'B')"
+)
+PG_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_search_documents_vector ON search_documents USING gin (({PG_VECTOR}))",
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_title_trgm ON search_documents USING gin (title gin_trgm_ops)",
+]
+
+for statement in SQLITE_DDL:
+    event.listen(SearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in PG_DDL:
+    event.listen(SearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+event.listen(
+    SearchDocument.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS search_fts").execute_if(dialect="sqlite")
+)
+
+
+search_fts = table("search_fts", column("rowid"))
+
+
+def _text(*parts: Optional[str]) -> str:
+    return "\n".join(part for part in parts if part)
+
+
+def user_document(user: User) -> Dict[str, Any]:
+    return {
+        "project_id": None,
+        "title": user.full_name,
+        "subtitle": user.email,
+        "body": _text(user.email, user.department),
+    }
+
+
+def project_document(project: Project) -> Dict[str, Any]:
+    return {
+        "project_id": project.id,
+        "title": project.name,
+        "subtitle": project.client,
+        "body": _text(project.client, project.description),
+    }
+
+
+def task_document(task: Task) -> Dict[str, Any]:
+    return {
+        "project_id": task.project_id,
+        "title": task.title,
+        "subtitle": task.status,
+        "body": task.description or "",
+    }
+
+
+# Model -> (kind, document builder, columns the document depends on)
+SOURCES = {
+    User: ("user", user_document, ("full_name", "email", "department")),
+    Project: ("project", project_document, ("name", "client", "description")),
+    Task: ("task", task_document, ("title", "description", "status", "project_id")),
+}
+
+
+# Index maintenance through ORM events. They run inside the flush, on the
+# same connection and transaction as the row they mirror.
+
+def _write_document(connection, kind: str, ref_id: str, document: Dict[str, Any]):
+    result = connection.execute(
+        update(SearchDocument)
+        .where(SearchDocument.kind == kind, SearchDocument.ref_id == ref_id)
+        .values(**document)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(SearchDocument).values(kind=kind, ref_id=ref_id, **document))
+
+
+def _after_insert(mapper, connection, target):
+    kind, build, _ = SOURCES[mapper.class_]
+    _write_document(connection, kind, target.id, build(target))
+
+
+def _after_update(mapper, connection, target):
+    kind, build, fields = SOURCES[mapper.class_]
+    if any(attributes.get_history(target, field).has_changes() for field in fields):
+        _write_document(connection, kind, target.id, build(target))
+
+
+def _after_delete(mapper, connection, target):
+    kind = SOURCES[mapper.class_][0]
+    connection.execute(
+        delete(SearchDocument).where(SearchDocument.kind == kind, SearchDocument.ref_id == target.id)
+    )
+
+
+for model in SOURCES:
+    event.listen(model, "after_insert", _after_insert)
+    event.listen(model, "after_update", _after_update)
+    event.listen(model, "after_delete", _after_delete)
+
+
+async def remove_documents(db: AsyncSession, kind: str, ref_ids: Sequence[str]):
+    """Drop the documents of rows deleted with a bulk statement, which skips ORM events."""
+    if ref_ids:
+        await db.execute(
+            delete(SearchDocument).where(SearchDocument.kind == kind, SearchDocument.ref_id.in_(ref_ids))
+        )
+
+
+# Queries
+
+def search_terms(q: str) -> List[str]:
+    """Lower-cased word tokens of the user's input, as the indexes tokenize them."""
+    return re.findall(r"\w+", q.lower())[:SEARCH_MAX_TERMS]
+
+
+def _visible_to(query, user: User):
+    """Apply the same visibility rules as the list and detail endpoints."""
+    if user.role == UserRole.ADMIN:
+        return query
+    if user.role == UserRole.MANAGER:
+        # Every project and task, and the users in their team
+        return query.where(or_(
+            SearchDocument.kind != "user",
+            SearchDocument.ref_id == user.id,
+            exists().where(
+                UserHierarchy.ancestor_id == user.id,
+                UserHierarchy.descendant_id == SearchDocument.ref_id
+            )
+        ))
+    # Employees: projects and tasks of the projects they are members of
+    return query.where(
+        SearchDocument.kind != "user",
+        exists().where(
+            ProjectMember.user_id == user.id,
+            ProjectMember.project_id == SearchDocument.project_id
+        )
+    )
+
+
+def _columns(score):
+    return select(
+        SearchDocument.kind,
+        SearchDocument.ref_id.label("id"),
+        SearchDocument.title,
+        SearchDocument.subtitle,
+        SearchDocument.project_id,
+        score.label("score"),
+    )
+
+
+def _sqlite_query(terms: List[str]):
+    match = " ".join(f'"{term}"*' for term in terms)
+    fts = literal_column("search_fts")
+    # bm25() is lower for better matches; negate it so higher scores rank first
+    score = -func.bm25(fts, TITLE_WEIGHT, BODY_WEIGHT)
+    return (
+        _columns(score)
+        .select_from(SearchDocument)
+        .join(search_fts, search_fts.c.rowid == SearchDocument.id)
+        .where(fts.op("MATCH")(match))
+        .order_by(score.desc())
+    )
+
+
+def _postgres_query(q: str, terms: List[str]):
+    vector = literal_column(PG_VECTOR)
+    tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+    score = func.greatest(func.ts_rank(vector, tsquery), func.similarity(SearchDocument.title, q))
+    return (
+        _columns(score)
+        .where(or_(vector.op("@@")(tsquery), SearchDocument.title.op("%")(q)))
+        .order_by(score.desc())
+    )
+
+
+def _like_query(terms: List[str]):
+    conditions = [
+        or_(SearchDocument.title.ilike(f"%{term}%"), SearchDocument.body.ilike(f"%{term}%"))
+        for term in terms
+    ]
+    return _columns(literal(1.0)).where(and_(*conditions)).order_by(SearchDocument.title)
+
+
+async def search(
+    db: AsyncSession,
+    user: User,
+    q: str,
+    kinds: Iterable[str] = SEARCH_KINDS,
+    limit: int = SEARCH_LIMIT,
+) -> List[Dict[str, Any]]:
+    """Ranked typeahead matches for ``q`` among the documents ``user`` may see."""
+    terms = search_terms(q)
+    if not terms:
+        return []
+
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "sqlite":
+        query = _sqlite_query(terms)
+    elif dialect_name == "postgresql":
+        query = _postgres_query(q, terms)
+    else:
+        query = _like_query(terms)
+
+    query = _visible_to(query.where(SearchDocument.kind.in_(list(kinds))), user)
+    result = await db.execute(query.limit(limit))
+    return [dict(row) for row in result.mappings().all()]
+
+
+# Backfill
+
+def _document_selects():
+    yield select(
+        literal("user"), User.id, null(), User.full_name, User.email,
+        func.coalesce(User.email, "") + "\n" + func.coalesce(User.department, "")
+    )
+    yield select(
+        literal("project"), Project.id, Project.id, Project.name, Project.client,
+        func.coalesce(Project.client, "") + "\n" + func.coalesce(Project.description, "")
+    )
+    yield select(
+        literal("task"), Task.id, Task.project_id, Task.title, Task.status,
+        func.coalesce(Task.description, "")
+    )
+
+
+async def rebuild_search(db: AsyncSession) -> int:
+    """Recreate every search document from the users, projects and tasks tables."""
+    await db.execute(delete(SearchDocument))
+    for documents in _document_selects():
+        await db.execute(
+            insert(SearchDocument).from_select(
+                ["kind", "ref_id", "project_id", "title", "subtitle", "body"], documents
+            )
+        )
+    await db.commit()
+    return (await db.execute(select(func.count()).select_from(SearchDocument))).scalar() or 0
+
+
+async def sync_search(db: AsyncSession):
+    """Rebuild the search documents on startup if their count is off (older databases)."""
+    expected = 0
+    for model in SOURCES:
+        expected += (await db.execute(select(func.count()).select_from(model))).scalar() or 0
+    stored = (await db.execute(select(func.count()).select_from(SearchDocument))).scalar() or 0
+    if expected != stored:
+        count = await rebuild_search(db)
+        print(f"Rebuilt search index: {count} documents")
+
+
+async def _main():
+    from .database import async_session, create_tables
+
+    await create_tables()
+    async with async_session() as db:
+        count = await rebuild_search(db)
+        print(f"Rebuilt search index: {count} documents")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the search index")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    asyncio.run(_main())
@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, event, exists, func, insert, literal, null, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import attributes
+
+from .database import Project, ProjectMember, SyncChange, Task, TimeEntry, User, UserHierarchy, UserRole
+
+# Configuration
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+SYNC_RETENTION_DAYS = int(os.getenv("SYNC_RETENTION_DAYS", "30"))
+
+# Serializes change-log writes on PostgreSQL so sequence order is commit order
+SYNC_LOCK_KEY = 4021
+
+# Access rows: a user's visible set changed ("*": everyone's did)
+ACCESS = "access"
+EVERYONE = "*"
+
+# Model -> (kind, feed key, (project_id, user_id) of a row)
+SOURCES = {
+    User: ("user", "users", lambda user: (None, user.id)),
+    Project: ("project", "projects", lambda project: (project.id, project.created_by)),
+    Task: ("task", "tasks", lambda task: (task.project_id, task.assignee_id)),
+    TimeEntry: ("time_entry", "time_entries", lambda entry: (entry.project_id, entry.user_id)),
+}
+MODELS = {kind: model for model, (kind, _, _) in SOURCES.items()}
+FEED_KEYS = {kind: key for kind, key, _ in SOURCES.values()}
+
+
+# Recording. Every write replaces the entity's row, so it gets the next
+# sequence number and the feed never holds more than one row per entity.
+
+def _record(connection, kind: str, rows: Iterable[Tuple[str, Optional[str], Optional[str]]], op: str = "upsert"):
+    rows = list(rows)
+    if not rows:
+        return
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SYNC_LOCK_KEY})
+    connection.execute(
+        delete(SyncChange).where(SyncChange.kind == kind, SyncChange.ref_id.in_([row[0] for row in rows]))
+    )
+    now = datetime.utcnow()
+    connection.execute(insert(SyncChange), [
+        {"kind": kind, "ref_id": ref_id, "op": op, "project_id": project_id, "user_id": user_id, "changed_at": now}
+        for ref_id, project_id, user_id in rows
+    ])
+
+
+def _after_insert(mapper, connection, target):
+    kind, _, scope = SOURCES[mapper.class_]
+    _record(connection, kind, [(target.id, *scope(target))])
+
+
+def _after_update(mapper, connection, target):
+    if any(attributes.get_history(target, attr.key).has_changes() for attr in mapper.column_attrs):
+        kind, _, scope = SOURCES[mapper.class_]
+        _record(connection, kind, [(target.id, *scope(target))])
+        if kind == "task":
+            _record_move(connection, target)
+
+
+def _record_move(connection, task):
+    """
+    Reset members of the project a task moved out of who cannot see its new
+    project: the task is now filed under the new one, so they would never
+    get its tombstone.
+    """
+    old_ids = [pid for pid in attributes.get_history(task, "project_id").deleted if pid is not None]
+    if not old_ids:
+        return
+
+    def members(project_ids):
+        query = select(ProjectMember.user_id).where(ProjectMember.project_id.in_(project_ids))
+        return {row[0] for row in connection.execute(query)}
+
+    user_ids = members(old_ids) - members([task.project_id])
+    _record(connection, ACCESS, [(user_id, None, user_id) for user_id in sorted(user_ids)])
+
+
+def _after_delete(mapper, connection, target):
+    kind, _, scope = SOURCES[mapper.class_]
+    _record(connection, kind, [(target.id, *scope(target))], op="delete")
+
+
+for model in SOURCES:
+    event.listen(model, "after_insert", _after_insert)
+    event.listen(model, "after_update", _after_update)
+    event.listen(model, "after_delete", _after_delete)
+
+
+async def record_changes(
+    db: AsyncSession,
+    kind: str,
+    rows: Sequence[Tuple[str, Optional[str], Optional[str]]],
+    op: str = "upsert",
+):
+    """
+    Record ``(ref_id, project_id, user_id)`` rows written with bulk statements,
+    which skip the ORM events, inside the caller's transaction.
+    """
+    if rows:
+        await db.run_sync(lambda session: _record(session.connection(), kind, rows, op))
+
+
+async def record_access_change(db: AsyncSession, user_ids: Optional[Iterable[str]] = None):
+    """
+    Mark the visible set of ``user_ids`` (everyone when ``None``) as changed;
+    their next sync starts over from a full snapshot.
+    """
+    user_ids = [EVERYONE] if user_ids is None else list(user_ids)
+    await record_changes(db, ACCESS, [(user_id, None, user_id) for user_id in user_ids])
+
+
+# Tokens
+
+def encode_token(seq: int, checked: int) -> str:
+    raw = json.dumps({"seq": seq, "checked": checked, "at": int(time.time())})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_token(token: str) -> Optional[Dict[str, int]]:
+    """The token's state, or ``None`` if it is malformed or too old to continue from."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        seq, checked, issued = int(state["seq"]), int(state["checked"]), int(state["at"])
+    except (ValueError, TypeError, KeyError):
+        return None
+    # Tombstones older than the retention period may be gone already
+    if issued < time.time() - SYNC_RETENTION_DAYS * 86400:
+        return None
+    return {"seq": seq, "checked": checked}
+
+
+# Reading
+
+def _visible_to(query, user: User):
+    """Same visibility as the list endpoints of each collection."""
+    if user.role == UserRole.ADMIN:
+        return query
+    shared = SyncChange.kind.in_(("project", "task"))
+    if user.role == UserRole.MANAGER:
+        # Every project and task; users and time entries of their team
+        return query.where(or_(
+            shared,
+            exists().where(
+                UserHierarchy.ancestor_id == user.id,
+                UserHierarchy.descendant_id == SyncChange.user_id
+            )
+        ))
+    # Employees: projects and tasks of their projects, their own user and time entries
+    return query.where(or_(
+        and_(shared, exists().where(
+            ProjectMember.user_id == user.id,
+            ProjectMember.project_id == SyncChange.project_id
+        )),
+        and_(SyncChange.kind.in_(("user", "time_entry")), SyncChange.user_id == user.id)
+    ))
+
+
+async def _access_changed(db: AsyncSession, user: User, since: int) -> bool:
+    if user.role == UserRole.ADMIN:
+        return False
+    result = await db.execute(
+        select(SyncChange.seq).where(
+            SyncChange.kind == ACCESS,
+            SyncChange.seq > since,
+            SyncChange.ref_id.in_((user.id, EVERYONE))
+        ).limit(1)
+    )
+    return result.first() is not None
+
+
+async def changes_since(
+    db: AsyncSession,
+    user: User,
+    token: Optional[str] = None,
+    limit: int = SYNC_PAGE_SIZE,
+) -> Dict[str, Any]:
+    """
+    One page of the changes ``user`` may see after ``token``: current rows of
+    what was created or updated, ids of what was deleted, and the token to
+    continue from. Without a usable token, or after the user's access changed,
+    the feed restarts from a full snapshot (``reset``) and the client replaces
+    its local copy.
+    """
+    state = decode_token(token) if token else None
+    current = (await db.execute(select(func.max(SyncChange.seq)))).scalar() or 0
+    reset = state is None or await _access_changed(db, user, state["checked"])
+    since = 0 if reset else state["seq"]
+
+    query = select(SyncChange).where(
+        SyncChange.seq > since,
+        SyncChange.seq <= current,
+        SyncChange.kind != ACCESS
+    )
+    if reset:
+        query = query.where(SyncChange.op == "upsert")
+    query = _visible_to(query, user).order_by(SyncChange.seq).limit(limit + 1)
+    changes = (await db.execute(query)).scalars().all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    feed: Dict[str, Any] = {key: [] for key in FEED_KEYS.values()}
+    deleted: Dict[str, List[str]] = {key: [] for key in FEED_KEYS.values()}
+    updated_ids: Dict[str, List[str]] = {}
+    for change in changes:
+        if change.op == "delete":
+            deleted[FEED_KEYS[change.kind]].append(change.ref_id)
+        else:
+            updated_ids.setdefault(change.kind, []).append(change.ref_id)
+
+    # Current rows, one IN query per collection
+    for kind, ref_ids in updated_ids.items():
+        model = MODELS[kind]
+        result = await db.execute(select(model).where(model.id.in_(ref_ids)))
+        feed[FEED_KEYS[kind]] = result.scalars().all()
+
+    next_seq = changes[-1].seq if has_more else current
+    feed.update({
+        "token": encode_token(next_seq, current),
+        "reset": reset,
+        "has_more": has_more,
+        "deleted": deleted,
+    })
+    return feed
+
+
+# Maintenance
+
+async def purge_tombstones(db: AsyncSession) -> int:
+    """Drop tombstones and access marks older than the retention period."""
+    cutoff = datetime.utcnow() - timedelta(days=SYNC_RETENTION_DAYS)
+    result = await db.execute(
+        delete(SyncChange).where(
+            or_(SyncChange.op == "delete", SyncChange.kind == ACCESS),
+            SyncChange.changed_at < cutoff
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def rebuild_changes(db: AsyncSession) -> int:
+    """Recreate the feed from the current rows; every client resyncs from scratch."""
+    await db.execute(delete(SyncChange))
+    now = datetime.utcnow()
+    for model, (kind, _, _) in SOURCES.items():
+        project_column, user_column = {
+            User: (null(), User.id),
+            Project: (Project.id, Project.created_by),
+            Task: (Task.project_id, Task.assignee_id),
+            TimeEntry: (TimeEntry.project_id, TimeEntry.user_id),
+        }[model]
+        await db.execute(
+            insert(SyncChange).from_select(
+                ["kind", "ref_id", "op", "project_id", "user_id", "changed_at"],
+                select(literal(kind), model.id, literal("upsert"), project_column, user_column, literal(now))
+            )
+        )
+    await record_access_change(db)
+    await db.commit()
+    return (await db.execute(select(func.count()).select_from(SyncChange))).scalar() or 0
+
+
+async def sync_change_log(db: AsyncSession):
+    """Rebuild the feed on startup if rows are missing from it (older databases)."""
+    expected = 0
+    for model in SOURCES:
+        expected += (await db.execute(select(func.count()).select_from(model))).scalar() or 0
+    stored = (await db.execute(
+        select(func.count()).select_from(SyncChange).where(SyncChange.kind != ACCESS, SyncChange.op == "upsert")
+    )).scalar() or 0
+    if expected != stored:
+        count = await rebuild_changes(db)
+        print(f"Rebuilt sync change feed: {count} rows")
+
+
+async def _main(command: str):
+    from .database import async_session, create_tables
+
+    await create_tables()
+    async with async_session() as db:
+        if command == "rebuild":
+            count = await rebuild_changes(db)
+            print(f"Rebuilt sync change feed: {count} rows")
+        else:
+            count = await purge_tombstones(db)
+            print(f"Purged {count} sync tombstones")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the sync change feed")
+    parser.add_argument("command", choices=["rebuild", "purge"])
+    asyncio.run(_main(parser.parse_args().command))
@@ -0,0 +1,110 @@
+"""
+Shared fixtures. Tests run against a throwaway SQLite database, created
+before the backend package is imported so its engine binds to it.
+"""
+import asyncio
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="activity-tracker-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+
+import httpx  # noqa: E402
+
+from backend import auth  # noqa: E402
+from backend.database import Base, Project, TimeEntry, User, UserRole, async_session, engine  # noqa: E402
+from backend.hierarchy import add_user, team_cache  # noqa: E402
+from backend.interning import applications, window_titles  # noqa: E402
+from backend.membership import membership_cache  # noqa: E402
+from backend.notifications import unread_counter  # noqa: E402
+from backend.timers import timer_registry  # noqa: E402
+
+engine.echo = False
+
+
+def run(coro):
+    """Run ``coro`` on a fresh event loop, releasing pooled connections afterwards."""
+    async def scenario():
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+    return asyncio.run(scenario())
+
+
+async def _reset():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@pytest.fixture(autouse=True)
+def fresh_db():
+    run(_reset())
+    team_cache._teams.clear()
+    membership_cache._projects.clear()
+    applications._ids.clear()
+    window_titles._ids.clear()
+    timer_registry._by_user.clear()
+    timer_registry._by_entry.clear()
+    unread_counter._counts.clear()
+    yield
+
+
+async def make_user(db, role: UserRole = UserRole.EMPLOYEE, manager_id=None, name=None) -> User:
+    user = User(
+        id=str(uuid.uuid4()),
+        email=f"{uuid.uuid4().hex[:12]}@example.com",
+        hashed_password="x",
+        full_name=name or role.value.title(),
+        role=role,
+        manager_id=manager_id,
+        is_active=True,
+    )
+    db.add(user)
+    await db.flush()
+    await add_user(db, user)
+    return user
+
+
+async def make_project(db, owner: User, name: str = "Project") -> Project:
+    project = Project(id=str(uuid.uuid4()), name=name, created_by=owner.id)
+    db.add(project)
+    await db.flush()
+    return project
+
+
+async def make_entry(db, user: User, project: Project, start: datetime, seconds: int = 3600) -> TimeEntry:
+    entry = TimeEntry(
+        id=str(uuid.uuid4()),
+        user_id=user.id,
+        project_id=project.id,
+        start_time=start,
+        end_time=start + timedelta(seconds=seconds),
+        duration_seconds=seconds,
+        is_billable=True,
+        # Set explicitly, as the start endpoint does
+        created_at=start,
+        updated_at=start,
+    )
+    db.add(entry)
+    await db.flush()
+    return entry
+
+
+def headers_for(user: User) -> dict:
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': user.email, 'role': user.role})}"}
+
+
+def client() -> httpx.AsyncClient:
+    from backend.main import app
+    return httpx.AsyncClient(app=app, base_url="http://test")
+
+
+__all__ = [
+    "async_session", "client", "headers_for", "make_entry", "make_project", "make_user", "run",
+]
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from backend.app_usage import expected_usage, record_screenshot, remove_time_entry
+from backend.database import AppUsageDaily, Screenshot, TimeEntry, UserRole
+from backend.interning import applications
+
+from .conftest import async_session, client, headers_for, make_entry, make_project, make_user, run
+
+# Out of order on purpose; the 09:20 gap is longer than the cap
+SHOTS = [(9, 0, "Editor"), (9, 20, "Browser"), (9, 3, "Browser"), (9, 22, None), (9, 24, "Editor")]
+
+
+async def _counters(db):
+    result = await db.execute(select(AppUsageDaily))
+    return {
+        (row.user_id, row.day, row.application_id): [row.seconds, row.screenshots]
+        for row in result.scalars().all()
+        if row.seconds or row.screenshots
+    }
+
+
+async def _expected(db):
+    return {key: value for key, value in (await expected_usage(db)).items() if any(value)}
+
+
+async def _seed():
+    ids = {name: await applications.id_for(name) for name in ("Editor", "Browser")}
+    async with async_session() as db:
+        user = await make_user(db, UserRole.ADMIN)
+        project = await make_project(db, user)
+        entry = await make_entry(db, user, project, datetime(2026, 3, 2, 9))
+        shots = []
+        for hour, minute, name in SHOTS:
+            created_at = datetime(2026, 3, 2, hour, minute)
+            application_id = ids.get(name)
+            await record_screenshot(db, user.id, entry.id, created_at, application_id)
+            shot = Screenshot(
+                user_id=user.id, time_entry_id=entry.id, image_path="missing.png", thumbnail_path="missing.png",
+                activity_level=50, application_id=application_id, created_at=created_at
+            )
+            db.add(shot)
+            await db.flush()
+            shots.append(shot.id)
+        await db.commit()
+        return user, entry.id, shots
+
+
+def test_recorded_counters_match_a_rebuild():
+    async def scenario():
+        await _seed()
+        async with async_session() as db:
+            return await _counters(db), await _expected(db)
+
+    counters, expected = run(scenario())
+    assert counters == expected
+    assert sum(count for _, count in counters.values()) == len(SHOTS)
+
+
+def test_deleting_screenshots_keeps_counters_in_step():
+    async def scenario():
+        user, _, shots = await _seed()
+        async with client() as http:
+            # The middle, first and last screenshots of the entry
+            for index in (2, 0, 4):
+                response = await http.delete(f"/api/screenshots/{shots[index]}", headers=headers_for(user))
+                assert response.status_code == 204
+        async with async_session() as db:
+            return await _counters(db), await _expected(db)
+
+    counters, expected = run(scenario())
+    assert counters == expected
+    assert sum(count for _, count in counters.values()) == len(SHOTS) - 3
+
+
+def test_removing_a_time_entry_clears_its_usage():
+    async def scenario():
+        _, entry_id, _ = await _seed()
+        async with async_session() as db:
+            await remove_time_entry(db, entry_id)
+            await db.execute(delete(Screenshot).where(Screenshot.time_entry_id == entry_id))
+            await db.execute(delete(TimeEntry).where(TimeEntry.id == entry_id))
+            await db.commit()
+            return await _counters(db)
+
+    assert run(scenario()) == {}
@@ -0,0 +1,35 @@
+import io
+import json
+
+import pytest
+
+from backend import bulk_tasks
+from backend.bulk_tasks import read_json_rows
+
+ROWS = [
+    {"title": "Café ☕", "status": "todo", "description": "x" * 40},
+    {"title": "Second", "estimate": 12345, "done": False, "tags": ["a", "b"]},
+    {"title": "Last", "due_date": None},
+]
+
+
+@pytest.mark.parametrize("read_size", [1, 3, 7, 64 * 1024])
+def test_json_arrays_are_read_item_by_item(monkeypatch, read_size):
+    monkeypatch.setattr(bulk_tasks, "IMPORT_READ_SIZE", read_size)
+    document = json.dumps(ROWS, indent=2, ensure_ascii=False).encode("utf-8")
+    assert list(read_json_rows(io.BytesIO(b"  \n" + document + b"\n"))) == ROWS
+    # Numbers cut by a read boundary are not split into two values
+    assert list(read_json_rows(io.BytesIO(b"[1234567, true, null]"))) == [1234567, True, None]
+    assert list(read_json_rows(io.BytesIO(b"[ ]"))) == []
+
+
+def test_ndjson_is_read_line_by_line():
+    document = "\n".join(json.dumps(row) for row in ROWS).encode("utf-8")
+    assert list(read_json_rows(io.BytesIO(document + b"\n\n"))) == ROWS
+
+
+@pytest.mark.parametrize("document", [b"[{}", b"[{} {}]", b"[{},]", b"[{}] {}", b"[{\"title\": "])
+def test_malformed_json_arrays_are_rejected(monkeypatch, document):
+    monkeypatch.setattr(bulk_tasks, "IMPORT_READ_SIZE", 2)
+    with pytest.raises(ValueError):
+        list(read_json_rows(io.BytesIO(document)))
@@ -0,0 +1,217 @@
+import asyncio
+import json
+
+from backend import board
+from backend.connections import ConnectionManager, team_topic
+from backend.database import UserRole
+from backend.hierarchy import set_manager, team_cache
+from backend.membership import add_members
+from backend.presence import PresenceService
+from backend.pubsub import InProcessPubSub
+from backend.routers.ws import can_subscribe
+
+from .conftest import async_session, client, headers_for, make_project, make_user, run
+
+
+class FakeSocket:
+    """Accepts and records messages; ``blocked`` sockets never finish a send."""
+
+    def __init__(self, blocked: bool = False):
+        self.blocked = blocked
+        self.sent = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        if self.blocked:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(data))
+
+    async def close(self):
+        self.closed = True
+
+
+def test_overflow_disconnects_by_default():
+    async def scenario():
+        manager = ConnectionManager(queue_size=2)
+        socket = FakeSocket(blocked=True)
+        connection = await manager.connect(socket, "user-1")
+        await asyncio.sleep(0)
+        for n in range(4):
+            manager.publish("user:user-1", {"n": n})
+        await asyncio.sleep(0)
+        return connection, manager
+
+    connection, manager = run(scenario())
+    assert connection.closed
+    assert not manager.is_connected("user-1")
+
+
+def test_presence_resyncs_sockets_that_dropped_messages():
+    async def scenario():
+        manager = ConnectionManager(queue_size=2)
+        presence = PresenceService(manager, InProcessPubSub())
+        socket = FakeSocket(blocked=True)
+        connection = await manager.connect(socket, "manager-1", slow_consumer_policy="drop")
+        await presence.subscribe(connection)
+        await asyncio.sleep(0)
+
+        # More deltas than the queue holds while the client is stuck
+        for n in range(4):
+            presence._apply_started({"user_id": f"user-{n}", "time_entry_id": f"entry-{n}"})
+            await presence.flush()
+        assert not connection.closed
+        assert connection.dropped
+
+        # Still stuck, so the snapshot displaces a message too and resyncs again next tick
+        await presence.flush()
+        last = connection.queue._queue[-1]
+        return json.loads(last)
+
+    snapshot = run(scenario())
+    assert snapshot["type"] == "snapshot"
+    assert {state["user_id"] for state in snapshot["users"]} == {f"user-{n}" for n in range(4)}
+
+
+def test_presence_socket_only_shows_the_managers_team():
+    async def scenario():
+        async with async_session() as db:
+            boss = await make_user(db, UserRole.MANAGER)
+            member = await make_user(db, manager_id=boss.id)
+            outsider = await make_user(db)
+            await db.commit()
+            boss_id, member_id, outsider_id = boss.id, member.id, outsider.id
+
+        manager = ConnectionManager()
+        presence = PresenceService(manager, InProcessPubSub())
+        presence._apply_started({"user_id": member_id, "time_entry_id": "entry-1"})
+        presence._apply_started({"user_id": outsider_id, "time_entry_id": "entry-2"})
+        await presence.flush()
+
+        boss_socket, admin_socket = FakeSocket(), FakeSocket()
+        await presence.subscribe(await manager.connect(boss_socket, boss_id), boss_id)
+        await presence.subscribe(await manager.connect(admin_socket, "admin"))
+
+        presence._apply_activity(member_id, 50, None)
+        presence._apply_activity(outsider_id, 70, None)
+        presence._apply_stopped(outsider_id)
+        await presence.flush()
+        await asyncio.sleep(0)
+
+        # Moving the outsider into the team resyncs the manager's board
+        async with async_session() as db:
+            await set_manager(db, outsider_id, boss_id)
+            await db.commit()
+        team_cache.invalidate()
+        await presence.flush()
+        await asyncio.sleep(0)
+        return boss_socket.sent, admin_socket.sent, member_id, outsider_id
+
+    boss_sent, admin_sent, member_id, outsider_id = run(scenario())
+    snapshot, delta, resync = boss_sent
+    assert [state["user_id"] for state in snapshot["users"]] == [member_id]
+    assert [state["user_id"] for state in delta["users"]] == [member_id]
+    assert delta["removed"] == []
+    assert resync["type"] == "snapshot"
+    assert {state["user_id"] for state in admin_sent[0]["users"]} == {member_id, outsider_id}
+    assert admin_sent[1]["removed"] == [outsider_id]
+    assert len(admin_sent) == 2
+
+
+def test_topics_follow_project_membership_and_team_lines():
+    async def scenario():
+        async with async_session() as db:
+            admin = await make_user(db, UserRole.ADMIN)
+            boss = await make_user(db, UserRole.MANAGER)
+            lead = await make_user(db, UserRole.MANAGER, manager_id=boss.id)
+            employee = await make_user(db, manager_id=lead.id)
+            mine = await make_project(db, admin)
+            other = await make_project(db, admin)
+            await add_members(db, mine.id, [employee.id])
+            await db.commit()
+
+            async def allowed(user, topic):
+                return await can_subscribe(db, user, topic)
+
+            return {
+                "own user": await allowed(employee, f"user:{employee.id}"),
+                "other user": await allowed(employee, f"user:{lead.id}"),
+                "member project": await allowed(employee, f"project:{mine.id}"),
+                "other project": await allowed(employee, f"project:{other.id}"),
+                "manager project": await allowed(lead, f"project:{other.id}"),
+                "employee team": await allowed(employee, f"team:{employee.id}"),
+                "own team": await allowed(lead, f"team:{lead.id}"),
+                "team below": await allowed(boss, f"team:{lead.id}"),
+                "team above": await allowed(lead, f"team:{boss.id}"),
+                "presence": await allowed(lead, "presence"),
+                "no target": await allowed(lead, "project:"),
+                "admin": await allowed(admin, f"team:{boss.id}"),
+            }
+
+    assert run(scenario()) == {
+        "own user": True,
+        "other user": False,
+        "member project": True,
+        "other project": False,
+        "manager project": True,
+        "employee team": False,
+        "own team": True,
+        "team below": True,
+        "team above": False,
+        "presence": False,
+        "no target": False,
+        "admin": True,
+    }
+
+
+def test_team_topics_carry_the_teams_presence():
+    async def scenario():
+        async with async_session() as db:
+            boss = await make_user(db, UserRole.MANAGER)
+            member = await make_user(db, manager_id=boss.id)
+            outsider = await make_user(db)
+            await db.commit()
+            boss_id, member_id, outsider_id = boss.id, member.id, outsider.id
+
+        manager = ConnectionManager()
+        presence = PresenceService(manager, InProcessPubSub())
+        presence._apply_started({"user_id": member_id, "time_entry_id": "entry-1"})
+        await presence.flush()
+        socket = FakeSocket()
+        connection = await manager.connect(socket, boss_id)
+        manager.subscribe(connection, team_topic(boss_id))
+        await presence.send_team_snapshot(connection, boss_id)
+
+        presence._apply_started({"user_id": outsider_id, "time_entry_id": "entry-2"})
+        presence._apply_stopped(member_id)
+        await presence.flush()
+        await asyncio.sleep(0)
+        return socket.sent, boss_id, member_id
+
+    sent, boss_id, member_id = run(scenario())
+    snapshot, delta = sent
+    assert snapshot["type"] == "presence.snapshot" and snapshot["team"] == boss_id
+    assert [state["user_id"] for state in snapshot["users"]] == [member_id]
+    assert delta == {"type": "presence.delta", "team": boss_id, "users": [], "removed": [member_id]}
+
+
+def test_board_changes_are_announced_on_the_project_topic(monkeypatch):
+    published = []
+    monkeypatch.setattr(board, "publish_to_topic", lambda topic, message: published.append((topic, message)))
+
+    async def scenario():
+        async with async_session() as db:
+            admin = await make_user(db, UserRole.ADMIN)
+            project = await make_project(db, admin)
+            await db.commit()
+        async with client() as http:
+            response = await http.post(
+                "/api/tasks/", json={"title": "Card", "project_id": project.id}, headers=headers_for(admin)
+            )
+            assert response.status_code == 201
+        return project.id
+
+    project_id = run(scenario())
+    assert published == [(f"project:{project_id}", {"type": "board.changed", "project_id": project_id})]
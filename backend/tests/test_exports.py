@@ -0,0 +1,108 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from backend.database import ActivityLog, Screenshot, Task, UserRole
+from backend.interning import applications
+
+from .conftest import async_session, client, headers_for, make_entry, make_project, make_user, run
+
+ENDPOINTS = ["time-entries", "activity-logs", "screenshots", "tasks"]
+
+
+async def _seed():
+    # Interning commits on a session of its own, so it goes before our writes
+    editor_id = await applications.id_for("Editor")
+    async with async_session() as db:
+        admin = await make_user(db, UserRole.ADMIN)
+        project = await make_project(db, admin)
+        entry = await make_entry(db, admin, project, datetime(2026, 3, 2, 9))
+        db.add(Task(title="Write, \"quoted\" title", project_id=project.id, due_date=datetime(2026, 3, 9)))
+        db.add(ActivityLog(
+            user_id=admin.id, time_entry_id=entry.id, timestamp=datetime(2026, 3, 2, 9, 5),
+            mouse_activity=10, keyboard_activity=20, overall_activity=15
+        ))
+        db.add(Screenshot(
+            user_id=admin.id, time_entry_id=entry.id, image_path="a.png", thumbnail_path="a.png",
+            activity_level=40, application_id=editor_id,
+            created_at=datetime(2026, 3, 2, 9, 1)
+        ))
+        await db.commit()
+        return admin
+
+
+async def _export(user, endpoint, fmt, encoding=None):
+    headers = {**headers_for(user), "Accept-Encoding": encoding or "identity"}
+    async with client() as http:
+        # httpx decodes gzip itself; read the raw bytes to check the encoding
+        async with http.stream("GET", f"/api/exports/{endpoint}", params={"format": fmt}, headers=headers) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+            return response.status_code, response.headers, raw
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+@pytest.mark.parametrize("encoding", [None, "gzip"])
+def test_ndjson_export_streams_rows(endpoint, encoding):
+    async def scenario():
+        admin = await _seed()
+        return await _export(admin, endpoint, "ndjson", encoding)
+
+    status, headers, raw = run(scenario())
+    assert status == 200
+    assert headers["content-type"].startswith("application/x-ndjson")
+    if encoding:
+        assert headers["content-encoding"] == "gzip"
+        raw = gzip.decompress(raw)
+    lines = raw.decode().splitlines()
+    assert len(lines) == 1
+    row = json.loads(lines[0])
+    assert row["id"]
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+@pytest.mark.parametrize("encoding", [None, "gzip"])
+def test_csv_export_streams_rows(endpoint, encoding):
+    async def scenario():
+        admin = await _seed()
+        return await _export(admin, endpoint, "csv", encoding)
+
+    status, headers, raw = run(scenario())
+    assert status == 200
+    assert headers["content-type"].startswith("text/csv")
+    if encoding:
+        raw = gzip.decompress(raw)
+    rows = list(csv.reader(io.StringIO(raw.decode())))
+    assert len(rows) == 2
+    assert "id" in rows[0]
+    assert len(rows[1]) == len(rows[0])
+
+
+def test_exports_serialize_names_and_datetimes():
+    async def scenario():
+        admin = await _seed()
+        screenshots = await _export(admin, "screenshots", "ndjson")
+        tasks = await _export(admin, "tasks", "csv")
+        return screenshots[2], tasks[2]
+
+    screenshots, tasks = run(scenario())
+    screenshot = json.loads(screenshots)
+    assert screenshot["application_name"] == "Editor"
+    assert screenshot["created_at"].startswith("2026-03-02T09:01")
+    header, row = list(csv.reader(io.StringIO(tasks.decode())))
+    assert row[header.index("title")] == "Write, \"quoted\" title"
+
+
+def test_empty_csv_export_names_its_columns():
+    async def scenario():
+        async with async_session() as db:
+            admin = await make_user(db, UserRole.ADMIN)
+            await db.commit()
+        return await _export(admin, "tasks", "csv")
+
+    status, _, raw = run(scenario())
+    assert status == 200
+    assert len(list(csv.reader(io.StringIO(raw.decode())))) == 1
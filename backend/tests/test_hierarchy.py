@@ -0,0 +1,135 @@
+import pytest
+from sqlalchemy.future import select
+
+from backend.database import User, UserHierarchy, UserRole
+from backend.hierarchy import HierarchyError, TeamCache, rebuild_hierarchy, remove_user, set_manager, team_cache
+
+from .conftest import async_session, client, headers_for, make_user, run
+
+
+async def _closure(db):
+    result = await db.execute(select(UserHierarchy.ancestor_id, UserHierarchy.descendant_id, UserHierarchy.depth))
+    return set(result.all())
+
+
+async def _chain():
+    """ceo <- lead <- dev, plus an unrelated peer."""
+    async with async_session() as db:
+        ceo = await make_user(db, UserRole.ADMIN, name="ceo")
+        lead = await make_user(db, UserRole.MANAGER, manager_id=ceo.id, name="lead")
+        dev = await make_user(db, UserRole.EMPLOYEE, manager_id=lead.id, name="dev")
+        peer = await make_user(db, UserRole.MANAGER, name="peer")
+        await db.commit()
+        return ceo, lead, dev, peer
+
+
+def test_closure_rows_cover_every_ancestor():
+    async def scenario():
+        ceo, lead, dev, peer = await _chain()
+        async with async_session() as db:
+            return (ceo, lead, dev, peer), await _closure(db)
+
+    (ceo, lead, dev, peer), rows = run(scenario())
+    assert rows == {
+        (ceo.id, ceo.id, 0), (lead.id, lead.id, 0), (dev.id, dev.id, 0), (peer.id, peer.id, 0),
+        (ceo.id, lead.id, 1), (lead.id, dev.id, 1), (ceo.id, dev.id, 2),
+    }
+
+
+def test_moving_a_subtree_rewrites_only_its_rows():
+    async def scenario():
+        ceo, lead, dev, peer = await _chain()
+        async with async_session() as db:
+            await set_manager(db, lead.id, peer.id)
+            await db.commit()
+            rows = await _closure(db)
+            rebuilt = await rebuild_hierarchy(db)
+            return (ceo, lead, dev, peer), rows, await _closure(db), rebuilt
+
+    (ceo, lead, dev, peer), rows, rebuilt_rows, count = run(scenario())
+    assert (peer.id, lead.id, 1) in rows and (peer.id, dev.id, 2) in rows
+    assert not {row for row in rows if row[0] == ceo.id and row[1] != ceo.id}
+    # Incremental maintenance agrees with a full rebuild from users.manager_id
+    assert rows == rebuilt_rows and count == len(rows)
+
+
+@pytest.mark.parametrize("target", ["self", "descendant"])
+def test_cycles_are_rejected(target):
+    async def scenario():
+        ceo, lead, dev, _ = await _chain()
+        async with async_session() as db:
+            before = await _closure(db)
+            with pytest.raises(HierarchyError):
+                await set_manager(db, lead.id, lead.id if target == "self" else dev.id)
+            await db.rollback()
+            return before, await _closure(db)
+
+    before, after = run(scenario())
+    assert before == after
+
+
+def test_unknown_manager_is_rejected():
+    async def scenario():
+        _, lead, _, _ = await _chain()
+        async with async_session() as db:
+            with pytest.raises(HierarchyError):
+                await set_manager(db, lead.id, "missing")
+
+    run(scenario())
+
+
+def test_removing_a_manager_hands_reports_up():
+    async def scenario():
+        ceo, lead, dev, _ = await _chain()
+        async with async_session() as db:
+            db_lead = await db.get(User, lead.id)
+            await remove_user(db, db_lead)
+            await db.commit()
+            manager_id = (await db.execute(select(User.manager_id).where(User.id == dev.id))).scalar()
+            return ceo, lead, dev, manager_id, await _closure(db)
+
+    ceo, lead, dev, manager_id, rows = run(scenario())
+    assert manager_id == ceo.id
+    assert (ceo.id, dev.id, 1) in rows
+    assert not {row for row in rows if lead.id in row[:2]}
+
+
+def test_team_cache_is_invalidated_after_commit_only():
+    async def scenario():
+        ceo, lead, dev, peer = await _chain()
+        async with async_session() as db:
+            assert dev.id not in await team_cache.member_ids(db, peer.id)
+            await set_manager(db, dev.id, peer.id)
+            # Not committed: the cached team still matches what other sessions read
+            assert dev.id not in team_cache._teams[peer.id]
+            await db.rollback()
+
+        async with client() as http:
+            response = await http.put(f"/api/users/{dev.id}", json={"manager_id": peer.id}, headers=headers_for(ceo))
+        assert response.status_code == 200
+        async with async_session() as db:
+            return dev.id in await team_cache.member_ids(db, peer.id)
+
+    assert run(scenario())
+
+
+def test_load_racing_an_invalidation_is_not_kept():
+    cache = TeamCache()
+
+    class Rows:
+        def all(self):
+            return [("report-1",)]
+
+    class RacingSession:
+        async def execute(self, query):
+            # The hierarchy changes while this read is in flight
+            cache.invalidate()
+            return Rows()
+
+    async def scenario():
+        team = await cache.member_ids(RacingSession(), "manager-1")
+        return team, dict(cache._teams)
+
+    team, cached = run(scenario())
+    assert team == {"manager-1", "report-1"}
+    assert cached == {}
@@ -0,0 +1,52 @@
+from backend.database import UserRole
+from backend.membership import MembershipCache, membership_cache
+
+from .conftest import async_session, client, headers_for, make_project, make_user, run
+
+
+def test_removed_member_loses_access():
+    async def scenario():
+        async with async_session() as db:
+            manager = await make_user(db, UserRole.MANAGER)
+            employee = await make_user(db)
+            project = await make_project(db, manager)
+            await db.commit()
+        statuses = []
+        async with client() as http:
+            response = await http.post(
+                f"/api/projects/{project.id}/members/{employee.id}", headers=headers_for(manager)
+            )
+            assert response.status_code == 204
+            statuses.append((await http.get(f"/api/projects/{project.id}", headers=headers_for(employee))).status_code)
+            response = await http.delete(
+                f"/api/projects/{project.id}/members/{employee.id}", headers=headers_for(manager)
+            )
+            assert response.status_code == 204
+            statuses.append((await http.get(f"/api/projects/{project.id}", headers=headers_for(employee))).status_code)
+        return statuses, membership_cache._projects.get(employee.id)
+
+    statuses, cached = run(scenario())
+    assert statuses == [200, 403]
+    assert cached == set()
+
+
+def test_a_load_overtaken_by_an_invalidation_is_not_kept():
+    cache = MembershipCache()
+
+    class Rows:
+        def all(self):
+            return [("project-1",)]
+
+    class RacingSession:
+        async def execute(self, query):
+            # Memberships change while this read is in flight
+            cache.invalidate(["user-1"])
+            return Rows()
+
+    async def scenario():
+        projects = await cache.project_ids(RacingSession(), "user-1")
+        return projects, dict(cache._projects)
+
+    projects, cached = run(scenario())
+    assert projects == {"project-1"}
+    assert cached == {}
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from sqlalchemy.future import select
+
+from backend.database import Notification, UserRole
+from backend.notifications import UnreadCounter, create_notification, mark_read, unread_counter
+from backend.pubsub import bus
+
+from .conftest import async_session, make_user, run
+
+
+async def _user_with_notifications(count: int):
+    async with async_session() as db:
+        user = await make_user(db, UserRole.EMPLOYEE)
+        await db.commit()
+        for n in range(count):
+            await create_notification(db, user.id, f"Title {n}", "Message")
+        return user
+
+
+async def _insert_directly(user_id: str):
+    # A write on another worker, whose bus message this worker never sees
+    async with async_session() as db:
+        db.add(Notification(
+            user_id=user_id, title="Elsewhere", message="Message", notification_type="info",
+            read=False, created_at=datetime.utcnow()
+        ))
+        await db.commit()
+
+
+def test_mark_read_rereads_the_count():
+    async def scenario():
+        user = await _user_with_notifications(3)
+        async with async_session() as db:
+            assert await unread_counter.get(db, user.id) == 3
+            await _insert_directly(user.id)
+            assert await unread_counter.get(db, user.id) == 3
+            result = await db.execute(select(Notification.id).where(Notification.user_id == user.id))
+            first_id = result.scalars().first()
+            await mark_read(db, user.id, ids=[first_id])
+            return await unread_counter.get(db, user.id)
+
+    assert run(scenario()) == 3
+
+
+def test_cached_counts_expire():
+    async def scenario():
+        counter = UnreadCounter(ttl=0)
+        user = await _user_with_notifications(1)
+        async with async_session() as db:
+            assert await counter.get(db, user.id) == 1
+            await _insert_directly(user.id)
+            return await counter.get(db, user.id)
+
+    assert run(scenario()) == 2
+
+
+def test_peer_counts_replace_and_deltas_adjust():
+    async def scenario():
+        counter = UnreadCounter()
+        counter._store("user-1", 5)
+        await counter.handle_event({"origin": "peer", "user_id": "user-1", "delta": 1})
+        assert counter._counts["user-1"][1] == 6
+        await counter.handle_event({"origin": "peer", "user_id": "user-1", "count": 2})
+        assert counter._counts["user-1"][1] == 2
+        await counter.handle_event({"origin": bus.worker_id, "user_id": "user-1", "count": 9})
+        assert counter._counts["user-1"][1] == 2
+        # Never-loaded users are left for their first read
+        await counter.handle_event({"origin": "peer", "user_id": "user-2", "delta": 1})
+        assert "user-2" not in counter._counts
+
+    run(scenario())
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from backend import pubsub
+from backend.pubsub import InMemoryRedis, RedisPubSub, create_pubsub
+
+from .conftest import run
+
+
+def test_redis_url_needs_the_redis_package(monkeypatch):
+    monkeypatch.setattr(pubsub, "aioredis", None)
+    with pytest.raises(RuntimeError, match="'redis' package"):
+        create_pubsub("redis://localhost:6379/0")
+
+
+def test_redis_url_creates_a_redis_bus():
+    if pubsub.aioredis is None:
+        pytest.skip("redis is not installed")
+    assert isinstance(create_pubsub("redis://localhost:6379/0"), RedisPubSub)
+
+
+def test_redis_bus_delivers_batches_to_every_worker():
+    async def scenario():
+        broker = InMemoryRedis()
+        first, second = RedisPubSub(broker), RedisPubSub(broker)
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        for bus in (first, second):
+            await bus.subscribe("events", handler)
+            await bus.start()
+        first.publish("events", {"n": 1})
+        await first.flush()
+        for _ in range(20):
+            if len(received) == 2:
+                break
+            await asyncio.sleep(0.01)
+        for bus in (first, second):
+            await bus.stop()
+        return received
+
+    assert run(scenario()) == [{"n": 1}, {"n": 1}]
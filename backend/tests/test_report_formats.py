@@ -0,0 +1,202 @@
+import csv
+import io
+from datetime import date, datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from backend import report_engine, report_formats
+from backend.database import Report, UserRole
+from backend.report_formats import (
+    ReportCancelled, day, describe_report_file, flag, merge_report_parts, number, open_report_writer, read_decoded,
+    report_path, text, timestamp, write_report,
+)
+from backend.report_engine import REPORT_TYPES, is_cancelled, plan_partitions, write_partition
+from backend.report_types import time_entries_query
+
+from .conftest import async_session, client, headers_for, make_entry, make_project, make_user, run
+
+COLUMNS = [text("name"), number("count"), number("hours", 2), flag("billable"), day("day"), timestamp("at")]
+ROWS = [
+    ("Ann", 3, 1.5, True, date(2026, 3, 2), datetime(2026, 3, 2, 9, 30)),
+    (None, 0, None, False, date(2026, 3, 3), datetime(2026, 3, 3, 17)),
+]
+
+
+@pytest.fixture(autouse=True)
+def uncompressed(monkeypatch):
+    monkeypatch.setattr(report_formats, "REPORT_COMPRESSION", "none")
+
+
+def _read(path, fmt):
+    """Rows of a report file as Python values (CSV as text)."""
+    if fmt == "csv":
+        _, encoding, _ = describe_report_file(str(path))
+        return list(csv.reader(io.StringIO(b"".join(read_decoded(str(path), encoding)).decode())))
+    if fmt == "parquet":
+        table = pq.read_table(str(path))
+    else:
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+    return [tuple(row.values()) for row in table.to_pylist()]
+
+
+def _write(tmp_path, fmt, rows, name="report", header=True):
+    path = report_path(tmp_path / name, fmt)
+    writer = open_report_writer(fmt, path, COLUMNS, header)
+    writer.write(rows)
+    writer.close()
+    return path
+
+
+def test_csv_report_renders_each_column_kind(tmp_path):
+    path = _write(tmp_path, "csv", ROWS)
+    assert path.name == "report.csv"
+    assert _read(path, "csv") == [
+        ["name", "count", "hours", "billable", "day", "at"],
+        ["Ann", "3", "1.50", "Yes", "2026-03-02", "2026-03-02T09:30:00"],
+        ["", "0", "0.00", "No", "2026-03-03", "2026-03-03T17:00:00"],
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_reports_keep_types(tmp_path, fmt):
+    path = _write(tmp_path, fmt, ROWS)
+    assert path.suffix == f".{fmt}"
+    assert _read(path, fmt) == [
+        ("Ann", 3, 1.5, True, date(2026, 3, 2), datetime(2026, 3, 2, 9, 30)),
+        (None, 0, None, False, date(2026, 3, 3), datetime(2026, 3, 3, 17)),
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_reports_parse_text_dates(tmp_path, fmt):
+    # SQLite returns func.date() as text; the column is still typed as a date
+    rows = [(row[:4] + (row[4].isoformat(),) + row[5:]) for row in ROWS]
+    assert _read(_write(tmp_path, fmt, rows), fmt) == _read(_write(tmp_path, fmt, ROWS, "typed"), fmt)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_write_report_streams_a_query(tmp_path, fmt):
+    async def scenario():
+        async with async_session() as db:
+            user = await make_user(db, UserRole.ADMIN, name="Ann")
+            project = await make_project(db, user, "Website")
+            for hour in (9, 11, 14):
+                await make_entry(db, user, project, datetime(2026, 3, 2, hour), seconds=5400)
+            await db.commit()
+            return await write_report(
+                db, time_entries_query({}), REPORT_TYPES["time_entries"].columns, fmt, tmp_path / "entries"
+            )
+
+    path, count = run(scenario())
+    assert count == 3
+    rows = _read(path, fmt)
+    if fmt == "csv":
+        header, *rows = rows
+        assert header[0] and len(header) == len(rows[0])
+    assert len(rows) == 3
+    assert all(row[0] == "Ann" and row[1] == "Website" for row in rows)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_cancelled_report_leaves_no_file(tmp_path, fmt):
+    async def scenario():
+        async with async_session() as db:
+            user = await make_user(db, UserRole.ADMIN)
+            project = await make_project(db, user)
+            await make_entry(db, user, project, datetime(2026, 3, 2, 9))
+            await db.commit()
+            await write_report(
+                db, time_entries_query({}), REPORT_TYPES["time_entries"].columns, fmt, tmp_path / "entries",
+                should_stop=lambda: True
+            )
+
+    with pytest.raises(ReportCancelled):
+        run(scenario())
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cancel_only_marks_reports_still_running(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_engine, "REPORTS_DIR", str(tmp_path))
+
+    async def scenario():
+        async with async_session() as db:
+            user = await make_user(db, UserRole.ADMIN)
+            reports = [
+                Report(
+                    name=status, start_date=date(2026, 3, 1), end_date=date(2026, 3, 2), report_type="time_entries",
+                    created_by=user.id, status=status
+                )
+                for status in ("processing", "completed")
+            ]
+            db.add_all(reports)
+            await db.commit()
+        running, finished = (report.id for report in reports)
+        async with client() as http:
+            responses = [
+                await http.post(f"/api/reports/{report_id}/cancel", headers=headers_for(user))
+                for report_id in (running, running, finished)
+            ]
+        return [(response.status_code, response.json()) for response in responses], running, finished
+
+    (first, again, done), running, finished = run(scenario())
+    assert first[0] == 200 and first[1]["status"] == "cancelling"
+    # Asking twice is harmless; a finished report is left alone
+    assert again[0] == 200 and again[1]["status"] == "cancelling"
+    assert done == (409, {"detail": "Report is already completed"})
+    assert is_cancelled(running) and not is_cancelled(finished)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_merged_parts_read_as_one_report(tmp_path, fmt):
+    parts = [
+        _write(tmp_path, fmt, ROWS[:1], "part0"),
+        # Only the first CSV part has a header
+        _write(tmp_path, fmt, ROWS[1:], "part1", header=False),
+        _write(tmp_path, fmt, [], "part2", header=False),
+    ]
+    merged = merge_report_parts(fmt, parts, report_path(tmp_path / "merged", fmt))
+    assert _read(merged, fmt) == _read(_write(tmp_path, fmt, ROWS, "whole"), fmt)
+    assert not any(part.exists() for part in parts)
+
+
+def test_partitions_split_dates_then_users(monkeypatch):
+    monkeypatch.setattr(report_engine, "REPORT_PARTITION_DAYS", 7)
+    monkeypatch.setattr(report_engine, "REPORT_PARTITION_USERS", 2)
+    params = {"start_date": date(2026, 3, 1), "end_date": date(2026, 3, 16), "user_ids": ["a", "b", "c"]}
+    assert plan_partitions(params, workers=1) == [(date(2026, 3, 1), date(2026, 3, 17), None)]
+    assert plan_partitions(params, workers=4) == [
+        (date(2026, 3, 1), date(2026, 3, 8), ["a", "b"]),
+        (date(2026, 3, 1), date(2026, 3, 8), ["c"]),
+        (date(2026, 3, 8), date(2026, 3, 15), ["a", "b"]),
+        (date(2026, 3, 8), date(2026, 3, 15), ["c"]),
+        (date(2026, 3, 15), date(2026, 3, 17), ["a", "b"]),
+        (date(2026, 3, 15), date(2026, 3, 17), ["c"]),
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_partitioned_report_matches_a_single_pass(tmp_path, monkeypatch, fmt):
+    monkeypatch.setattr(report_engine, "REPORTS_DIR", str(tmp_path))
+    monkeypatch.setattr(report_engine, "REPORT_PARTITION_DAYS", 2)
+
+    async def scenario():
+        async with async_session() as db:
+            user = await make_user(db, UserRole.ADMIN)
+            project = await make_project(db, user)
+            for offset in range(0, 9 * 24, 15):
+                await make_entry(db, user, project, datetime(2026, 3, 1) + timedelta(hours=offset))
+            await db.commit()
+        params = {"id": "r1", "format": fmt, "start_date": date(2026, 3, 1), "end_date": date(2026, 3, 9)}
+        partitions = plan_partitions(params, workers=4)
+        written = [await write_partition("time_entries", params, index, part) for index, part in enumerate(partitions)]
+        merged = merge_report_parts(fmt, [path for path, _ in written], report_path(tmp_path / "merged", fmt))
+        whole, _ = await write_partition("time_entries", {**params, "id": "r2"}, 0, plan_partitions(params, workers=1)[0])
+        return len(partitions), sum(rows for _, rows in written), merged, whole
+
+    partitions, rows, merged, whole = run(scenario())
+    assert partitions == 5
+    assert rows == 15
+    assert _read(merged, fmt) == _read(whole, fmt)
@@ -0,0 +1,90 @@
+import csv
+import io
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from backend import report_engine, report_formats
+from backend import report_types  # noqa: F401  (registers the report types)
+from backend.database import ActivityLog, Screenshot, TimeEntry, UserRole
+from backend.interning import applications
+from backend.report_engine import plan_partitions, write_partition
+from backend.report_formats import merge_report_parts, report_path
+
+from .conftest import async_session, make_project, make_user, run
+
+ENTRY_START = datetime(2026, 3, 1, 22)
+ENTRY_END = datetime(2026, 3, 2, 2)
+# Every five minutes, then a long idle stretch across midnight
+SHOT_TIMES = [ENTRY_START + timedelta(minutes=5 * n) for n in range(24)] + [
+    datetime(2026, 3, 1, 23, 58),
+] + [datetime(2026, 3, 2, 0, 40) + timedelta(minutes=5 * n) for n in range(16)]
+
+
+@pytest.fixture(autouse=True)
+def reports_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_engine, "REPORTS_DIR", str(tmp_path))
+    monkeypatch.setattr(report_formats, "REPORT_COMPRESSION", "none")
+
+
+async def _seed():
+    editor_id = await applications.id_for("Editor")
+    async with async_session() as db:
+        user = await make_user(db, UserRole.ADMIN, name="Ann")
+        project = await make_project(db, user)
+        entry = TimeEntry(
+            user_id=user.id, project_id=project.id, start_time=ENTRY_START, end_time=ENTRY_END,
+            duration_seconds=int((ENTRY_END - ENTRY_START).total_seconds()), is_billable=True,
+            created_at=ENTRY_START, updated_at=ENTRY_END
+        )
+        db.add(entry)
+        await db.flush()
+        for at in SHOT_TIMES:
+            db.add(Screenshot(
+                user_id=user.id, time_entry_id=entry.id, image_path="a.png", thumbnail_path="a.png",
+                activity_level=50, application_id=editor_id, created_at=at
+            ))
+        minute = ENTRY_START
+        while minute < ENTRY_END:
+            db.add(ActivityLog(
+                user_id=user.id, time_entry_id=entry.id, timestamp=minute,
+                mouse_activity=40, keyboard_activity=40, overall_activity=40
+            ))
+            minute += timedelta(minutes=1)
+        await db.commit()
+
+
+async def _generate(tmp_path, report_id, workers):
+    params = {"id": report_id, "format": "csv", "start_date": date(2026, 3, 1), "end_date": date(2026, 3, 2)}
+    partitions = plan_partitions(params, workers=workers)
+    parts = [
+        (await write_partition("screenshot_activity", params, index, partition))[0]
+        for index, partition in enumerate(partitions)
+    ]
+    path = merge_report_parts("csv", parts, report_path(tmp_path / report_id, "csv"))
+    return len(partitions), list(csv.reader(io.StringIO(path.read_text())))
+
+
+def test_screenshot_activity_does_not_depend_on_partitioning(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_engine, "REPORT_PARTITION_DAYS", 1)
+
+    async def scenario():
+        await _seed()
+        return await _generate(tmp_path, "single", 1), await _generate(tmp_path, "split", 4)
+
+    (single_count, single), (split_count, split) = run(scenario())
+    assert (single_count, split_count) == (1, 2)
+    assert split == single
+
+    header, first_day, second_day = single
+    row = dict(zip(header, first_day))
+    assert row["Date"] == "2026-03-01"
+    assert row["Screenshots"] == "25"
+    # 23 five-minute spans, 3 minutes to 23:58, then the 42-minute gap capped at 10
+    assert row["Hours"] == f"{(23 * 300 + 180 + 600) / 3600:.2f}"
+    assert row["Activity Samples"] == str(23 * 5 + 3 + 10)
+    row = dict(zip(header, second_day))
+    assert row["Screenshots"] == "16"
+    # The last screenshot stands for the time until the entry's end
+    assert row["Hours"] == f"{(15 * 300 + 300) / 3600:.2f}"
+    assert row["Activity Samples"] == str(16 * 5)
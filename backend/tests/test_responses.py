@@ -0,0 +1,119 @@
+import gzip
+from datetime import date
+
+import pytest
+import zstandard
+
+from backend import report_formats
+from backend.database import Report, UserRole
+from backend.report_formats import describe_report_file, merge_report_parts, open_report_writer, report_path, text
+from backend.responses import parse_range
+
+from .conftest import async_session, client, headers_for, make_user, run
+
+BODY = bytes(range(256)) * 40
+
+
+def _unzstd(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().stream_reader(data, read_across_frames=True).read()
+
+
+def test_parse_range_forms():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    # Past the end is clamped; a suffix longer than the file is the whole file
+    assert parse_range("bytes=90-500", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-500", 100) == (0, 99)
+
+
+def test_parse_range_ignores_what_it_cannot_serve_as_one_range():
+    for header in ("bytes=0-1,5-6", "items=0-9", "bytes=-", "nonsense"):
+        assert parse_range(header, 100) is None
+
+
+def test_parse_range_rejects_ranges_outside_the_file():
+    for header in ("bytes=100-", "bytes=100-200", "bytes=9-5"):
+        with pytest.raises(ValueError):
+            parse_range(header, 100)
+    with pytest.raises(ValueError):
+        parse_range("bytes=-1", 0)
+
+
+async def _report(path):
+    async with async_session() as db:
+        user = await make_user(db, UserRole.ADMIN)
+        report = Report(
+            name="Report", start_date=date(2026, 3, 1), end_date=date(2026, 3, 31), report_type="time_entries",
+            created_by=user.id, status="completed", file_path=str(path)
+        )
+        db.add(report)
+        await db.commit()
+        return user, report.id
+
+
+async def _download(user, report_id, **headers):
+    async with client() as http:
+        async with http.stream(
+            "GET", f"/api/reports/{report_id}/download", headers={**headers_for(user), **headers}
+        ) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+            return response.status_code, response.headers, raw
+
+
+def test_download_serves_byte_ranges(tmp_path):
+    path = tmp_path / "report.csv"
+    path.write_bytes(BODY)
+
+    async def scenario():
+        user, report_id = await _report(path)
+        plain = {"accept-encoding": "identity"}
+        whole = await _download(user, report_id, **plain)
+        part = await _download(user, report_id, range="bytes=100-199", **plain)
+        tail = await _download(user, report_id, range="bytes=-50", **plain)
+        stale = await _download(user, report_id, range="bytes=100-199", **{"if-range": '"0-0"'}, **plain)
+        resumed = await _download(user, report_id, range="bytes=100-199", **{"if-range": whole[1]["etag"]}, **plain)
+        outside = await _download(user, report_id, range=f"bytes={len(BODY)}-", **plain)
+        return whole, part, tail, stale, resumed, outside
+
+    whole, part, tail, stale, resumed, outside = run(scenario())
+    assert whole[0] == 200 and whole[2] == BODY
+    assert whole[1]["accept-ranges"] == "bytes"
+    assert part[0] == 206 and part[2] == BODY[100:200]
+    assert part[1]["content-range"] == f"bytes 100-199/{len(BODY)}"
+    assert tail[0] == 206 and tail[2] == BODY[-50:]
+    # A changed file (other ETag) is sent whole rather than spliced
+    assert stale[0] == 200 and stale[2] == BODY
+    assert resumed[0] == 206 and resumed[2] == BODY[100:200]
+    assert outside[0] == 416 and outside[1]["content-range"] == f"bytes */{len(BODY)}"
+
+
+@pytest.mark.parametrize("encoding, decompress", [("gzip", gzip.decompress), ("zstd", _unzstd)])
+def test_compressed_reports_are_passed_through_or_decoded(tmp_path, monkeypatch, encoding, decompress):
+    monkeypatch.setattr(report_formats, "REPORT_COMPRESSION", encoding)
+    columns = [text("name")]
+    parts = []
+    for index, names in enumerate([["Ann", "Bob"], ["Cy"]]):
+        part = report_path(tmp_path / f"part{index}", "csv")
+        writer = open_report_writer("csv", part, columns, header=index == 0)
+        writer.write([(name,) for name in names])
+        writer.close()
+        parts.append(part)
+    path = merge_report_parts("csv", parts, report_path(tmp_path / "report", "csv"))
+    assert describe_report_file(str(path)) == ("text/csv", encoding, "report.csv")
+
+    async def scenario():
+        user, report_id = await _report(path)
+        passed = await _download(user, report_id, **{"accept-encoding": encoding})
+        decoded = await _download(user, report_id, **{"accept-encoding": "identity"})
+        return passed, decoded
+
+    passed, decoded = run(scenario())
+    expected = b"name\r\nAnn\r\nBob\r\nCy\r\n"
+    assert passed[1]["content-encoding"] == encoding
+    assert passed[1]["content-disposition"] == 'attachment; filename="report.csv"'
+    # Concatenated gzip members and zstd frames decode as one stream
+    assert decompress(passed[2]) == expected
+    assert "content-encoding" not in decoded[1]
+    assert decoded[2] == expected
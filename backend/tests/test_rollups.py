@@ -0,0 +1,110 @@
+from datetime import date, datetime, timedelta, timezone
+
+from backend.database import UserRole
+from backend.rollups import (
+    EntrySnapshot, apply_entry_change, check_rollups, entry_change, rebuild_rollups, split_by_day,
+)
+
+from .conftest import async_session, client, headers_for, make_entry, make_project, make_user, run
+
+
+def test_split_by_day_cuts_at_utc_midnight():
+    assert split_by_day(datetime(2026, 3, 2, 22), datetime(2026, 3, 4, 1, 30)) == [
+        (date(2026, 3, 2), 2 * 3600),
+        (date(2026, 3, 3), 24 * 3600),
+        (date(2026, 3, 4), 5400),
+    ]
+    assert split_by_day(datetime(2026, 3, 2, 9), datetime(2026, 3, 3)) == [(date(2026, 3, 2), 15 * 3600)]
+    assert split_by_day(datetime(2026, 3, 2, 9), datetime(2026, 3, 2, 9)) == []
+    assert split_by_day(datetime(2026, 3, 2, 9), datetime(2026, 3, 2, 8)) == []
+
+
+def test_split_by_day_accepts_aware_timestamps():
+    start = datetime(2026, 3, 2, 23, tzinfo=timezone.utc)
+    assert split_by_day(start, start + timedelta(hours=2)) == [
+        (date(2026, 3, 2), 3600),
+        (date(2026, 3, 3), 3600),
+    ]
+
+
+def test_entry_change_moves_time_between_cells():
+    old = EntrySnapshot("u", "p", datetime(2026, 3, 2, 23), datetime(2026, 3, 3, 1), True)
+    new = EntrySnapshot("u", "q", datetime(2026, 3, 2, 23), datetime(2026, 3, 3, 2), False)
+    assert entry_change(old, new) == {
+        ("u", "p", date(2026, 3, 2)): [-3600, -3600],
+        ("u", "p", date(2026, 3, 3)): [-3600, -3600],
+        ("u", "q", date(2026, 3, 2)): [3600, 0],
+        ("u", "q", date(2026, 3, 3)): [7200, 0],
+    }
+    assert entry_change(old, old) == {}
+    # Running timers count for nothing until they stop
+    running = EntrySnapshot("u", "p", datetime(2026, 3, 2, 23), None, True)
+    assert entry_change(None, running) == {}
+
+
+def test_incremental_changes_match_a_rebuild():
+    async def scenario():
+        async with async_session() as db:
+            user = await make_user(db, UserRole.ADMIN)
+            first = await make_project(db, user, "First")
+            second = await make_project(db, user, "Second")
+            entries = []
+            for day in range(3):
+                entry = await make_entry(db, user, first, datetime(2026, 3, 1 + day, 21), seconds=5 * 3600)
+                await apply_entry_change(db, None, entry)
+                entries.append(entry)
+
+            # Move one to another project and make it non-billable, stretch another, delete the last
+            before = EntrySnapshot.from_entry(entries[0])
+            entries[0].project_id = second.id
+            entries[0].is_billable = False
+            await apply_entry_change(db, before, entries[0])
+            before = EntrySnapshot.from_entry(entries[1])
+            entries[1].end_time += timedelta(days=2)
+            await apply_entry_change(db, before, entries[1])
+            await apply_entry_change(db, EntrySnapshot.from_entry(entries[2]), None)
+            await db.delete(entries[2])
+            await db.commit()
+
+            mismatches = await check_rollups(db)
+            rows = await rebuild_rollups(db)
+            return mismatches, rows, await check_rollups(db)
+
+    mismatches, rows, after_rebuild = run(scenario())
+    assert mismatches == []
+    assert rows == 6
+    assert after_rebuild == []
+
+
+def test_time_entry_endpoints_keep_rollups_in_step():
+    async def scenario():
+        async with async_session() as db:
+            user = await make_user(db, UserRole.ADMIN)
+            project = await make_project(db, user)
+            await db.commit()
+        headers = headers_for(user)
+        async with client() as http:
+            response = await http.post("/api/time-entries/start", json={
+                "project_id": project.id, "start_time": datetime.utcnow().isoformat()
+            }, headers=headers)
+            assert response.status_code == 201
+            entry = response.json()
+            response = await http.post(f"/api/time-entries/{entry['id']}/stop", headers=headers)
+            assert response.status_code == 200
+
+            # Stretch it past midnight, then drop the billable flag
+            end_time = datetime.fromisoformat(entry["start_time"]) + timedelta(hours=30)
+            for change in ({"end_time": end_time.isoformat()}, {"is_billable": False}):
+                response = await http.put(f"/api/time-entries/{entry['id']}", json=change, headers=headers)
+                assert response.status_code == 200
+        async with async_session() as db:
+            mismatches = await check_rollups(db)
+        async with client() as http:
+            response = await http.delete(f"/api/time-entries/{entry['id']}", headers=headers)
+            assert response.status_code == 204
+        async with async_session() as db:
+            return mismatches, await check_rollups(db)
+
+    after_updates, after_delete = run(scenario())
+    assert after_updates == []
+    assert after_delete == []
@@ -0,0 +1,145 @@
+import base64
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy.future import select
+
+from backend.database import Project, Task, UserRole
+from backend.membership import add_members
+from backend.sync import SYNC_RETENTION_DAYS
+
+from .conftest import async_session, client, headers_for, make_entry, make_project, make_user, run
+
+
+async def _sync(user, token=None, limit=None):
+    params = {}
+    if token:
+        params["token"] = token
+    if limit:
+        params["limit"] = limit
+    async with client() as http:
+        response = await http.get("/api/sync/", params=params, headers=headers_for(user))
+    assert response.status_code == 200
+    return response.json()
+
+
+async def _sync_all(user, token=None, limit=None):
+    """Every page up to the present; returns the pages and the final token."""
+    pages = []
+    while True:
+        page = await _sync(user, token, limit)
+        pages.append(page)
+        token = page["token"]
+        if not page["has_more"]:
+            return pages, token
+
+
+def _ids(pages, key):
+    return [row["id"] for page in pages for row in page[key]]
+
+
+def test_paging_walks_the_snapshot_then_the_changes():
+    async def scenario():
+        async with async_session() as db:
+            admin = await make_user(db, UserRole.ADMIN)
+            project_ids = [(await make_project(db, admin, f"Project {n}")).id for n in range(5)]
+            await db.commit()
+        pages, token = await _sync_all(admin, limit=2)
+
+        async with async_session() as db:
+            result = await db.execute(select(Project).where(Project.id.in_(project_ids[:2])))
+            renamed, removed = sorted(result.scalars().all(), key=lambda project: project_ids.index(project.id))
+            renamed.name = "Renamed"
+            await db.delete(removed)
+            await db.commit()
+        changes, _ = await _sync_all(admin, token, limit=2)
+        idle = await _sync(admin, changes[-1]["token"])
+        return project_ids, pages, changes, idle
+
+    project_ids, pages, changes, idle = run(scenario())
+    # 5 projects and the admin, two per page
+    assert [page["has_more"] for page in pages] == [True, True, False]
+    assert pages[0]["reset"] and not pages[1]["reset"]
+    assert sorted(_ids(pages, "projects")) == sorted(project_ids)
+    assert len(_ids(pages, "users")) == 1
+
+    assert not changes[0]["reset"]
+    assert [(row["id"], row["name"]) for row in changes[0]["projects"]] == [(project_ids[0], "Renamed")]
+    assert changes[0]["deleted"]["projects"] == [project_ids[1]]
+    assert not idle["has_more"]
+    assert not any(idle[key] for key in ("users", "projects", "tasks", "time_entries"))
+    assert idle["deleted"]["projects"] == []
+
+
+def _expired_token() -> str:
+    issued = int(time.time()) - (SYNC_RETENTION_DAYS + 1) * 86400
+    raw = json.dumps({"seq": 0, "checked": 0, "at": issued})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def test_unusable_tokens_restart_from_a_snapshot():
+    async def scenario():
+        async with async_session() as db:
+            admin = await make_user(db, UserRole.ADMIN)
+            await make_project(db, admin)
+            await db.commit()
+        _, token = await _sync_all(admin)
+        current = await _sync(admin, token)
+        garbage = await _sync(admin, "not-a-token")
+        return current, garbage, await _sync(admin, _expired_token())
+
+    current, garbage, expired = run(scenario())
+    assert not current["reset"]
+    assert garbage["reset"] and len(garbage["projects"]) == 1
+    assert expired["reset"] and len(expired["projects"]) == 1
+
+
+def test_employees_only_page_through_their_own_entries():
+    async def scenario():
+        async with async_session() as db:
+            admin = await make_user(db, UserRole.ADMIN)
+            employee = await make_user(db)
+            other = await make_user(db)
+            project = await make_project(db, admin)
+            own = [(await make_entry(db, employee, project, datetime(2026, 3, day, 9))).id for day in (2, 3, 4)]
+            await make_entry(db, other, project, datetime(2026, 3, 2, 9))
+            await db.commit()
+        pages, _ = await _sync_all(employee, limit=1)
+        return employee.id, own, pages
+
+    employee_id, own, pages = run(scenario())
+    assert sorted(_ids(pages, "time_entries")) == sorted(own)
+    assert _ids(pages, "users") == [employee_id]
+    # Not a member of the project, so it is not in the feed
+    assert _ids(pages, "projects") == []
+
+
+def test_a_task_moved_out_of_an_employees_project_leaves_their_copy():
+    async def scenario():
+        async with async_session() as db:
+            admin = await make_user(db, UserRole.ADMIN)
+            employee = await make_user(db)
+            mine = await make_project(db, admin, "Mine")
+            other = await make_project(db, admin, "Other")
+            task = Task(title="Task", project_id=mine.id)
+            db.add(task)
+            await db.flush()
+            await add_members(db, mine.id, [employee.id])
+            await db.commit()
+        before, token = await _sync_all(employee)
+        async with client() as http:
+            response = await http.post(
+                "/api/tasks/bulk/move", json={"task_ids": [task.id], "project_id": other.id},
+                headers=headers_for(admin)
+            )
+            assert response.status_code == 200
+        after = await _sync(employee, token)
+        return task.id, mine.id, before, after
+
+    task_id, project_id, before, after = run(scenario())
+    assert _ids(before, "tasks") == [task_id]
+    # The task is now filed under a project the employee cannot see
+    assert after["reset"]
+    assert _ids([after], "tasks") == []
+    assert _ids([after], "projects") == [project_id]
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from backend.database import TimeEntry, UserRole
+from backend.pubsub import bus
+from backend.timers import RunningTimer, timer_registry
+
+from .conftest import async_session, client, headers_for, make_project, make_user, run
+
+
+async def _admin_and_project():
+    async with async_session() as db:
+        admin = await make_user(db, UserRole.ADMIN)
+        project = await make_project(db, admin)
+        await db.commit()
+        return admin, project
+
+
+async def _start(http, user, project):
+    return await http.post(
+        "/api/time-entries/start",
+        json={"project_id": project.id, "start_time": datetime.utcnow().isoformat()},
+        headers=headers_for(user),
+    )
+
+
+def test_start_ignores_timer_stopped_on_another_worker():
+    async def scenario():
+        admin, project = await _admin_and_project()
+        async with client() as http:
+            first = await _start(http, admin, project)
+            assert first.status_code == 201
+            # Another worker stops it; this worker's registry never hears of it
+            async with async_session() as db:
+                await db.execute(
+                    update(TimeEntry).where(TimeEntry.id == first.json()["id"]).values(end_time=datetime.utcnow())
+                )
+                await db.commit()
+            assert timer_registry.get(admin.id) is not None
+
+            current = await http.get("/api/time-entries/current", headers=headers_for(admin))
+            assert current.json() is None
+            second = await _start(http, admin, project)
+            assert second.status_code == 201
+            assert timer_registry.get(admin.id).id == second.json()["id"]
+
+    run(scenario())
+
+
+def test_start_refuses_timer_started_on_another_worker():
+    async def scenario():
+        admin, project = await _admin_and_project()
+        async with async_session() as db:
+            db.add(TimeEntry(user_id=admin.id, project_id=project.id, start_time=datetime.utcnow()))
+            await db.commit()
+        assert timer_registry.get(admin.id) is None
+
+        async with client() as http:
+            response = await _start(http, admin, project)
+        assert response.status_code == 400
+        # The unique index caught it, and the registry now knows the timer
+        assert timer_registry.get(admin.id) is not None
+
+    run(scenario())
+
+
+def test_peer_events_update_the_registry():
+    timer = RunningTimer(
+        id="entry-1", user_id="user-1", project_id="project-1", task_id=None,
+        start_time=datetime(2026, 3, 2, 9), description=None, is_billable=True,
+        created_at=datetime(2026, 3, 2, 9),
+    )
+
+    async def scenario():
+        await timer_registry.handle_event({"origin": "peer", "event": "started", "timer": timer.to_event()})
+        assert timer_registry.get("user-1") == timer
+        # Our own messages come back over the bus too; they are already applied
+        await timer_registry.handle_event({"origin": bus.worker_id, "event": "stopped", "time_entry_id": "entry-1"})
+        assert timer_registry.get("user-1") is not None
+        await timer_registry.handle_event({"origin": "peer", "event": "stopped", "time_entry_id": "entry-1"})
+        assert timer_registry.get("user-1") is None
+        assert len(timer_registry) == 0
+
+    run(scenario())
+
+
+def test_stop_and_start_publish_registry_changes():
+    async def scenario():
+        admin, project = await _admin_and_project()
+        bus._pending.clear()
+        async with client() as http:
+            started = await _start(http, admin, project)
+            await http.post(f"/api/time-entries/{started.json()['id']}/stop", headers=headers_for(admin))
+        return [message["event"] for message in bus._pending["timers"]]
+
+    assert run(scenario()) == ["started", "stopped"]
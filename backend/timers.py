@@ -0,0 +1,204 @@
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .database import Project, Task, TimeEntry
+from .pubsub import bus
+
+# Bus channel carrying timer starts and stops, so every worker's registry agrees
+TIMER_CHANNEL = "timers"
+
+
+def elapsed_seconds(start: datetime, end: datetime) -> int:
+    # Stored timestamps are UTC; SQLite hands them back naive, Postgres aware
+    if start.tzinfo is not None and end.tzinfo is None:
+        start = start.replace(tzinfo=None)
+    elif end.tzinfo is not None and start.tzinfo is None:
+        end = end.replace(tzinfo=None)
+    return max(0, int((end - start).total_seconds()))
+
+
+@dataclass
+class RunningTimer:
+    """Snapshot of an open time entry, enough to answer and stop it without a read."""
+    id: str
+    user_id: str
+    project_id: str
+    task_id: Optional[str]
+    start_time: datetime
+    description: Optional[str]
+    is_billable: bool
+    created_at: datetime
+
+    @classmethod
+    def from_entry(cls, entry: TimeEntry) -> "RunningTimer":
+        return cls(
+            id=entry.id,
+            user_id=entry.user_id,
+            project_id=entry.project_id,
+            task_id=entry.task_id,
+            start_time=entry.start_time,
+            description=entry.description,
+            is_billable=entry.is_billable,
+            created_at=entry.created_at or entry.start_time,
+        )
+
+    def to_event(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.update(start_time=self.start_time.isoformat(), created_at=self.created_at.isoformat())
+        return data
+
+    @classmethod
+    def from_event(cls, data: Dict[str, Any]) -> "RunningTimer":
+        return cls(**{
+            **data,
+            "start_time": datetime.fromisoformat(data["start_time"]),
+            "created_at": datetime.fromisoformat(data["created_at"]),
+        })
+
+    def to_response(self, end_time: Optional[datetime] = None, duration_seconds: Optional[int] = None) -> dict:
+        data = asdict(self)
+        data.update(
+            end_time=end_time,
+            duration_seconds=duration_seconds,
+            updated_at=end_time or self.created_at,
+        )
+        return data
+
+
+class RunningTimerRegistry:
+    """
+    In-memory map of running timers per user.
+
+    The unique partial index on ``time_entries(user_id) WHERE end_time IS NULL``
+    is the source of truth. This map is rebuilt from it on startup, and starts
+    and stops made through ``add``/``discard`` travel over the bus so every
+    worker applies them. An entry is still only a hint: a message may be
+    missed, so paths that refuse or report a running timer ``confirm`` it
+    against the database first.
+    """
+
+    def __init__(self):
+        self._by_user: Dict[str, RunningTimer] = {}
+        self._by_entry: Dict[str, RunningTimer] = {}
+
+    async def load(self, db: AsyncSession):
+        result = await db.execute(select(TimeEntry).where(TimeEntry.end_time.is_(None)))
+        self._by_user.clear()
+        self._by_entry.clear()
+        for entry in result.scalars().all():
+            self._add(RunningTimer.from_entry(entry))
+
+    def get(self, user_id: str) -> Optional[RunningTimer]:
+        return self._by_user.get(user_id)
+
+    def get_entry(self, time_entry_id: str) -> Optional[RunningTimer]:
+        return self._by_entry.get(time_entry_id)
+
+    async def confirm(self, db: AsyncSession, user_id: str) -> Optional[RunningTimer]:
+        """The user's cached timer if its entry is still open; re-read from the database otherwise."""
+        timer = self._by_user.get(user_id)
+        if timer is None:
+            return None
+        result = await db.execute(select(TimeEntry.end_time).where(TimeEntry.id == timer.id))
+        row = result.first()
+        if row is not None and row.end_time is None:
+            return timer
+        return await self.refresh_user(db, user_id)
+
+    async def refresh_user(self, db: AsyncSession, user_id: str) -> Optional[RunningTimer]:
+        """Replace the user's cached timer with their open entry in the database, if any."""
+        result = await db.execute(
+            select(TimeEntry).where(TimeEntry.user_id == user_id, TimeEntry.end_time.is_(None))
+        )
+        entry = result.scalars().first()
+        if entry is None:
+            self._discard_user(user_id)
+            return None
+        timer = RunningTimer.from_entry(entry)
+        self._add(timer)
+        return timer
+
+    def add(self, timer: RunningTimer):
+        self._add(timer)
+        bus.publish(TIMER_CHANNEL, {"origin": bus.worker_id, "event": "started", "timer": timer.to_event()})
+
+    def discard(self, time_entry_id: str) -> Optional[RunningTimer]:
+        # Published even when unknown here: another worker may hold the entry
+        bus.publish(TIMER_CHANNEL, {"origin": bus.worker_id, "event": "stopped", "time_entry_id": time_entry_id})
+        return self._discard(time_entry_id)
+
+    async def handle_event(self, event: Dict[str, Any]):
+        if event.get("origin") == bus.worker_id:
+            return
+        if event.get("event") == "started":
+            self._add(RunningTimer.from_event(event["timer"]))
+        elif event.get("event") == "stopped":
+            self._discard(event["time_entry_id"])
+
+    def _add(self, timer: RunningTimer):
+        self._discard_user(timer.user_id)
+        self._by_user[timer.user_id] = timer
+        self._by_entry[timer.id] = timer
+
+    def _discard(self, time_entry_id: str) -> Optional[RunningTimer]:
+        timer = self._by_entry.pop(time_entry_id, None)
+        if timer is not None and self._by_user.get(timer.user_id) is timer:
+            del self._by_user[timer.user_id]
+        return timer
+
+    def _discard_user(self, user_id: str):
+        timer = self._by_user.pop(user_id, None)
+        if timer is not None:
+            self._by_entry.pop(timer.id, None)
+
+    def values(self) -> List[RunningTimer]:
+        return list(self._by_user.values())
+
+    def __len__(self):
+        return len(self._by_user)
+
+
+class ExistenceCache:
+    """
+    Positive cache of project ids and task -> project ids.
+
+    Ids never change once created, so entries only have to be dropped when
+    the row is deleted.
+    """
+
+    def __init__(self):
+        self._projects: Set[str] = set()
+        self._tasks: Dict[str, str] = {}
+
+    async def project_exists(self, db: AsyncSession, project_id: str) -> bool:
+        if project_id in self._projects:
+            return True
+        result = await db.execute(select(Project.id).where(Project.id == project_id))
+        if result.scalar() is None:
+            return False
+        self._projects.add(project_id)
+        return True
+
+    async def task_project_id(self, db: AsyncSession, task_id: str) -> Optional[str]:
+        if task_id in self._tasks:
+            return self._tasks[task_id]
+        result = await db.execute(select(Task.project_id).where(Task.id == task_id))
+        project_id = result.scalar()
+        if project_id is not None:
+            self._tasks[task_id] = project_id
+        return project_id
+
+    def forget_project(self, project_id: str):
+        self._projects.discard(project_id)
+        self._tasks = {t: p for t, p in self._tasks.items() if p != project_id}
+
+    def forget_task(self, task_id: str):
+        self._tasks.pop(task_id, None)
+
+
+timer_registry = RunningTimerRegistry()
+existence_cache = ExistenceCache()
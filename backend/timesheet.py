@@ -0,0 +1,108 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .database import Project
+from .rollups import read_daily_totals, split_by_day
+from .timers import timer_registry
+
+# Longest range one timesheet request may cover
+MAX_TIMESHEET_DAYS = 92
+
+
+def date_range(start_date: date, end_date: date) -> List[date]:
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+async def timesheet_cells(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    user_ids: Optional[List[str]] = None,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Seconds worked per user, project and day.
+
+    Completed entries come from ``daily_time_totals``, which already splits
+    them by day; running timers are added from the in-memory registry up to
+    ``now``.
+    """
+    now = now or datetime.utcnow()
+    cells: Dict[tuple, Dict[str, Any]] = {}
+
+    for row in await read_daily_totals(db, start_date, end_date, user_ids):
+        cells[(row.user_id, row.project_id, row.day)] = {
+            "user_id": row.user_id,
+            "project_id": row.project_id,
+            "project_name": row.project_name,
+            "date": row.day.isoformat(),
+            "seconds": row.seconds,
+        }
+
+    unnamed = []
+    for timer in timer_registry.values():
+        if user_ids is not None and timer.user_id not in user_ids:
+            continue
+        for day, seconds in split_by_day(timer.start_time, now):
+            if not start_date <= day <= end_date or seconds <= 0:
+                continue
+            cell = cells.get((timer.user_id, timer.project_id, day))
+            if cell is None:
+                cell = cells[(timer.user_id, timer.project_id, day)] = {
+                    "user_id": timer.user_id,
+                    "project_id": timer.project_id,
+                    "project_name": None,
+                    "date": day.isoformat(),
+                    "seconds": 0,
+                }
+                unnamed.append(cell)
+            cell["seconds"] += seconds
+
+    if unnamed:
+        result = await db.execute(
+            select(Project.id, Project.name).where(Project.id.in_({cell["project_id"] for cell in unnamed}))
+        )
+        names = dict(result.all())
+        for cell in unnamed:
+            cell["project_name"] = names.get(cell["project_id"])
+
+    return sorted(cells.values(), key=lambda cell: (cell["user_id"], cell["project_name"] or "", cell["date"]))
+
+
+def build_grid(cells: List[Dict[str, Any]], start_date: date, end_date: date) -> Dict[str, Any]:
+    """Pivot cells into one row per user and project with hours per day."""
+    days = [day.isoformat() for day in date_range(start_date, end_date)]
+    rows: Dict[tuple, Dict[str, Any]] = {}
+    daily_totals = {day: 0.0 for day in days}
+
+    for cell in cells:
+        key = (cell["user_id"], cell["project_id"])
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {
+                "user_id": cell["user_id"],
+                "project_id": cell["project_id"],
+                "project_name": cell["project_name"],
+                "hours_by_day": {day: 0.0 for day in days},
+                "total_hours": 0.0,
+            }
+        hours = cell["seconds"] / 3600
+        row["hours_by_day"][cell["date"]] += hours
+        row["total_hours"] += hours
+        daily_totals[cell["date"]] += hours
+
+    for row in rows.values():
+        row["hours_by_day"] = {day: round(hours, 2) for day, hours in row["hours_by_day"].items()}
+        row["total_hours"] = round(row["total_hours"], 2)
+
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "days": days,
+        "rows": list(rows.values()),
+        "daily_totals": {day: round(hours, 2) for day, hours in daily_totals.items()},
+        "total_hours": round(sum(daily_totals.values()), 2),
+    }